@@ -0,0 +1,299 @@
+# FiveM Pack Builder – synthetic packs + phase benchmark (headless)
+#
+#   python FiveM_Pack_Builder_Bench.py                       # "small" profile -> bench_output.txt
+#   python FiveM_Pack_Builder_Bench.py --profile large       # 100 packs / 100k files
+#   python FiveM_Pack_Builder_Bench.py --compare old.json    # ratios against an earlier run
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+from pathlib import Path
+
+import FiveM_Pack_Builder_Leutnant as pb
+
+# pack count, dir depth, files per pack, size distribution (lognormal median/sigma, cap),
+# share of names shared with other packs, share of those with identical bytes, non-relevant files
+PROFILES = {
+    "small": {"packs": 10, "depth": 3, "files_per_pack": 200, "median_kb": 24, "sigma": 1.2, "max_mb": 8,
+              "dup_rate": 0.15, "dup_identical": 0.5, "meta_rate": 0.08, "junk_rate": 0.1},
+    "medium": {"packs": 40, "depth": 4, "files_per_pack": 500, "median_kb": 16, "sigma": 1.3, "max_mb": 16,
+               "dup_rate": 0.15, "dup_identical": 0.5, "meta_rate": 0.06, "junk_rate": 0.1},
+    "large": {"packs": 100, "depth": 5, "files_per_pack": 1000, "median_kb": 4, "sigma": 1.5, "max_mb": 16,
+              "dup_rate": 0.2, "dup_identical": 0.5, "meta_rate": 0.05, "junk_rate": 0.05},
+}
+
+STREAM_WEIGHTS = [(".ydd", 40), (".ytd", 40), (".yft", 6), (".ydr", 6), (".ybn", 3), (".ytyp", 2), (".ymap", 3)]
+JUNK_EXTS = [".png", ".jpg", ".txt", ".xml", ".dds"]
+META_PAD = b"<!-- padding -->\n"
+
+def meta_variants() -> list[tuple[str | None, bytes]]:
+    # one .meta body per detect_data_file_type branch: every any-of term, the all-of rule,
+    # no match, a marker behind the first scan chunk and one behind the scan limit
+    variants = []
+    for dtype, any_of, all_of in pb.META_RULES:
+        for term in any_of:
+            variants.append((dtype, f"<?xml version=\"1.0\"?>\n<{term}>\n  <Item />\n</{term}>\n".encode()))
+        if all_of:
+            body = "".join(f"<{t}>x</{t}>\n" for t in all_of)
+            variants.append((dtype, f"<?xml version=\"1.0\"?>\n<root>\n{body}</root>\n".encode()))
+    variants.append((None, b"<?xml version=\"1.0\"?>\n<CMapTypes>\n  <archetypes />\n</CMapTypes>\n"))
+    first = pb.META_RULES[0]
+    pad = META_PAD * (pb.META_CHUNK_SIZE // len(META_PAD) + 10)
+    variants.append((first[0], pad + f"<{first[1][0]}/>\n".encode()))
+    pad = META_PAD * (pb.META_SCAN_BYTES // len(META_PAD) + 10)
+    variants.append((None, pad + f"<{first[1][0]}/>\n".encode()))
+    return variants
+
+def _rsc7_body(rng: random.Random, ext: str, size: int, noise: bytes) -> bytes:
+    version = pb.RSC7_VERSIONS.get(ext, 165)
+    flags = (rng.randint(1, 127) << 17) | rng.randint(0, 3)
+    head = pb.RSC7_MAGIC + version.to_bytes(4, "little") + flags.to_bytes(4, "little") + flags.to_bytes(4, "little")
+    size = max(size, len(head) + 1)
+    start = rng.randrange(0, len(noise) - 1)
+    body = (noise[start:] + noise) * (size // len(noise) + 1)
+    return head + body[:size - len(head)]
+
+def generate_packs(root: Path, profile: dict, seed: int = 1) -> dict:
+    # deterministic for a seed: same tree, names and bytes on every run
+    rng = random.Random(seed)
+    noise = rng.randbytes(1024 * 1024)
+    variants = meta_variants()
+    exts = [e for e, _ in STREAM_WEIGHTS]
+    weights = [w for _, w in STREAM_WEIGHTS]
+    max_size = int(profile["max_mb"] * 1024 * 1024)
+    shared_names = [f"shared_{i:05d}" for i in range(max(1, profile["files_per_pack"] // 4))]
+    shared_bytes: dict[str, bytes] = {}
+
+    stats = {"packs": 0, "files": 0, "relevant": 0, "bytes": 0, "meta": 0, "junk": 0, "dup_names": 0,
+             "meta_types": {}}
+    root.mkdir(parents=True, exist_ok=True)
+    for p in range(profile["packs"]):
+        pack = root / f"pack_{p:03d}"
+        dirs = [pack]
+        for _ in range(max(1, profile["depth"] * 3)):
+            parent = rng.choice(dirs)
+            if len(parent.relative_to(pack).parts) < profile["depth"]:
+                dirs.append(parent / f"d{len(dirs):03d}")
+        for d in dirs:
+            d.mkdir(parents=True, exist_ok=True)
+        stats["packs"] += 1
+
+        for i in range(profile["files_per_pack"]):
+            folder = rng.choice(dirs)
+            roll = rng.random()
+            if roll < profile["junk_rate"]:
+                (folder / f"junk_{i:05d}{rng.choice(JUNK_EXTS)}").write_bytes(noise[:rng.randint(10, 4096)])
+                stats["junk"] += 1
+                stats["files"] += 1
+                continue
+            if roll < profile["junk_rate"] + profile["meta_rate"]:
+                dtype, body = variants[i % len(variants)]
+                name = f"meta_{i:05d}.meta" if rng.random() >= profile["dup_rate"] else f"{rng.choice(shared_names)}.meta"
+                (folder / name).write_bytes(body)
+                stats["bytes"] += len(body)
+                key = dtype or "none"
+                stats["meta_types"][key] = stats["meta_types"].get(key, 0) + 1
+                stats["meta"] += 1
+            else:
+                ext = rng.choices(exts, weights)[0]
+                size = min(max_size, int(rng.lognormvariate(0, profile["sigma"]) * profile["median_kb"] * 1024))
+                if rng.random() < profile["dup_rate"]:
+                    stem = rng.choice(shared_names)
+                    stats["dup_names"] += 1
+                    if rng.random() < profile["dup_identical"]:
+                        data = shared_bytes.get(stem + ext)
+                        if data is None:
+                            data = shared_bytes[stem + ext] = _rsc7_body(rng, ext, size, noise)
+                    else:
+                        data = _rsc7_body(rng, ext, size, noise)
+                else:
+                    stem = f"asset_{p:03d}_{i:05d}"
+                    data = _rsc7_body(rng, ext, size, noise)
+                target = folder / f"{stem}{ext}"
+                if target.exists():
+                    target = folder / f"{stem}_{i:05d}{ext}"
+                target.write_bytes(data)
+                stats["bytes"] += len(data)
+            stats["relevant"] += 1
+            stats["files"] += 1
+    return stats
+
+def _timed(fn, repeat: int):
+    # -> (result of the last run, {"seconds": median, "min", "runs"})
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, {"seconds": round(statistics.median(times), 6), "min": round(min(times), 6), "runs": repeat}
+
+def run_benchmark(work: Path, profile: dict, seed: int = 1, repeat: int = 3, copy_workers: int = pb.DEFAULT_COPY_WORKERS,
+                  scan_workers: int = pb.DEFAULT_SCAN_WORKERS, log=print) -> dict:
+    src_root = work / "src"
+    out_root = work / "out"
+    phases = {}
+
+    log(f"generate: {profile['packs']} packs x {profile['files_per_pack']} files …")
+    t0 = time.perf_counter()
+    gen = generate_packs(src_root, profile, seed)
+    gen["seconds"] = round(time.perf_counter() - t0, 3)
+    packs = sorted(p for p in src_root.iterdir() if p.is_dir())
+
+    log("collect_relevant_files …")
+    found, phases["collect_relevant_files"] = _timed(
+        lambda: [pb.collect_relevant_files(p, workers=1) for p in packs], repeat)
+    phases["collect_relevant_files"]["files"] = sum(len(x) for x in found)
+
+    log("scan_sources (parallel) …")
+    found, phases["scan_sources"] = _timed(lambda: pb.scan_sources(packs, workers=scan_workers), repeat)
+    phases["scan_sources"]["files"] = sum(len(x) for x in found)
+
+    metas = [f.path for files in found for f in files if f.ext == ".meta"]
+    log("detect_data_file_type …")
+    pb._default_classifier = None
+    types, phases["detect_data_file_type"] = _timed(lambda: [pb.detect_data_file_type(Path(m)) for m in metas], repeat)
+    phases["detect_data_file_type"]["files"] = len(metas)
+    by_type = {}
+    for t in types:
+        by_type[t or "none"] = by_type.get(t or "none", 0) + 1
+    phases["detect_data_file_type"]["by_type"] = by_type
+
+    # full builds: fresh merge (copy loop), rerun (all unchanged), replace
+    builds = {}
+    for label, mode in (("fresh", "merge"), ("rerun", "merge"), ("replace", "replace")):
+        log(f"build {label} …")
+        builder = pb.PackBuilder(packs, out_root / "bench_pack", "bench_pack", mode=mode, scan_workers=scan_workers,
+                                 copy_workers=copy_workers, analyze=False)
+        t0 = time.perf_counter()
+        summary = builder.build()
+        builds[label] = {
+            "seconds": round(time.perf_counter() - t0, 6),
+            "copy_seconds": summary["copy_seconds"],
+            "copied": summary["copied"],
+            "unchanged": summary["unchanged"],
+            "bytes": summary["bytes"],
+            "mb_per_s": summary["mb_per_s"],
+            "result": summary["result"],
+        }
+    phases["copy_loop"] = {k: builds["fresh"][k] for k in ("copy_seconds", "copied", "bytes", "mb_per_s")}
+    phases["copy_loop"]["seconds"] = phases["copy_loop"].pop("copy_seconds")
+    phases["build"] = builds
+
+    data_rel = sorted(f"data/{p.name}" for p in (out_root / "bench_pack" / "data").iterdir())
+    log("write_or_extend_fxmanifest …")
+    fx_dir = work / "fx"
+
+    def manifest_create():
+        shutil.rmtree(fx_dir, ignore_errors=True)
+        shutil.copytree(out_root / "bench_pack" / "data", fx_dir / "data")
+        t0 = time.perf_counter()
+        pb.write_or_extend_fxmanifest(fx_dir, "bench_pack", data_rel, lambda m: None)
+        return time.perf_counter() - t0
+
+    times = [manifest_create() for _ in range(repeat)]
+    phases["write_or_extend_fxmanifest"] = {"seconds": round(statistics.median(times), 6),
+                                            "min": round(min(times), 6), "runs": repeat, "files": len(data_rel)}
+    _, phases["write_or_extend_fxmanifest_noop"] = _timed(
+        lambda: pb.write_or_extend_fxmanifest(fx_dir, "bench_pack", data_rel, lambda m: None), repeat)
+    _, phases["compact_fxmanifest"] = _timed(
+        lambda: pb.compact_fxmanifest(fx_dir, "bench_pack", data_rel, lambda m: None), repeat)
+
+    log("parse_fxmanifest_existing …")
+    text = (fx_dir / "fxmanifest.lua").read_text(encoding="utf-8", errors="ignore")
+    _, phases["parse_fxmanifest_existing"] = _timed(lambda: pb.parse_fxmanifest_existing(text), repeat)
+    phases["parse_fxmanifest_existing"]["lines"] = text.count("\n")
+
+    log("write_ensure_files …")
+    ensure_dir = work / "ensure" / "bench_pack"
+    ensure_dir.mkdir(parents=True, exist_ok=True)
+    _, phases["write_ensure_files"] = _timed(
+        lambda: pb.write_ensure_files(ensure_dir, "bench_pack", lambda m: None), repeat)
+
+    return {"generated": gen, "phases": phases}
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(new: dict, old: dict) -> list[str]:
+    # "phase: old s -> new s (x.xx)" for every phase both runs have
+    lines = []
+    for name, phase in new["phases"].items():
+        before = old.get("phases", {}).get(name)
+        if not isinstance(phase, dict) or not isinstance(before, dict):
+            continue
+        if "seconds" in phase and before.get("seconds"):
+            ratio = phase["seconds"] / before["seconds"]
+            lines.append(f"{name:34} {before['seconds']:10.4f}s -> {phase['seconds']:10.4f}s  ({ratio:.2f}x)")
+    return lines
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=f"{pb.APP_TITLE} {pb.APP_VERSION} – Benchmark (headless)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    for key, value in PROFILES["small"].items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), metavar="N",
+                            help=f"überschreibt das Profil (small: {value})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen pro Phase (Median)")
+    parser.add_argument("--copy-workers", type=int, default=pb.DEFAULT_COPY_WORKERS)
+    parser.add_argument("--scan-workers", type=int, default=pb.DEFAULT_SCAN_WORKERS)
+    parser.add_argument("--workdir", help="Arbeitsordner (Default: temp, wird danach gelöscht)")
+    parser.add_argument("--keep", action="store_true", help="generierte Packs/Ausgabe behalten")
+    parser.add_argument("--out", default="bench_output.txt", help="JSON-Ergebnis (Default bench_output.txt)")
+    parser.add_argument("--compare", metavar="JSON", help="früheres Ergebnis zum Vergleich")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    profile = dict(PROFILES[args.profile])
+    for key in profile:
+        value = getattr(args, key)
+        if value is not None:
+            profile[key] = value
+
+    log = (lambda m: None) if args.quiet else (lambda m: print(m, file=sys.stderr, flush=True))
+    work = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="packbuilder-bench-"))
+    try:
+        result = run_benchmark(work, profile, args.seed, max(1, args.repeat), args.copy_workers, args.scan_workers, log)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    result = {
+        "app_version": pb.APP_VERSION,
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "profile": args.profile,
+        "params": {**profile, "seed": args.seed, "repeat": args.repeat, "copy_workers": args.copy_workers,
+                   "scan_workers": args.scan_workers},
+        **result,
+    }
+    Path(args.out).write_text(json.dumps(result, indent=1, ensure_ascii=False), encoding="utf-8")
+    log(f"→ {args.out}")
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        for line in compare(result, old):
+            print(line)
+    else:
+        for name, phase in result["phases"].items():
+            if isinstance(phase, dict) and "seconds" in phase:
+                print(f"{name:34} {phase['seconds']:10.4f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,104 @@
 # FiveM_Pack_Builder_Leutnant.py
 import os
 import re
+import sys
 import shutil
+import signal
 import threading
+import argparse
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from pathlib import Path
+from typing import NamedTuple
 from datetime import datetime
 import subprocess
 import json
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+import hashlib
+import errno
+import queue
+import io
+import fnmatch
+import select
+import struct
+import heapq
+import zipfile
+import zlib
+import tarfile
+import functools
+import itertools
+import collections
+import copy
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager, nullcontext
+
+# GUI modules are loaded lazily (load_gui_modules) so the headless CLI starts
+# without tkinter / tkinterdnd2 / pillow.
+tk = ttk = filedialog = messagebox = None
 
 # Optional Drag & Drop (pip install tkinterdnd2)
 DND_AVAILABLE = False
-try:
-    from tkinterdnd2 import DND_FILES, TkinterDnD
-    DND_AVAILABLE = True
-except Exception:
-    DND_AVAILABLE = False
 
 # Optional preview images (pip install pillow)
 PIL_AVAILABLE = False
+
+# Optional .tar.zst packages (pip install zstandard)
 try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
+    import zstandard
+    ZSTD_AVAILABLE = True
 except Exception:
-    PIL_AVAILABLE = False
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+def load_gui_modules():
+    global tk, ttk, filedialog, messagebox
+    global DND_AVAILABLE, DND_FILES, TkinterDnD, PIL_AVAILABLE, Image, ImageTk
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox
+
+    try:
+        from tkinterdnd2 import DND_FILES, TkinterDnD
+        DND_AVAILABLE = True
+    except Exception:
+        DND_AVAILABLE = False
+
+    try:
+        from PIL import Image, ImageTk
+        PIL_AVAILABLE = True
+    except Exception:
+        PIL_AVAILABLE = False
 
 # EXTENSIONS
 STREAM_EXTS = {".ydd", ".ytd", ".yft", ".ydr", ".ybn", ".ytyp", ".ymap"}
 DATA_EXTS   = {".meta", ".ymt"}
 PREVIEW_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
+RELEVANT_EXTS = frozenset(STREAM_EXTS | DATA_EXTS)
+
+# directory scans are I/O bound (SMB/slow disks) -> more threads than cores
+DEFAULT_SCAN_WORKERS = 16
+DEFAULT_COPY_WORKERS = 4
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+# scan -> plan -> copy pipeline: scanned sources waiting for the planner, files per plan chunk,
+# planned transfers in flight (bounds memory on huge trees)
+SCAN_AHEAD = 4
+PLAN_CHUNK = 1024
+COPY_WINDOW = 4096
+
+# GUI: worker -> UI queue is drained on a timer; the log view keeps only the tail
+UI_POLL_MS = 100
+LOG_VIEW_MAX_LINES = 2000
 
 APP_TITLE = "FiveM Pack Builder"
 APP_VERSION = "v2.3"
 CREATED_BY = "Created by Leutnant"
 
+# EXIT CODES (headless CLI)
+EXIT_OK = 0
+EXIT_ERRORS = 1      # build finished, some files failed
+EXIT_USAGE = 2       # invalid arguments (same code argparse uses)
+EXIT_EMPTY = 3       # no relevant files found in sources
+EXIT_ABORTED = 4     # stopped by user / signal
+EXIT_FAILED = 5      # fatal error, build did not finish
+
 # THEME
 ACCENT = "#7C3AED"
 BG0 = "#0B1020"
@@ -57,36 +121,605 @@ def wipe_dir(p: Path):
 def ts():
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
-def read_text_loose(path: Path, max_bytes: int = 800_000) -> str:
+# ---------- Staged replace ----------
+STAGE_PREFIX = ".packbuilder-stage-"
+STAGE_MOVE_MARKER = "MOVED_SOURCES"      # stage holds moved originals -> never auto-deleted
+
+def remove_in_background(path: Path) -> threading.Thread:
+    # non-daemon: a CLI run still finishes the delete before the process exits
+    t = threading.Thread(target=shutil.rmtree, args=(path,), kwargs={"ignore_errors": True},
+                         name=f"rmtree {path.name}")
+    t.start()
+    return t
+
+def swap_in_stage(stage: Path, dst_root: Path) -> list[Path]:
+    # live stream/ + data/ are renamed into the stage dir, the staged ones take their place;
+    # two renames per folder on the same file system -> the resource is never half empty
+    aside = []
+    for folder in ("stream", "data"):
+        live = dst_root / folder
+        old = stage / f"old_{folder}"
+        try:
+            os.rename(live, old)
+            aside.append(old)
+        except FileNotFoundError:
+            pass
+        os.rename(stage / folder, live)
+    return aside
+
+def cleanup_stale_stages(dst_root: Path):
+    # stage dirs of crashed/killed copy builds; move builds keep theirs (moved originals)
+    prefix = f"{STAGE_PREFIX}{dst_root.name}-"
     try:
-        data = path.read_bytes()[:max_bytes]
-        return data.decode("utf-8", errors="ignore")
-    except Exception:
-        return ""
+        with os.scandir(dst_root.parent) as it:
+            stale = [Path(e.path) for e in it if e.is_dir() and e.name.startswith(prefix)]
+    except OSError:
+        return
+    for p in stale:
+        if not (p / STAGE_MOVE_MARKER).exists():
+            remove_in_background(p)
+
+# ---------- .meta classification ----------
+META_SCAN_BYTES = 800_000
+META_CACHE_FILE = ".packbuilder_meta_cache.json"
+
+# (data_file type, any-of terms, all-of terms) in priority order: the first rule that
+# matches wins, so a hit on rule 0 ends the scan early. Terms are matched case-insensitively.
+META_RULES = [
+    ("SHOP_PED_APPAREL_META_FILE", ("shoppedapparel", "shop_ped_apparel", "shop ped apparel"), ()),
+    ("PED_COMPONENTS_FILE", ("pedcomponents", "ped_component", "componentinfo"), ()),
+    ("PED_OVERLAY_FILE", ("pedoverlays", "ped_overlays", "tattoo"), ()),
+    ("CONTENT_UNLOCKING_META_FILE", ("contentunlocks",), ("dlcname", "content")),
+    ("HANDLING_FILE", ("chandlingdatamgr",), ()),
+    ("VEHICLE_METADATA_FILE", ("cvehiclemodelinfo__initdatalist",), ()),
+    ("CARCOLS_FILE", ("cvehiclemodelinfovarglobal",), ()),
+    ("VEHICLE_VARIATION_FILE", ("cvehiclemodelinfovariation",), ()),
+    ("VEHICLE_LAYOUTS_FILE", ("cvehiclemetadatamgr",), ()),
+]
+
+META_CHUNK_SIZE = 256 * 1024
+
+class MetaClassifier:
+    # all terms of all rules in one compiled alternation, run once over the file in
+    # lowercased chunks (bytes.lower is ASCII-only and much cheaper than decode+lower)
+    def __init__(self, rules=META_RULES):
+        self.rules = [(t, tuple(x.lower() for x in any_of), tuple(x.lower() for x in all_of))
+                      for t, any_of, all_of in rules]
+        self._rule_terms = [(tuple(x.encode("ascii") for x in a), tuple(x.encode("ascii") for x in b))
+                            for _, a, b in self.rules]
+        terms = sorted({x for _, a, b in self.rules for x in (*a, *b)}, key=len, reverse=True)
+        self._pattern = re.compile(b"|".join(re.escape(x.encode("ascii")) for x in terms))
+        self._overlap = max(len(x) for x in terms) - 1
+        self.signature = hashlib.blake2b(repr(self.rules).encode("utf-8"), digest_size=8).hexdigest()
+
+    def _best_rule(self, found: set[bytes]) -> int | None:
+        for i, (any_of, all_of) in enumerate(self._rule_terms):
+            if any(x in found for x in any_of) or (all_of and all(x in found for x in all_of)):
+                return i
+        return None
+
+    def classify_stream(self, fp, max_bytes: int = META_SCAN_BYTES) -> str | None:
+        found = set()
+        best = None
+        tail = b""
+        remaining = max_bytes
+        while remaining > 0:
+            chunk = fp.read(min(META_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            buf = tail + chunk.lower()
+            for m in self._pattern.finditer(buf):
+                term = m.group(0)
+                if term in found:
+                    continue
+                found.add(term)
+                best = self._best_rule(found)
+                if best == 0:
+                    # nothing outranks the first rule -> decisive
+                    return self.rules[0][0]
+            tail = buf[-self._overlap:] if self._overlap else b""
+        return None if best is None else self.rules[best][0]
+
+    def classify(self, path, max_bytes: int = META_SCAN_BYTES) -> str | None:
+        try:
+            with open(path, "rb") as fp:
+                return self.classify_stream(fp, max_bytes)
+        except OSError:
+            return None
+
+_default_classifier: MetaClassifier | None = None
+
+def default_meta_classifier() -> MetaClassifier:
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = MetaClassifier()
+    return _default_classifier
 
 def detect_data_file_type(meta_path: Path) -> str | None:
-    txt = read_text_loose(meta_path).lower()
-    if not txt:
-        return None
-    if ("shoppedapparel" in txt) or ("shop_ped_apparel" in txt) or ("shop ped apparel" in txt):
-        return "SHOP_PED_APPAREL_META_FILE"
-    if ("pedcomponents" in txt) or ("ped_component" in txt) or ("componentinfo" in txt):
-        return "PED_COMPONENTS_FILE"
-    if ("pedoverlays" in txt) or ("ped_overlays" in txt) or ("tattoo" in txt):
-        return "PED_OVERLAY_FILE"
-    if ("dlcname" in txt and "content" in txt) or ("contentunlocks" in txt):
-        return "CONTENT_UNLOCKING_META_FILE"
+    return default_meta_classifier().classify(meta_path)
+
+def _load_meta_cache(dst_root: Path, signature: str) -> dict:
+    try:
+        data = json.loads((dst_root / META_CACHE_FILE).read_text(encoding="utf-8"))
+        if data.get("rules") == signature and isinstance(data.get("files"), dict):
+            return data["files"]
+    except Exception:
+        pass
+    return {}
+
+def _save_meta_cache(dst_root: Path, signature: str, files: dict):
+    p = dst_root / META_CACHE_FILE
+    tmp = p.with_name(p.name + ".tmp")
+    try:
+        tmp.write_text(json.dumps({"rules": signature, "files": files}, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, p)
+    except OSError:
+        pass
+
+def classify_data_files(dst_root: Path, rel_paths, workers: int = DEFAULT_SCAN_WORKERS,
+                        classifier: MetaClassifier | None = None) -> dict[str, str | None]:
+    # rel path -> data_file type; results are cached per file by (size, mtime) in
+    # META_CACHE_FILE, only new/changed .meta files are read (in parallel)
+    classifier = classifier or default_meta_classifier()
+    cache = _load_meta_cache(dst_root, classifier.signature)
+    result = {}
+    todo = []
+    for rp in dict.fromkeys(rel_paths):
+        if not rp.lower().endswith(".meta"):
+            continue
+        try:
+            st = os.stat(dst_root / rp)
+        except OSError:
+            continue
+        hit = cache.get(rp)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime:
+            result[rp] = hit[2]
+        else:
+            todo.append((rp, st.st_size, st.st_mtime))
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            types = pool.map(lambda item: classifier.classify(dst_root / item[0]), todo)
+            for (rp, size, mtime), t in zip(todo, types):
+                result[rp] = t
+                cache[rp] = [size, mtime, t]
+        _save_meta_cache(dst_root, classifier.signature, cache)
+    return result
+
+class FoundFile(NamedTuple):
+    path: str
+    name: str
+    ext: str
+    size: int
+    mtime: float
+
+def _scan_dir(path: str):
+    # one directory level; only relevant files get a record (size/mtime from the dirent)
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                except OSError:
+                    continue
+                name = entry.name
+                dot = name.rfind(".")
+                if dot <= 0:
+                    continue
+                ext = name[dot:].lower()
+                if ext not in RELEVANT_EXTS:
+                    continue
+                try:
+                    st = entry.stat()
+                    files.append(FoundFile(entry.path, name, ext, st.st_size, st.st_mtime))
+                except OSError:
+                    files.append(FoundFile(entry.path, name, ext, 0, 0.0))
+    except OSError:
+        pass
+    return files, subdirs
+
+# ---------- Archive sources (.zip / .tar[.gz|.bz2|.xz]) ----------
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_SEP = "::"  # FoundFile.path of an archive member: <archive>::<member>
+
+def archive_kind(path) -> str | None:
+    name = str(path).lower()
+    if name.endswith(ZIP_SUFFIXES):
+        return "zip"
+    if name.endswith(TAR_SUFFIXES):
+        return "tar"
     return None
 
-def collect_relevant_files(src: Path):
-    found = []
-    for root, _, files in os.walk(src):
-        for f in files:
-            p = Path(root) / f
-            ext = p.suffix.lower()
-            if ext in STREAM_EXTS or ext in DATA_EXTS:
-                found.append(p)
-    return found
+def is_archive_source(path) -> bool:
+    return archive_kind(path) is not None and os.path.isfile(path)
+
+def source_label(src: Path) -> str:
+    # folder name, or the archive name without .zip / .tar.gz
+    name = src.name
+    for suffix in ZIP_SUFFIXES + TAR_SUFFIXES:
+        if name.lower().endswith(suffix) and archive_kind(src):
+            return name[:-len(suffix)]
+    return name
+
+def split_member(path: str) -> tuple[str, str] | None:
+    archive, sep, member = path.partition(ARCHIVE_SEP)
+    return (archive, member) if sep else None
+
+def member_random_access(path: str) -> bool:
+    # a member of a compressed tar can only be reached by decompressing everything before it
+    member = split_member(path)
+    return member is None or archive_kind(member[0]) == "zip"
+
+def _zip_mtime(info: zipfile.ZipInfo) -> float:
+    try:
+        return time.mktime(info.date_time + (0, 0, -1))
+    except (OverflowError, ValueError):
+        return 0.0
+
+def scan_archive(archive: Path) -> list[FoundFile]:
+    # relevant members without extracting: zip from the central directory, tar from the member
+    # headers (a .tar.gz is decompressed once for that, nothing is written)
+    try:
+        if archive_kind(archive) == "zip":
+            with zipfile.ZipFile(archive) as zf:
+                members = [(i.filename, i.file_size, _zip_mtime(i)) for i in zf.infolist() if not i.is_dir()]
+        else:
+            with tarfile.open(archive, "r:*") as tf:
+                members = [(m.name, m.size, float(m.mtime)) for m in tf if m.isfile()]
+    except (OSError, zipfile.BadZipFile, tarfile.TarError, EOFError):
+        return []
+    files = []
+    for member, size, mtime in members:
+        name = member.rsplit("/", 1)[-1]
+        dot = name.rfind(".")
+        if dot <= 0:
+            continue
+        ext = name[dot:].lower()
+        if ext in RELEVANT_EXTS:
+            files.append(FoundFile(f"{archive}{ARCHIVE_SEP}{member}", name, ext, size, mtime))
+    return files
+
+def _scan_archive_task(path: str):
+    return scan_archive(Path(path)), []
+
+ARCHIVE_READERS_MAX = 8
+
+class _MemberReader:
+    # read() of one tar member: a file handle limited to the member bytes (+ the container to close)
+    def __init__(self, fp, size: int, owner=None):
+        self._fp = fp
+        self._left = size
+        self._owner = owner
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0 or n > self._left:
+            n = self._left
+        data = self._fp.read(n)
+        self._left -= len(data)
+        return data
+
+    def close(self):
+        self._fp.close()
+        if self._owner is not None:
+            self._owner.close()
+
+class _ArchiveReader:
+    # one parsed archive shared by all random member reads (RSC7 headers, digests, .meta rewrites):
+    # the zip central directory / tar index is read once instead of once per member
+    def __init__(self, archive: str, key: tuple):
+        self.archive = archive
+        self.key = key
+        self.users = 0
+        self.stale = False
+        self.zip = None
+        self.index = None
+        if archive_kind(archive) == "zip":
+            self.zip = zipfile.ZipFile(archive)
+        else:
+            try:
+                with tarfile.open(archive, "r:") as tf:
+                    self.index = {m.name: (m.offset_data, m.size) for m in tf if m.isfile()}
+            except tarfile.ReadError:
+                pass  # compressed tar: no random access, every read decompresses up to the member
+
+    def open(self, name: str):
+        if self.zip is not None:
+            return self.zip.open(name)
+        if self.index is not None:
+            offset, size = self.index[name]
+            fp = open(self.archive, "rb")
+            fp.seek(offset)
+            return _MemberReader(fp, size)
+        container = tarfile.open(self.archive, "r:*")
+        try:
+            info = container.getmember(name)
+            fp = container.extractfile(info)
+            if fp is None:
+                raise KeyError(name)
+        except BaseException:
+            container.close()
+            raise
+        return _MemberReader(fp, info.size, container)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+
+_archive_readers: dict[str, _ArchiveReader] = {}
+_archive_readers_lock = threading.Lock()
+
+def _acquire_archive_reader(archive: str) -> _ArchiveReader:
+    st = os.stat(archive)
+    key = (st.st_size, st.st_mtime_ns)
+    with _archive_readers_lock:
+        reader = _archive_readers.pop(archive, None)
+        if reader is not None and reader.key == key:
+            _archive_readers[archive] = reader  # most recently used last
+            reader.users += 1
+            return reader
+        if reader is not None:
+            _retire_archive_reader(reader)
+    reader = _ArchiveReader(archive, key)
+    with _archive_readers_lock:
+        other = _archive_readers.get(archive)
+        if other is not None and other.key == key:
+            reader.close()  # another thread parsed it first
+            reader = other
+        else:
+            if other is not None:
+                _retire_archive_reader(_archive_readers.pop(archive))
+            _archive_readers[archive] = reader
+            idle = [r for r in _archive_readers.values() if r.users == 0 and r is not reader]
+            for old in idle[:max(0, len(_archive_readers) - ARCHIVE_READERS_MAX)]:
+                _retire_archive_reader(_archive_readers.pop(old.archive))
+        reader.users += 1
+        return reader
+
+def _retire_archive_reader(reader: _ArchiveReader):
+    # caller holds the lock; a reader in use is closed by its last user
+    if reader.users:
+        reader.stale = True
+    else:
+        reader.close()
+
+def _release_archive_reader(reader: _ArchiveReader):
+    with _archive_readers_lock:
+        reader.users -= 1
+        if reader.users == 0 and reader.stale:
+            reader.close()
+
+def close_archive_readers():
+    # end of a build: no open handles stay on the source archives (Windows could not move/delete them)
+    with _archive_readers_lock:
+        for reader in list(_archive_readers.values()):
+            _retire_archive_reader(reader)
+        _archive_readers.clear()
+
+@contextmanager
+def open_source(path: str):
+    # binary reader for a source file or an archive member
+    member = split_member(path)
+    if member is None:
+        with open(path, "rb") as fp:
+            yield fp
+        return
+    archive, name = member
+    try:
+        reader = _acquire_archive_reader(archive)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise OSError(errno.EINVAL, f"Archiv nicht lesbar ({e})", path) from e
+    try:
+        try:
+            fp = reader.open(name)
+        except (KeyError, zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            raise OSError(errno.ENOENT, f"nicht im Archiv ({e})", path) from e
+        try:
+            yield fp
+        finally:
+            fp.close()
+    finally:
+        _release_archive_reader(reader)
+
+@functools.lru_cache(maxsize=16)
+def _archive_listing(archive: str, size: int, mtime: float) -> dict[str, tuple[int, float]]:
+    return {split_member(f.path)[1]: (f.size, f.mtime) for f in scan_archive(Path(archive))}
+
+def source_stat(path: str) -> tuple[int, float]:
+    # (size, mtime) of a source file or archive member; OSError if it is gone
+    member = split_member(path)
+    if member is None:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime
+    st = os.stat(member[0])
+    hit = _archive_listing(member[0], st.st_size, st.st_mtime).get(member[1])
+    if hit is None:
+        raise FileNotFoundError(errno.ENOENT, "nicht im Archiv", path)
+    return hit
+
+def source_exists(path: str) -> bool:
+    try:
+        source_stat(path)
+        return True
+    except OSError:
+        return False
+
+class _DirNode:
+    __slots__ = ("files", "children")
+
+    def __init__(self):
+        self.files = []
+        self.children = []
+
+def _flatten_tree(root: _DirNode) -> list[FoundFile]:
+    # pre-order like os.walk(topdown=True) -> same job order as a serial walk
+    out = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        out.extend(node.files)
+        stack.extend(reversed(node.children))
+    return out
+
+def scan_sources(sources, workers: int = DEFAULT_SCAN_WORKERS, should_stop=None) -> list[list[FoundFile]]:
+    # every directory of every source is a pool task, so one huge source is parallel too
+    roots = [_DirNode() for _ in sources]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {pool.submit(_scan_archive_task if is_archive_source(src) else _scan_dir, str(src)): node
+                   for src, node in zip(sources, roots)}
+        while pending:
+            if should_stop and should_stop():
+                for fut in pending:
+                    fut.cancel()
+                break
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for fut in done:
+                node = pending.pop(fut)
+                files, subdirs = fut.result()
+                node.files = files
+                for d in subdirs:
+                    child = _DirNode()
+                    node.children.append(child)
+                    pending[pool.submit(_scan_dir, d)] = child
+    return [_flatten_tree(r) for r in roots]
+
+def iter_scan_sources(sources, workers: int = DEFAULT_SCAN_WORKERS, should_stop=None, ahead: int = SCAN_AHEAD):
+    # like scan_sources, but yields (src, files) in source order as soon as a source's tree is complete;
+    # a producer thread keeps the directory pool busy, at most `ahead` finished sources wait for the consumer
+    sources = list(sources)
+    out: queue.Queue = queue.Queue()
+    slots = threading.Semaphore(max(1, ahead))
+    closed = threading.Event()
+
+    def stopped() -> bool:
+        return closed.is_set() or bool(should_stop and should_stop())
+
+    def produce():
+        roots = [_DirNode() for _ in sources]
+        open_dirs = [0] * len(sources)
+        finished = {}
+        started = emitted = 0
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                while emitted < len(sources):
+                    if stopped():
+                        for fut in pending:
+                            fut.cancel()
+                        break
+                    # admit the next sources while the consumer is not too far behind
+                    while started < len(sources) and slots.acquire(blocking=False):
+                        src = sources[started]
+                        task = _scan_archive_task if is_archive_source(src) else _scan_dir
+                        pending[pool.submit(task, str(src))] = (started, roots[started])
+                        open_dirs[started] = 1
+                        started += 1
+                    if not pending:
+                        time.sleep(0.05)
+                        continue
+                    done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        idx, node = pending.pop(fut)
+                        files, subdirs = fut.result()
+                        node.files = files
+                        for d in subdirs:
+                            child = _DirNode()
+                            node.children.append(child)
+                            pending[pool.submit(_scan_dir, d)] = (idx, child)
+                        open_dirs[idx] += len(subdirs) - 1
+                        if open_dirs[idx] == 0:
+                            finished[idx] = _flatten_tree(roots[idx])
+                            roots[idx] = None
+                    while emitted in finished:
+                        out.put((sources[emitted], finished.pop(emitted)))
+                        emitted += 1
+        except BaseException as e:
+            out.put(e)
+        out.put(None)
+
+    producer = threading.Thread(target=produce, name="scan", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = out.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            slots.release()
+            yield item
+    finally:
+        closed.set()
+        producer.join()
+
+def collect_relevant_files(src: Path, workers: int = DEFAULT_SCAN_WORKERS) -> list[FoundFile]:
+    return scan_sources([src], workers=workers)[0]
+
+class ScanCache:
+    # batch builds: a source used by several resources is scanned once; a job that needs a source
+    # another job is scanning right now waits for that result instead of scanning it again
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: dict[str, Future] = {}
+
+    def scan(self, sources, workers: int = DEFAULT_SCAN_WORKERS, should_stop=None) -> list[list[FoundFile]]:
+        mine = []
+        futures = []
+        with self._lock:
+            for src in sources:
+                key = source_key(str(src))
+                fut = self._results.get(key)
+                if fut is None:
+                    fut = self._results[key] = Future()
+                    mine.append((src, key, fut))
+                futures.append(fut)
+        if mine:
+            try:
+                scanned = scan_sources([src for src, _, _ in mine], workers=workers, should_stop=should_stop)
+                if should_stop and should_stop():
+                    raise BuildStopped()
+            except BaseException as e:
+                # incomplete -> not cached, the next job scans again
+                with self._lock:
+                    for _, key, fut in mine:
+                        del self._results[key]
+                        fut.set_exception(e)
+                raise
+            for (_, _, fut), files in zip(mine, scanned):
+                fut.set_result(files)
+        # FoundFile is immutable, the lists are not -> every job gets its own
+        return [list(fut.result()) for fut in futures]
+
+def dedupe_nested_sources(sources):
+    # drops exact duplicates and sources lying inside another selected source
+    # (an archive inside a selected folder is not part of that folder's scan -> kept)
+    keyed = []
+    for src in sources:
+        p = Path(src).resolve()
+        keyed.append((p, Path(os.path.normcase(str(p)))))
+
+    kept = []
+    skipped = []
+    by_depth = sorted(range(len(keyed)), key=lambda i: len(keyed[i][1].parts))
+    kept_keys = []
+    keep_idx = set()
+    for i in by_depth:
+        p, key = keyed[i]
+        if any(key == k or (k in key.parents and not is_archive_source(p)) for k in kept_keys):
+            skipped.append(p)
+            continue
+        kept_keys.append(key)
+        keep_idx.add(i)
+
+    for i, (p, _) in enumerate(keyed):
+        if i in keep_idx:
+            kept.append(p)
+    return kept, skipped
 
 def normalize_dnd_paths(dnd_string: str):
     s = dnd_string.strip()
@@ -148,114 +781,3431 @@ def build_fxmanifest_block(resource_name: str, files_paths: list[str], data_file
         lines.append("}")
         lines.append("")
 
-    if data_files:
-        lines.append("-- Detected meta mapping (best effort):")
-        for t, p in sorted(set(data_files)):
-            lines.append(f"data_file '{t}' '{p}'")
-        lines.append("")
+    if data_files:
+        lines.append("-- Detected meta mapping (best effort):")
+        for t, p in sorted(set(data_files)):
+            lines.append(f"data_file '{t}' '{p}'")
+        lines.append("")
+
+    if unknown:
+        lines.append("-- Unclassified data files (loaded via files{}, may still need manual data_file mapping for some packs):")
+        for p in sorted(set(unknown)):
+            lines.append(f"--   {p}")
+        lines.append("")
+
+    lines.append(f"-- Add to server.cfg: ensure {resource_name}")
+    lines.append("-- === End auto-added block ===")
+    lines.append("")
+    return "\n".join(lines)
+
+FX_BLOCK_START = "-- === Auto-added by"
+FX_BLOCK_END = "-- === End auto-added block ==="
+MANIFEST_INDEX_FILE = ".packbuilder_manifest_index.json"
+_FX_OWN_HEADER = re.compile(r"^-- (Auto-generated by .*|Resource: \S+|Generated: \S+)$")
+
+def fxmanifest_base_header(resource_name: str) -> str:
+    base = []
+    base.append("fx_version 'cerulean'")
+    base.append("game 'gta5'")
+    base.append("")
+    base.append(f"-- Auto-generated by {APP_TITLE} {APP_VERSION}")
+    base.append(f"-- Resource: {resource_name}")
+    base.append(f"-- Generated: {datetime.now().isoformat(timespec='seconds')}")
+    base.append("")
+    return "\n".join(base)
+
+def _path_covered(path: str, exact: set, patterns: list) -> bool:
+    # exact entry or covered by a glob entry like 'data/*.meta'
+    return path in exact or any(fnmatch.fnmatchcase(path, g) for g in patterns)
+
+def _load_manifest_index(dst_root: Path, fx: Path):
+    try:
+        st = fx.stat()
+        data = json.loads((dst_root / MANIFEST_INDEX_FILE).read_text(encoding="utf-8"))
+        if data.get("size") == st.st_size and data.get("mtime_ns") == st.st_mtime_ns:
+            return set(data["files"]), {tuple(x) for x in data["data_files"]}
+    except Exception:
+        pass
+    return None
+
+def _save_manifest_index(dst_root: Path, fx: Path, files_set: set, datafile_set: set):
+    try:
+        st = fx.stat()
+        data = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "files": sorted(files_set), "data_files": sorted(datafile_set)}
+        (dst_root / MANIFEST_INDEX_FILE).write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    except OSError:
+        pass
+
+def manifest_entries(dst_root: Path, fx: Path):
+    # (files, data_files) of fxmanifest.lua: from the index while the manifest is
+    # unchanged since our last write, otherwise parsed once and re-indexed
+    cached = _load_manifest_index(dst_root, fx)
+    if cached is not None:
+        return cached
+    old_files, old_datafiles = parse_fxmanifest_existing(fx.read_text(encoding="utf-8", errors="ignore"))
+    _save_manifest_index(dst_root, fx, old_files, old_datafiles)
+    return old_files, old_datafiles
+
+def split_fxmanifest(text: str):
+    # -> (user lines, auto-added block text); unterminated blocks stay user text
+    user = []
+    auto = []
+    block = None
+    for line in text.splitlines():
+        if block is None and line.startswith(FX_BLOCK_START):
+            block = [line]
+        elif block is not None:
+            block.append(line)
+            if line.strip() == FX_BLOCK_END:
+                auto.extend(block)
+                block = None
+        else:
+            user.append(line)
+    if block is not None:
+        user.extend(block)
+    return user, "\n".join(auto)
+
+def _classify_for_manifest(dst_root: Path, data_rel_paths: list[str]):
+    detected = []
+    unknown = []
+    types = classify_data_files(dst_root, data_rel_paths)
+    for rp in data_rel_paths:
+        t = types.get(rp)
+        if t:
+            detected.append((t, rp))
+        else:
+            unknown.append(rp)
+    return detected, unknown
+
+def compact_fxmanifest(dst_root: Path, resource_name: str, data_rel_paths: list[str], log_fn, use_globs: bool = True):
+    # one canonical, sorted auto block for everything in data/ (+ still existing old entries);
+    # user-written lines outside the auto blocks are kept as they are
+    fx = dst_root / "fxmanifest.lua"
+    old_text = fx.read_text(encoding="utf-8", errors="ignore") if fx.exists() else ""
+    user_lines, auto_text = split_fxmanifest(old_text)
+    user_lines = [l.rstrip() for l in user_lines if not _FX_OWN_HEADER.match(l.strip())]
+    user_files, user_datafiles = parse_fxmanifest_existing("\n".join(user_lines))
+    old_files, _ = parse_fxmanifest_existing(auto_text)
+
+    on_disk = {}
+    try:
+        with os.scandir(dst_root / "data") as it:
+            for entry in it:
+                ext = os.path.splitext(entry.name)[1].lower()
+                if ext in DATA_EXTS and entry.is_file():
+                    on_disk[f"data/{entry.name}"] = ext
+    except OSError:
+        pass
+
+    listed = set(on_disk)
+    for p in list(old_files) + list(data_rel_paths):
+        if "*" not in p and p not in listed and (dst_root / p).is_file() and Path(p).suffix.lower() in DATA_EXTS:
+            listed.add(p)
+    listed = sorted(p for p in listed if p not in user_files)
+
+    detected, unknown = _classify_for_manifest(dst_root, listed)
+    detected = [(t, p) for t, p in detected if (t, p) not in user_datafiles]
+
+    files_entries = listed
+    globbed = 0
+    if use_globs:
+        # 'data/*.ext' when every file of that extension in data/ is listed here
+        files_entries = []
+        for ext in sorted(DATA_EXTS):
+            group = [p for p in listed if on_disk.get(p) == ext]
+            if len(group) > 1 and len(group) == sum(1 for e in on_disk.values() if e == ext):
+                files_entries.append(f"data/*{ext}")
+                globbed += len(group) - 1
+            else:
+                files_entries.extend(group)
+        files_entries.extend(p for p in listed if p not in on_disk)
+    # data_file lines stay explicit: a 'data/*.meta' mapping would also claim later
+    # merged .meta files of another type
+
+    while user_lines and not user_lines[-1]:
+        user_lines.pop()
+    head = []
+    if not any(l.startswith("fx_version") for l in user_lines):
+        head.append("fx_version 'cerulean'")
+    if not any(l.startswith("game") for l in user_lines):
+        head.append("game 'gta5'")
+    collapsed = []
+    for l in head + user_lines:
+        if l or (collapsed and collapsed[-1]):
+            collapsed.append(l)
+    collapsed += ["", f"-- Auto-generated by {APP_TITLE} {APP_VERSION} (compacted)",
+                  f"-- Resource: {resource_name}",
+                  f"-- Generated: {datetime.now().isoformat(timespec='seconds')}", ""]
+
+    block = build_fxmanifest_block(resource_name, files_entries, detected, unknown)
+    tmp = fx.with_name(fx.name + ".tmp")
+    tmp.write_text("\n".join(collapsed) + block, encoding="utf-8")
+    os.replace(tmp, fx)
+
+    files_set, datafile_set = parse_fxmanifest_existing(fx.read_text(encoding="utf-8", errors="ignore"))
+    _save_manifest_index(dst_root, fx, files_set, datafile_set)
+    before = old_text.count("\n")
+    after = fx.read_text(encoding="utf-8", errors="ignore").count("\n")
+    log_fn(f"✅ fxmanifest.lua kompaktiert: {before} → {after} Zeilen ({len(listed)} Dateien, {globbed} per Glob zusammengefasst).")
+
+_FX_ENTRY_PATH = re.compile(r"""['"]([^'"]+)['"],?$|^--\s+(\S+)$""")
+
+def remove_fxmanifest_entries(dst_root: Path, rel_paths: list[str], log_fn):
+    # deleted data files: only their lines inside the auto-added blocks go (files{} entry,
+    # data_file line, unclassified note); everything else stays as it is
+    fx = dst_root / "fxmanifest.lua"
+    gone = {p.replace("\\", "/") for p in rel_paths}
+    if not gone or not fx.exists():
+        return
+    lines = []
+    removed = 0
+    in_block = False
+    for line in fx.read_text(encoding="utf-8", errors="ignore").splitlines(keepends=True):
+        stripped = line.strip()
+        if not in_block and stripped.startswith(FX_BLOCK_START):
+            in_block = True
+        elif in_block and stripped == FX_BLOCK_END:
+            in_block = False
+        elif in_block:
+            m = _FX_ENTRY_PATH.search(stripped)
+            if m and (m.group(1) or m.group(2)).replace("\\", "/") in gone:
+                removed += 1
+                continue
+        lines.append(line)
+    if not removed:
+        return
+    tmp = fx.with_name(fx.name + ".tmp")
+    tmp.write_text("".join(lines), encoding="utf-8")
+    os.replace(tmp, fx)
+    files_set, datafile_set = parse_fxmanifest_existing("".join(lines))
+    _save_manifest_index(dst_root, fx, files_set, datafile_set)
+    log_fn(f"✅ fxmanifest.lua: {removed} Zeilen gelöschter Dateien entfernt.")
+
+def write_or_extend_fxmanifest(dst_root: Path, resource_name: str, data_rel_paths: list[str], log_fn,
+                               compact: bool = False, use_globs: bool = True):
+    fx = dst_root / "fxmanifest.lua"
+    if compact:
+        compact_fxmanifest(dst_root, resource_name, data_rel_paths, log_fn, use_globs=use_globs)
+        return
+
+    detected, unknown = _classify_for_manifest(dst_root, data_rel_paths)
+    new_files = list(data_rel_paths)
+
+    if fx.exists():
+        old_files, old_datafiles = manifest_entries(dst_root, fx)
+        file_globs = [p for p in old_files if "*" in p]
+        data_globs = {}
+        for t, p in old_datafiles:
+            if "*" in p:
+                data_globs.setdefault(t, []).append(p)
+
+        truly_new_files = sorted(p for p in set(new_files) if not _path_covered(p, old_files, file_globs))
+        truly_new_datafiles = sorted(d for d in set(detected)
+                                     if d not in old_datafiles and not _path_covered(d[1], set(), data_globs.get(d[0], [])))
+        truly_new_unknown = sorted(p for p in set(unknown) if not _path_covered(p, old_files, file_globs))
+
+        if not truly_new_files and not truly_new_datafiles and not truly_new_unknown:
+            log_fn("ℹ️ fxmanifest.lua: nichts Neues hinzuzufügen (alles schon vorhanden).")
+            return
+
+        block = build_fxmanifest_block(resource_name, truly_new_files, truly_new_datafiles, truly_new_unknown)
+        # append instead of rewriting the whole (possibly huge) manifest
+        with fx.open("rb+") as fp:
+            fp.seek(0, os.SEEK_END)
+            needs_newline = False
+            if fp.tell():
+                fp.seek(-1, os.SEEK_END)
+                needs_newline = fp.read(1) != b"\n"
+            fp.write((("\n" if needs_newline else "") + block).encode("utf-8"))
+        _save_manifest_index(dst_root, fx, old_files | set(truly_new_files) | set(truly_new_unknown),
+                             old_datafiles | set(truly_new_datafiles))
+        log_fn("✅ fxmanifest.lua erweitert (append).")
+    else:
+        block = build_fxmanifest_block(resource_name, new_files, detected, unknown)
+        fx.write_text(fxmanifest_base_header(resource_name) + block, encoding="utf-8")
+        files_set, datafile_set = parse_fxmanifest_existing(fx.read_text(encoding="utf-8", errors="ignore"))
+        _save_manifest_index(dst_root, fx, files_set, datafile_set)
+        log_fn("✅ fxmanifest.lua erstellt (neu).")
+
+def settings_path():
+    return Path.home() / "fivem_pack_builder_settings.json"
+
+def load_settings():
+    p = settings_path()
+    if p.exists():
+        try:
+            return json.loads(p.read_text(encoding="utf-8", errors="ignore"))
+        except Exception:
+            return {}
+    return {}
+
+def save_settings(data: dict):
+    p = settings_path()
+    try:
+        p.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    except Exception:
+        pass
+
+class BuildStopped(Exception):
+    pass
+
+def _remove_quiet(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _unlink_target(dst: str):
+    # an existing target may be a hardlink of its source (--transfer hardlink): opening it with "wb"
+    # would truncate the source before it is read, so the old name goes first
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+def copy_file_chunked(src: str, dst: str, should_stop=None, chunk_size: int = COPY_CHUNK_SIZE, hasher=None) -> int:
+    # like shutil.copy2, but cancellable between chunks; a partial dst is removed
+    copied = 0
+    with open(src, "rb") as fi:
+        try:
+            with open(dst, "wb") as fo:
+                buf = bytearray(chunk_size)
+                view = memoryview(buf)
+                while True:
+                    if should_stop is not None and should_stop():
+                        raise BuildStopped()
+                    n = fi.readinto(buf)
+                    if not n:
+                        break
+                    fo.write(view[:n])
+                    if hasher is not None:
+                        hasher.update(view[:n])
+                    copied += n
+            shutil.copystat(src, dst)
+        except BaseException:
+            _remove_quiet(dst)
+            raise
+    return copied
+
+def copy_stream(fi, dst: str, mtime: float, should_stop=None, chunk_size: int = COPY_CHUNK_SIZE, hasher=None) -> int:
+    # an open reader (archive member) into dst, cancellable between chunks; dst gets the member mtime
+    copied = 0
+    _unlink_target(dst)
+    try:
+        with open(dst, "wb") as fo:
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            while True:
+                if should_stop is not None and should_stop():
+                    raise BuildStopped()
+                n = fi.readinto(buf)
+                if not n:
+                    break
+                fo.write(view[:n])
+                if hasher is not None:
+                    hasher.update(view[:n])
+                copied += n
+        if mtime:
+            os.utime(dst, (mtime, mtime))
+    except BaseException:
+        _remove_quiet(dst)
+        raise
+    return copied
+
+def write_bytes_atomic(path: str | Path, data: bytes):
+    # os.replace swaps the name only, a hardlinked source behind the old target stays untouched
+    tmp = f"{path}.part"
+    try:
+        with open(tmp, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        _remove_quiet(tmp)
+        raise
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+def file_digest(path: str, chunk_size: int = COPY_CHUNK_SIZE) -> str:
+    h = new_hasher()
+    with open_source(path) as fp:
+        while True:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+class ContentDeduper:
+    # size check first, hash only when sizes match; hashes are cached per path
+    def __init__(self):
+        self._hashes: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def _digest(self, path: str) -> str:
+        with self.lock:
+            h = self._hashes.get(path)
+        if h is None:
+            h = file_digest(path)
+            with self.lock:
+                self._hashes[path] = h
+        return h
+
+    def same(self, path_a: str, size_a: int | None, path_b: str, size_b: int | None) -> bool:
+        try:
+            if size_a is None:
+                size_a = os.path.getsize(path_a)
+            if size_b is None:
+                size_b = os.path.getsize(path_b)
+            if size_a != size_b:
+                return False
+            if not (member_random_access(path_a) and member_random_access(path_b)):
+                return False
+            return self._digest(path_a) == self._digest(path_b)
+        except OSError:
+            return False
+
+# ---------- RSC7 streaming budget ----------
+RSC7_MAGIC = b"RSC7"
+RSC7_HEADER_SIZE = 16
+BUDGET_REPORT = "streaming_budget.txt"
+# resource versions the game loads per extension
+RSC7_VERSIONS = {".ydr": 165, ".ydd": 165, ".yft": 162, ".ytd": 13, ".ybn": 43, ".ymap": 2, ".ytyp": 2}
+# FiveM warns about single assets above 16 MiB ("oversized assets")
+DEFAULT_BUDGET = {"asset_mb": 16.0, "source_mb": 512.0, "resource_mb": 1024.0, "top": 15}
+
+class AssetInfo(NamedTuple):
+    path: str
+    name: str
+    size: int
+    version: int
+    virtual: int
+    physical: int
+    problem: str | None
+
+def rsc7_flags_size(flags: int) -> int:
+    # page counts per size class (bits 4..27) * base page size (0x200 << bits 0..3)
+    pages = (((flags >> 27) & 0x1)
+             + (((flags >> 26) & 0x1) << 1)
+             + (((flags >> 25) & 0x1) << 2)
+             + (((flags >> 24) & 0x1) << 3)
+             + (((flags >> 17) & 0x7F) << 4)
+             + (((flags >> 11) & 0x3F) << 5)
+             + (((flags >> 7) & 0xF) << 6)
+             + (((flags >> 5) & 0x3) << 7)
+             + (((flags >> 4) & 0x1) << 8))
+    return (0x200 << (flags & 0xF)) * pages
+
+def read_rsc7_header(f: FoundFile) -> AssetInfo:
+    # only the 16 header bytes are read: magic, version, system (virtual) + graphics (physical) flags
+    try:
+        with open_source(f.path) as fp:
+            head = fp.read(RSC7_HEADER_SIZE)
+    except OSError as e:
+        return AssetInfo(f.path, f.name, f.size, 0, 0, 0, f"nicht lesbar: {e}")
+    if head[:4] != RSC7_MAGIC:
+        return AssetInfo(f.path, f.name, f.size, 0, 0, 0, f"kein RSC7 (Magic {head[:4]!r})")
+    if len(head) < RSC7_HEADER_SIZE or f.size <= RSC7_HEADER_SIZE:
+        return AssetInfo(f.path, f.name, f.size, 0, 0, 0, "abgeschnitten (Header ohne Daten)")
+    version = int.from_bytes(head[4:8], "little")
+    virtual = rsc7_flags_size(int.from_bytes(head[8:12], "little"))
+    physical = rsc7_flags_size(int.from_bytes(head[12:16], "little"))
+    problem = None
+    if virtual == 0:
+        problem = "ungültige Flags (virtuelle Größe 0)"
+    elif RSC7_VERSIONS.get(f.ext) not in (None, version):
+        problem = f"Version {version} statt {RSC7_VERSIONS[f.ext]}"
+    return AssetInfo(f.path, f.name, f.size, version, virtual, physical, problem)
+
+def analyze_stream_files(jobs, workers: int = DEFAULT_SCAN_WORKERS, should_stop=None) -> list[tuple[Path, AssetInfo]]:
+    # (source, FoundFile) jobs -> (source, AssetInfo) for every stream file;
+    # members of compressed tars are skipped (each header would mean decompressing up to it)
+    stream_jobs = [(src, f) for src, f in jobs if f.ext in STREAM_EXTS and member_random_access(f.path)]
+    if not stream_jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(stream_jobs)))) as pool:
+        infos = list(pool.map(lambda job: None if should_stop and should_stop() else read_rsc7_header(job[1]),
+                              stream_jobs, chunksize=64))
+    if should_stop and should_stop():
+        raise BuildStopped()
+    return [(src, info) for (src, _), info in zip(stream_jobs, infos)]
+
+def _mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} MB"
+
+def write_budget_report(dst_root: Path, resource_name: str, analyzed, budget: dict) -> dict:
+    # per-resource + per-source totals, oversized/broken assets and the largest ones -> BUDGET_REPORT
+    mib = 1024 * 1024
+    asset_limit = budget["asset_mb"] * mib
+    source_limit = budget["source_mb"] * mib
+    resource_limit = budget["resource_mb"] * mib
+
+    per_source = {}
+    oversized = []
+    broken = []
+    for src, info in analyzed:
+        totals = per_source.setdefault(src, [0, 0, 0])
+        totals[0] += 1
+        if info.problem:
+            # sizes of a broken header come from garbage flag words: count the file, not its bytes
+            broken.append((src, info))
+            continue
+        totals[1] += info.virtual
+        totals[2] += info.physical
+        if info.physical > asset_limit or info.virtual > asset_limit:
+            oversized.append((src, info))
+
+    virtual = sum(t[1] for t in per_source.values())
+    physical = sum(t[2] for t in per_source.values())
+    sources_over = [src for src, t in per_source.items() if t[1] + t[2] > source_limit]
+    resource_over = virtual + physical > resource_limit
+    largest = sorted((x for x in analyzed if not x[1].problem),
+                     key=lambda x: x[1].virtual + x[1].physical, reverse=True)[:int(budget["top"])]
+
+    lines = [
+        f"=== Streaming-Budget {resource_name} ({datetime.now().isoformat(timespec='seconds')}) ===",
+        f"Grenzen: Asset {budget['asset_mb']:g} MB, Source {budget['source_mb']:g} MB, "
+        f"Resource {budget['resource_mb']:g} MB (virtuell + physisch)",
+        "",
+        f"Resource: {len(analyzed)} Stream-Dateien, virtuell {_mb(virtual)}, physisch {_mb(physical)}, "
+        f"gesamt {_mb(virtual + physical)}" + ("  ⚠️ ÜBER LIMIT" if resource_over else ""),
+        "",
+        "Pro Source:",
+    ]
+    for src, (count, v, p) in sorted(per_source.items(), key=lambda x: x[1][1] + x[1][2], reverse=True):
+        flag = "  ⚠️ ÜBER LIMIT" if src in sources_over else ""
+        lines.append(f"  {src.name}: {count} Dateien, virtuell {_mb(v)}, physisch {_mb(p)}, gesamt {_mb(v + p)}{flag}")
+
+    lines += ["", f"Zu große Assets (> {budget['asset_mb']:g} MB): {len(oversized)}"]
+    for src, info in sorted(oversized, key=lambda x: x[1].physical + x[1].virtual, reverse=True):
+        lines.append(f"  {info.name}  physisch {_mb(info.physical)}, virtuell {_mb(info.virtual)}  ({src.name})")
+
+    lines += ["", f"Defekt / kein RSC7: {len(broken)}"]
+    for src, info in broken:
+        lines.append(f"  {info.name}: {info.problem}  ({info.path})")
+
+    lines += ["", f"Größte Assets (Top {len(largest)}):"]
+    for src, info in largest:
+        lines.append(f"  {_mb(info.virtual + info.physical):>10}  {info.name}  "
+                     f"(physisch {_mb(info.physical)}, virtuell {_mb(info.virtual)}, v{info.version}, {src.name})")
+
+    (dst_root / BUDGET_REPORT).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return {
+        "virtual": virtual,
+        "physical": physical,
+        "oversized": oversized,
+        "broken": broken,
+        "sources_over": sources_over,
+        "resource_over": resource_over,
+    }
+
+# ---------- Build log ----------
+BUILD_LOG = "builder.log"
+BUILD_JSONL = "builder.jsonl"
+LOG_BUFFER_SIZE = 256 * 1024
+LOG_FLUSH_SECS = 2.0
+PROFILE_FILE = "builder.prof"
+SLOWEST_FILES = 10
+
+class BuildLog:
+    # one buffered handle for the whole build (opened on first write), flushed every
+    # LOG_FLUSH_SECS; record() adds machine-readable JSON lines to builder.jsonl
+    def __init__(self, dst_root: Path, json_lines: bool = False, enabled: bool = True):
+        self.dst_root = dst_root
+        self.json_lines = json_lines and enabled
+        self._fp = None
+        self._jp = None
+        self._broken = not enabled
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+
+    def _open(self, name: str):
+        try:
+            return open(self.dst_root / name, "a", encoding="utf-8", buffering=LOG_BUFFER_SIZE)
+        except OSError:
+            self._broken = True
+            return None
+
+    def _maybe_flush(self):
+        now = time.time()
+        if now - self._last_flush >= LOG_FLUSH_SECS:
+            self._last_flush = now
+            for fp in (self._fp, self._jp):
+                if fp is not None:
+                    fp.flush()
+
+    def write(self, msg: str):
+        with self._lock:
+            if self._fp is None and not self._broken:
+                self._fp = self._open(BUILD_LOG)
+            if self._fp is None:
+                return
+            try:
+                self._fp.write(msg + "\n")
+                self._maybe_flush()
+            except Exception:
+                pass
+
+    def record(self, event: str, **fields):
+        if not self.json_lines:
+            return
+        fields = {"ts": round(time.time(), 3), "event": event, **fields}
+        line = json.dumps(fields, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._jp is None:
+                self._jp = self._open(BUILD_JSONL)
+            if self._jp is None:
+                return
+            try:
+                self._jp.write(line + "\n")
+                self._maybe_flush()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            for fp in (self._fp, self._jp):
+                if fp is not None:
+                    try:
+                        fp.close()
+                    except Exception:
+                        pass
+            self._fp = None
+            self._jp = None
+
+# ---------- Build metrics ----------
+def format_phases(phases: dict) -> str:
+    return " | ".join(f"{k} {v:.2f}s" for k, v in phases.items())
+
+def format_eta(bytes_done: int, bytes_total: int, elapsed: float) -> str:
+    # "310.2 / 1024.0 MB · 45.1 MB/s · noch 0:16" (rate and ETA by bytes, not by file count)
+    mb = 1024 * 1024
+    text = f"{bytes_done / mb:.1f} / {bytes_total / mb:.1f} MB"
+    if bytes_done <= 0 or elapsed <= 0:
+        return text
+    rate = bytes_done / elapsed
+    h, rest = divmod(int(max(bytes_total - bytes_done, 0) / rate), 3600)
+    m, sec = divmod(rest, 60)
+    eta = f"{h}:{m:02d}:{sec:02d}" if h else f"{m}:{sec:02d}"
+    return f"{text} · {rate / mb:.1f} MB/s · noch {eta}"
+
+class BuildMetrics:
+    # wall time per phase (summed over resources/shards) + the N slowest transfers;
+    # only touched from the build thread
+    def __init__(self, slowest: int = SLOWEST_FILES):
+        self.phases: dict[str, float] = {}
+        self.slowest = slowest
+        self._files: list[tuple[float, int, str]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, secs: float):
+        self.phases[name] = self.phases.get(name, 0.0) + secs
+
+    def file(self, path: str, n: int, secs: float):
+        item = (secs, n, path)
+        if len(self._files) < self.slowest:
+            heapq.heappush(self._files, item)
+        elif secs > self._files[0][0]:
+            heapq.heapreplace(self._files, item)
+
+    def merge(self, other: "BuildMetrics"):
+        for k, v in other.phases.items():
+            self.add(k, v)
+        for secs, n, path in other._files:
+            self.file(path, n, secs)
+
+    def slowest_files(self) -> list[dict]:
+        return [{"path": path, "bytes": n, "seconds": round(secs, 4),
+                 "mb_per_s": round(n / max(secs, 1e-6) / (1024 * 1024), 2)}
+                for secs, n, path in sorted(self._files, reverse=True)]
+
+    def report_lines(self) -> list[str]:
+        lines = [f"⏱️ Phasen: {format_phases(self.phases)}"]
+        if self._files:
+            lines.append(f"🐢 Langsamste Dateien (Top {len(self._files)}):")
+            lines += [f"   {x['seconds']:8.3f}s  {x['bytes'] / (1024 * 1024):8.1f} MB  {x['mb_per_s']:8.1f} MB/s  {x['path']}"
+                      for x in self.slowest_files()]
+        return lines
+
+# ---------- Build state (incremental merge) ----------
+STATE_FILE = ".packbuilder_state.json"
+STATE_VERSION = 1
+
+def source_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+def load_build_state(dst_root: Path) -> dict:
+    # {"version", "resource", "files": {source_key: {"size", "mtime", "target", ["hash"], ["deduped"]}}}
+    p = dst_root / STATE_FILE
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+        if data.get("version") == STATE_VERSION and isinstance(data.get("files"), dict):
+            return data
+    except Exception:
+        pass
+    return {"version": STATE_VERSION, "files": {}}
+
+def save_build_state(dst_root: Path, state: dict):
+    p = dst_root / STATE_FILE
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, p)
+
+def index_output(dst_root: Path) -> dict[str, dict[str, str]]:
+    # one scandir per folder: {"stream": {lowercase name: name}, "data": {...}}
+    # names compare case-insensitively like on Windows
+    index = {"stream": {}, "data": {}}
+    for folder, names in index.items():
+        try:
+            with os.scandir(dst_root / folder) as it:
+                for entry in it:
+                    names[entry.name.lower()] = entry.name
+        except OSError:
+            pass
+    return index
+
+class PlanEntry(NamedTuple):
+    source: Path
+    file: FoundFile
+    target: Path
+    action: str            # copy | update | unchanged | dedupe | merged (.ymt of a renumbered source)
+    reason: str | None     # why the name differs from the source: renumber | duplicate | duplicate_ts
+
+class CopyJob:
+    # one planned transfer; huge plans hold many of these -> slots and str paths instead of Path objects
+    __slots__ = ("id", "source", "file", "target", "rel")
+
+    def __init__(self, job_id: int, source: Path, file: FoundFile, target: str, rel: str):
+        self.id = job_id          # journal item id
+        self.source = source      # source base, one shared object per source
+        self.file = file
+        self.target = target      # absolute target path
+        self.rel = rel            # "stream/x.ydd", relative to the output root
+
+def _name_occupant(used: dict, existing: dict, name_key: str, folder: Path):
+    # (path, size|None) of whatever already claims this name: a planned file or one in the output index
+    if name_key in used:
+        return used[name_key]
+    if name_key in existing:
+        return (str(folder / existing[name_key]), None)
+    return None
+
+def _free_name(used: dict, existing: dict, stem: str, suffix: str) -> str:
+    # <stem>_<ts()><suffix>, counted up in memory if that second is already taken
+    base = f"{stem}_{ts()}"
+    name = f"{base}{suffix}"
+    n = 2
+    while name.lower() in used or name.lower() in existing:
+        name = f"{base}_{n}{suffix}"
+        n += 1
+    return name
+
+# ---------- Build journal (resume) ----------
+JOURNAL_FILE = ".packbuilder_journal.jsonl"
+JOURNAL_VERSION = 2     # 2: plan written in chunks, "planned" once the plan is complete
+JOURNAL_BATCH = 256
+JOURNAL_FLUSH_SECS = 1.0
+
+class BuildJournal:
+    # write-ahead log of one resource build: "begin", then every plan chunk is on disk before
+    # its first copy, finished ids follow in batches (flush + fsync); deleted once the build is done
+    def __init__(self, dst_root: Path):
+        self.path = dst_root / JOURNAL_FILE
+        self._fp = None
+        self._pending: list[int] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+
+    def _write(self, obj: dict):
+        self._fp.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _sync(self):
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._last_flush = time.time()
+
+    def begin(self, header: dict, items: list):
+        # items: [source base, source path, target rel to out_root, size, mtime] per planned transfer
+        self._fp = open(self.path, "w", encoding="utf-8")
+        self._write({"op": "begin", "version": JOURNAL_VERSION, **header})
+        for i in range(0, len(items), 1000):
+            self._write({"op": "plan", "items": items[i:i + 1000]})
+        self._sync()
+
+    def plan(self, items: list, kept_data: list[str] = ()):
+        # one chunk of the pipelined plan; kept_data: unchanged data files (merge) for the fxmanifest
+        rec = {"op": "plan", "items": items}
+        if kept_data:
+            rec["kept_data"] = list(kept_data)
+        with self._lock:
+            self._write(rec)
+            self._sync()
+
+    def rewrite(self, rel: str, data: bytes):
+        # target written after the copies (merged .ymt): resume writes it again
+        with self._lock:
+            self._write({"op": "rewrite", "rel": rel, "data": data.decode("utf-8")})
+            self._sync()
+
+    def planned(self):
+        # every file of the resource is in the plan; missing on a stop during scan/plan
+        with self._lock:
+            self._write({"op": "planned"})
+            self._sync()
+
+    def reopen(self):
+        self._fp = open(self.path, "a", encoding="utf-8")
+
+    def done(self, item_id: int):
+        with self._lock:
+            self._pending.append(item_id)
+            if len(self._pending) >= JOURNAL_BATCH or time.time() - self._last_flush >= JOURNAL_FLUSH_SECS:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._fp is None or not self._pending:
+            return
+        self._write({"op": "done", "ids": self._pending})
+        self._pending = []
+        self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._fp is None:
+                return
+            try:
+                self._flush_locked()
+                self._fp.close()
+            except OSError:
+                pass
+            self._fp = None
+
+    def finish(self):
+        self.close()
+        _remove_quiet(str(self.path))
+
+def load_journal(dst_root: Path) -> dict | None:
+    # {"header", "items", "done", "kept_data", "rewrites", "complete"}; a torn last line (crash mid-write) is ignored
+    path = dst_root / JOURNAL_FILE
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    header = None
+    items = []
+    kept_data = []
+    rewrites = {}
+    done = set()
+    complete = False
+    for line in lines:
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        op = rec.get("op")
+        if op == "begin":
+            header = rec
+        elif op == "plan":
+            items.extend(rec["items"])
+            kept_data.extend(rec.get("kept_data", ()))
+        elif op == "done":
+            done.update(rec["ids"])
+        elif op == "rewrite":
+            rewrites[rec["rel"]] = rec["data"].encode("utf-8")
+        elif op == "planned":
+            complete = True
+    if header is None or header.get("version") not in (1, JOURNAL_VERSION):
+        return None
+    # version 1 journaled the whole plan up front
+    return {"header": header, "items": items, "done": done, "kept_data": header.get("kept_data", []) + kept_data,
+            "rewrites": rewrites, "complete": complete or header["version"] == 1}
+
+def shard_dirs(dst_root: Path) -> list[Path]:
+    # <name>_1..N next to dst_root, in shard order
+    shard_re = re.compile(re.escape(dst_root.name) + r"_\d+$")
+    try:
+        with os.scandir(dst_root.parent) as it:
+            shards = sorted((e.path for e in it if e.is_dir() and shard_re.match(e.name)),
+                            key=lambda p: int(p.rsplit("_", 1)[1]))
+    except OSError:
+        return []
+    return [Path(p) for p in shards]
+
+def shard_stream_names(shards, skip=()) -> dict[str, tuple[str, None]]:
+    # stream names the shards already ship -> taken for every shard of the build
+    # (the client has one global stream namespace, data/ paths stay per resource)
+    names = {}
+    for root in shards:
+        if root in skip:
+            continue
+        for key, name in index_output(root)["stream"].items():
+            names.setdefault(key, (str(root / "stream" / name), None))
+    return names
+
+def find_journals(dst_root: Path) -> list[tuple[Path, dict]]:
+    # the resource itself and its shards (<name>_1..N next to it)
+    found = []
+    journal = load_journal(dst_root)
+    if journal:
+        found.append((dst_root, journal))
+    for p in shard_dirs(dst_root):
+        journal = load_journal(p)
+        if journal:
+            found.append((p, journal))
+    return found
+
+def journal_target_done(journal: dict, item_id: int, target: Path, source_gone: bool) -> bool:
+    # journaled as done, or written by that run but not journaled yet (crash between batches):
+    # planned size + the source's mtime (copystat / hardlink) or written after the run started;
+    # a moved source no longer exists
+    _, _, _, size, mtime = journal["items"][item_id]
+    try:
+        st = os.stat(target)
+    except OSError:
+        return False
+    if st.st_size != size:
+        return False
+    return (item_id in journal["done"] or source_gone or st.st_mtime == mtime
+            or st.st_mtime >= journal["header"].get("started", 0))
+
+def _journal_file(item) -> FoundFile:
+    _, path, _, size, mtime = item
+    return FoundFile(path, os.path.basename(path), os.path.splitext(path)[1].lower(), size, mtime)
+
+# ---------- Ped components (drawable renumbering) ----------
+# <ped>[_<collection>]^<slot>_<index>[_u|_r].ydd, textures <ped>^<slot>_diff_<index>_<letter>[_uni].ytd,
+# props <ped>_p^p_<slot>_<index>.ydd / p_<slot>_diff_<index>_<letter>.ytd
+PED_SLOTS = ("head", "berd", "hair", "uppr", "lowr", "hand", "feet", "teef", "accs", "task", "decl", "jbib",
+             "p_head", "p_eyes", "p_ears", "p_mouth", "p_lhand", "p_rhand", "p_lwrist", "p_rwrist",
+             "p_hip", "p_lfoot", "p_rfoot")
+PED_ASSET_RE = re.compile(
+    r"^(?P<ped>[^^]+)\^(?P<slot>" + "|".join(PED_SLOTS) + r")_(?P<kind>(?:diff|norm|spec)_)?"
+    r"(?P<idx>\d{3})(?P<rest>(?:_[^.]*)?)\.(?:ydd|ytd)$",
+    re.IGNORECASE,
+)
+PED_MAX_INDEX = 999
+# components of CPedVariationInfo in availComp / pedXml_compIdx order
+PED_COMPONENT_SLOTS = PED_SLOTS[:12]
+PED_NO_COMPONENT = 0xFF
+
+def parse_ped_asset(name: str):
+    # -> ((ped, slot) lowercase, index, match) or None
+    m = PED_ASSET_RE.match(name)
+    if not m:
+        return None
+    return (m["ped"].lower(), m["slot"].lower()), int(m["idx"]), m
+
+def _renumbered_name(m: re.Match, new_idx: int) -> str:
+    return f"{m.string[:m.start('idx')]}{new_idx:03d}{m.string[m.end('idx'):]}"
+
+def plan_drawable_renumbering(jobs, taken_names, fixed: dict | None = None):
+    # jobs: (source, FoundFile) in build order; taken_names: file names already in stream/;
+    # fixed: (source, (ped, slot), index) -> index an earlier run assigned.
+    # Per source, drawables whose (ped, slot, index) is taken move to the next free indices of
+    # that slot (one contiguous range per source), their textures move along with them.
+    # -> ({path: new name}, {source: {old token: new token}}, [(source, ped^slot, old, new)],
+    #     {source: {((ped, slot), old): new}} for every drawable)
+    fixed = fixed or {}
+    used: dict[tuple, set[int]] = {}
+    for name in taken_names:
+        parsed = parse_ped_asset(name)
+        if parsed:
+            used.setdefault(parsed[0], set()).add(parsed[1])
+
+    by_source: dict[Path, dict[tuple, list]] = {}
+    for src, f in jobs:
+        if f.ext not in (".ydd", ".ytd"):
+            continue
+        parsed = parse_ped_asset(f.name)
+        # props live in propInfo (anchors), not in the component data -> normal duplicate handling
+        if parsed and parsed[0][1] in PED_COMPONENT_SLOTS:
+            key, idx, m = parsed
+            by_source.setdefault(src, {}).setdefault((key, idx), []).append((f, m))
+
+    renames: dict[str, str] = {}
+    refs: dict[Path, dict[str, str]] = {}
+    moved = []
+    mappings = {}
+    for src, groups in by_source.items():
+        mapping = mappings[src] = {}
+        conflicts = []
+        for key, idx in groups:
+            if (src, key, idx) in fixed:
+                mapping[(key, idx)] = fixed[(src, key, idx)]
+            elif idx in used.get(key, ()):
+                conflicts.append((key, idx))
+            else:
+                mapping[(key, idx)] = idx
+        for (key, _), new in mapping.items():
+            used.setdefault(key, set()).add(new)
+        for key, idx in sorted(conflicts):
+            slot_used = used.setdefault(key, set())
+            new = max(slot_used) + 1
+            if new > PED_MAX_INDEX:
+                continue
+            slot_used.add(new)
+            mapping[(key, idx)] = new
+            moved.append((src, f"{key[0]}^{key[1]}", idx, new))
+
+        for (key, idx), new in mapping.items():
+            if new == idx:
+                continue
+            for f, m in groups[(key, idx)]:
+                new_name = _renumbered_name(m, new)
+                renames[f.path] = new_name
+                old_token = f.name.split("^", 1)[1].rsplit(".", 1)[0].lower()
+                refs.setdefault(src, {})[old_token] = new_name.split("^", 1)[1].rsplit(".", 1)[0]
+    return renames, refs, moved, mappings
+
+def rewrite_references(data: bytes, refs: dict[str, str]) -> tuple[bytes, int]:
+    # whole-token replacement of old drawable/texture names in text .meta/.ymt content
+    tokens = sorted(refs, key=len, reverse=True)
+    pattern = re.compile(rb"(?<![A-Za-z0-9_])(" + b"|".join(re.escape(t.encode()) for t in tokens)
+                         + rb")(?![A-Za-z0-9_])", re.IGNORECASE)
+    return pattern.subn(lambda m: refs[m.group(1).decode().lower()].encode(), data)
+
+def load_ped_ymt(data: bytes, name: str) -> ET.Element:
+    # CPedVariationInfo in its XML form (CodeWalker export); binary PSO can't be edited here
+    if data[:4] == b"PSIN" or b"\0" in data[:4096]:
+        raise ValueError(f"{name} ist binär (PSO) – nur die XML-Form kann um Drawables erweitert werden")
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError as e:
+        raise ValueError(f"{name}: kein gültiges XML ({e})") from e
+    if root.tag != "CPedVariationInfo" or root.find("availComp") is None or root.find("aComponentData3") is None:
+        raise ValueError(f"{name}: keine CPedVariationInfo (availComp / aComponentData3 fehlt)")
+    return root
+
+def _avail_comp(root: ET.Element, name: str) -> list[int]:
+    # component -> index into aComponentData3, FF = not available (hex bytes)
+    try:
+        avail = [int(x, 16) for x in (root.findtext("availComp") or "").split()]
+    except ValueError:
+        avail = []
+    if len(avail) != len(PED_COMPONENT_SLOTS):
+        raise ValueError(f"{name}: availComp hat nicht {len(PED_COMPONENT_SLOTS)} Einträge")
+    return avail
+
+def _comp_infos(root: ET.Element) -> dict[tuple[int, int], ET.Element]:
+    infos = {}
+    for item in root.findall("compInfos/Item"):
+        try:
+            key = (int(item.find("pedXml_compIdx").get("value")), int(item.find("pedXml_drawblIdx").get("value")))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        infos[key] = item
+    return infos
+
+def merge_ped_ymt(base: bytes, base_name: str, donors) -> bytes:
+    # donors: [(ymt bytes, name, {component: {old drawable: new drawable}})] -> base ymt whose
+    # aDrawblData3 (+ compInfos) has the donor drawables at their new indices; setting by index is
+    # idempotent, a new index must directly follow the existing ones (no holes)
+    root = load_ped_ymt(base, base_name)
+    avail = _avail_comp(root, base_name)
+    comps = root.find("aComponentData3")
+    infos = root.find("compInfos")
+    base_infos = _comp_infos(root)
+    ops = []
+    for data, name, moves in donors:
+        donor = load_ped_ymt(data, name)
+        donor_avail = _avail_comp(donor, name)
+        donor_comps = donor.find("aComponentData3").findall("Item")
+        donor_infos = _comp_infos(donor)
+        for comp, indices in moves.items():
+            slot = PED_COMPONENT_SLOTS[comp]
+            if donor_avail[comp] >= len(donor_comps):
+                raise ValueError(f"{name}: Komponente {slot} fehlt")
+            comp_item = donor_comps[donor_avail[comp]]
+            drawables = comp_item.findall("aDrawblData3/Item")
+            for old, new in indices.items():
+                if old >= len(drawables):
+                    raise ValueError(f"{name}: {slot} {old:03d} fehlt in aDrawblData3")
+                ops.append((comp, new, comp_item, drawables[old], donor_infos.get((comp, old)), name))
+
+    for comp, new, donor_comp, drawable, info, name in sorted(ops, key=lambda op: op[:2]):
+        slot = PED_COMPONENT_SLOTS[comp]
+        if avail[comp] == PED_NO_COMPONENT:
+            # component the base does not have yet: donor settings, empty drawable list
+            item = copy.deepcopy(donor_comp)
+            for d in item.findall("aDrawblData3/Item"):
+                item.find("aDrawblData3").remove(d)
+            comps.append(item)
+            avail[comp] = len(comps.findall("Item")) - 1
+        target = comps.findall("Item")[avail[comp]].find("aDrawblData3")
+        if target is None:
+            raise ValueError(f"{base_name}: Komponente {slot} ohne aDrawblData3")
+        existing = target.findall("Item")
+        if new > len(existing):
+            raise ValueError(f"{base_name}: {slot} hat {len(existing)} Drawables, {new:03d} aus {name} "
+                             f"würde eine Lücke lassen")
+        drawable = copy.deepcopy(drawable)
+        if new < len(existing):
+            target.remove(existing[new])
+        target.insert(new, drawable)
+        if info is not None and infos is not None:
+            info = copy.deepcopy(info)
+            info.find("pedXml_drawblIdx").set("value", str(new))
+            if (comp, new) in base_infos:
+                infos.remove(base_infos[(comp, new)])
+            infos.append(info)
+            base_infos[(comp, new)] = info
+
+    # numAvailTex: all textures of the component
+    for item in comps.findall("Item"):
+        count = item.find("numAvailTex")
+        if count is not None:
+            count.set("value", str(len(item.findall("aDrawblData3/Item/aTexData/Item"))))
+    root.find("availComp").text = " ".join(f"{x:02X}" for x in avail)
+    ET.indent(root, space=" ")
+    return b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding="utf-8", xml_declaration=False) + b"\n"
+
+# ---------- Transfer strategies ----------
+TRANSFER_MODES = ("auto", "hardlink", "copy")
+FICLONE = 0x40049409            # linux/fs.h: _IOW(0x94, 9, int)
+KERNEL_COPY_CHUNK = 64 * 1024 * 1024
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP,
+                    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.ENOTTY, errno.EPERM, errno.EBADF}
+
+class _Unsupported(Exception):
+    pass
+
+class TransferEngine:
+    # per file the cheapest way that works:
+    #   move: rename (same device) -> copy + delete
+    #   copy: [hardlink] -> reflink (FICLONE) -> copy_file_range / sendfile -> chunked user-space copy
+    # a method that fails with "not supported" is switched off for the rest of the build
+    def __init__(self, mode: str = "auto", should_stop=None):
+        if mode not in TRANSFER_MODES:
+            raise ValueError(f"Unbekannter Transfer-Modus: {mode}")
+        self.mode = mode
+        self.should_stop = should_stop
+        linux = sys.platform.startswith("linux")
+        self._reflink_ok = linux and mode != "copy"
+        self._cfr_ok = hasattr(os, "copy_file_range") and mode != "copy"
+        self._sendfile_ok = linux and hasattr(os, "sendfile") and mode != "copy"
+        self._lock = threading.Lock()
+        self.counts: dict[str, int] = {}
+
+    def _count(self, method: str):
+        with self._lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+
+    def _stopped(self) -> bool:
+        return self.should_stop is not None and self.should_stop()
+
+    def transfer(self, src: str, dst: str, size: int, same_device: bool = True,
+                 move: bool = False, hasher=None) -> tuple[int, str]:
+        if move and same_device:
+            try:
+                os.rename(src, dst)
+                self._count("rename")
+                return size, "rename"
+            except OSError:
+                pass
+
+        n, method = self._copy(src, dst, size, same_device, hasher)
+        if move:
+            os.remove(src)
+        self._count(method)
+        return n, method
+
+    def _copy(self, src: str, dst: str, size: int, same_device: bool, hasher) -> tuple[int, str]:
+        _unlink_target(dst)
+        if self.mode == "hardlink" and same_device:
+            try:
+                os.link(src, dst)
+                return size, "hardlink"
+            except OSError:
+                pass
+
+        # in-kernel paths cannot feed a hasher
+        if hasher is None:
+            if self._reflink_ok and same_device:
+                try:
+                    return self._reflink(src, dst, size), "reflink"
+                except _Unsupported:
+                    self._reflink_ok = False
+            if self._cfr_ok:
+                try:
+                    return self._kernel_copy(src, dst, os.copy_file_range), "copy_file_range"
+                except _Unsupported:
+                    self._cfr_ok = False
+            if self._sendfile_ok:
+                try:
+                    return self._kernel_copy(src, dst, self._sendfile), "sendfile"
+                except _Unsupported:
+                    self._sendfile_ok = False
+
+        return copy_file_chunked(src, dst, self.should_stop, hasher=hasher), "copy"
+
+    def _reflink(self, src: str, dst: str, size: int) -> int:
+        import fcntl
+        with open(src, "rb") as fi:
+            try:
+                with open(dst, "wb") as fo:
+                    fcntl.ioctl(fo.fileno(), FICLONE, fi.fileno())
+                shutil.copystat(src, dst)
+            except BaseException as e:
+                _remove_quiet(dst)
+                if isinstance(e, OSError) and e.errno in _FALLBACK_ERRNOS:
+                    raise _Unsupported() from e
+                raise
+        return size
+
+    @staticmethod
+    def _sendfile(fd_in: int, fd_out: int, count: int) -> int:
+        return os.sendfile(fd_out, fd_in, None, count)
+
+    def _kernel_copy(self, src: str, dst: str, copy_fn) -> int:
+        copied = 0
+        with open(src, "rb") as fi:
+            try:
+                with open(dst, "wb") as fo:
+                    fd_in, fd_out = fi.fileno(), fo.fileno()
+                    while True:
+                        if self._stopped():
+                            raise BuildStopped()
+                        try:
+                            n = copy_fn(fd_in, fd_out, KERNEL_COPY_CHUNK)
+                        except OSError as e:
+                            if copied == 0 and e.errno in _FALLBACK_ERRNOS:
+                                raise _Unsupported() from e
+                            raise
+                        if n == 0:
+                            break
+                        copied += n
+                shutil.copystat(src, dst)
+            except BaseException:
+                _remove_quiet(dst)
+                raise
+        return copied
+
+def validate_resource_name(name: str) -> bool:
+    return bool(name) and " " not in name
+
+LOCK_OFFSET = 0x7FFFFFF0  # msvcrt lock byte of locked_file (far past any ensure list)
+
+@contextmanager
+def locked_file(path: Path, timeout: float = 30.0):
+    # exclusive lock on the file itself, across threads and processes (parallel batch jobs share
+    # _ALL_ENSURES.txt); no .lock file is left behind. Windows locks a byte far past the end, so the
+    # locked range never covers the content that is read/appended through other handles
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == "nt":
+            os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    import msvcrt
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Lock nicht bekommen: {path}")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def write_ensure_files(dst_root: Path, resource_name: str, log_fn):
+    ensure_line = f"ensure {resource_name}"
+    (dst_root / "_ADD_TO_SERVER_CFG.txt").write_text(ensure_line + "\n", encoding="utf-8")
+    log_fn("📝 Datei erstellt: _ADD_TO_SERVER_CFG.txt")
+
+    master_targets = [
+        dst_root.parent / "_ALL_ENSURES.txt",  # central
+        dst_root / "_ALL_ENSURES.txt"          # fallback
+    ]
+
+    for master_file in master_targets:
+        try:
+            safe_mkdir(master_file.parent)
+            # read + append under one lock, otherwise two finishing jobs can both miss each other's line
+            with locked_file(master_file):
+                existing = set()
+                if master_file.exists():
+                    txt = master_file.read_text(encoding="utf-8", errors="ignore")
+                    for line in txt.splitlines():
+                        line = line.strip()
+                        if line and not line.startswith("#"):
+                            existing.add(line.lower())
+
+                if ensure_line.lower() not in existing:
+                    new_file = not master_file.exists()
+                    with master_file.open("a", encoding="utf-8") as f:
+                        if new_file or master_file.stat().st_size == 0:
+                            f.write(f"# Generated by {APP_TITLE} ({CREATED_BY})\n")
+                        f.write(ensure_line + "\n")
+                    log_fn(f"📚 Master updated: {master_file}")
+                else:
+                    log_fn(f"ℹ️ Master enthält ensure schon: {master_file}")
+
+            if master_file == master_targets[0]:
+                break
+        except Exception:
+            continue
+
+# ---------- Distributable package (.zip / .tar.zst) ----------
+PACKAGE_FORMATS = ("zip", "tar.zst")
+PACKAGE_ZSTD_LEVEL = 3
+PACKAGE_DEFLATE_WORKERS = max(1, min(8, os.cpu_count() or 1))
+PACKAGE_DEFLATE_MAX = 64 * 1024 * 1024  # bigger deflated members are streamed by the writer thread
+
+def package_path(out_dir: Path, resource_name: str, fmt: str) -> Path:
+    return out_dir / f"{resource_name}.{fmt}"
+
+def _deflate_member(path: str | Path) -> tuple[bytes, int, int] | None:
+    # raw deflate stream as zipfile writes it for ZIP_DEFLATED; None = too big, stream it instead
+    if os.stat(path).st_size > PACKAGE_DEFLATE_MAX:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return comp.compress(data) + comp.flush(), zlib.crc32(data), len(data)
+
+class PackageWriter:
+    # <resource>.zip / .tar.zst written while the copy loop runs: finished targets are queued and
+    # packed by one writer thread, so their bytes still come from the page cache. zip: RSC7 assets
+    # stored (already compressed), .meta/.ymt/.lua deflated by a worker pool and written in queue
+    # order by the writer; tar.zst: zstd on all cores
+    def __init__(self, path: Path, fmt: str, root_name: str, level: int = PACKAGE_ZSTD_LEVEL):
+        if fmt not in PACKAGE_FORMATS:
+            raise ValueError(f"Unbekanntes Paketformat: {fmt}")
+        if fmt == "tar.zst" and not ZSTD_AVAILABLE:
+            raise ValueError(".tar.zst braucht das Paket zstandard (pip install zstandard)")
+        self.path = path
+        self.fmt = fmt
+        self.root_name = root_name
+        self.level = level
+        self.part = path.with_name(path.name + ".part")
+        self.files = 0
+        self.bytes = 0
+        self.error: BaseException | None = None
+        self._names: set[str] = set()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._raw = None
+        self._zstd = None
+        self._archive = None
+        self._pool: ThreadPoolExecutor | None = None
+
+    def start(self):
+        self._raw = open(self.part, "wb")
+        if self.fmt == "zip":
+            self._archive = zipfile.ZipFile(self._raw, "w", allowZip64=True)
+            self._pool = ThreadPoolExecutor(max_workers=PACKAGE_DEFLATE_WORKERS, thread_name_prefix="package-deflate")
+        else:
+            cctx = zstandard.ZstdCompressor(level=self.level, threads=-1)
+            self._zstd = cctx.stream_writer(self._raw, closefd=False)
+            self._archive = tarfile.open(fileobj=self._zstd, mode="w|", format=tarfile.PAX_FORMAT)
+        self._thread = threading.Thread(target=self._run, name="package-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, path: str | Path, rel: str):
+        # rel like "stream/x.ydd"; every name once
+        if rel in self._names:
+            return
+        self._names.add(rel)
+        deflated = None
+        if self._pool is not None and os.path.splitext(rel)[1].lower() not in STREAM_EXTS:
+            deflated = self._pool.submit(_deflate_member, path)
+        self._queue.put((path, f"{self.root_name}/{rel}", deflated))
+
+    def add_tree(self, root: Path, folders=("stream", "data")):
+        # whatever the copy loop did not touch (merge: unchanged files)
+        for folder in folders:
+            try:
+                with os.scandir(root / folder) as it:
+                    names = sorted(e.name for e in it if e.is_file())
+            except OSError:
+                continue
+            for name in names:
+                self.add(root / folder / name, f"{folder}/{name}")
+
+    def drain(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self.error is None:
+                    self._write(*item)
+            except BaseException as e:
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path: str | Path, arcname: str, deflated: Future | None = None):
+        if deflated is not None and (done := deflated.result()) is not None:
+            self._write_deflated(path, arcname, *done)
+            return
+        st = os.stat(path)
+        with open(path, "rb") as fi:
+            if self.fmt == "zip":
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                info.compress_type = (zipfile.ZIP_STORED if os.path.splitext(path)[1].lower() in STREAM_EXTS
+                                      else zipfile.ZIP_DEFLATED)
+                with self._archive.open(info, "w", force_zip64=st.st_size > 0x7FFFFFFF) as fo:
+                    shutil.copyfileobj(fi, fo, COPY_CHUNK_SIZE)
+            else:
+                info = tarfile.TarInfo(arcname)
+                info.size = st.st_size
+                info.mtime = st.st_mtime
+                info.mode = 0o644
+                self._archive.addfile(info, fi)
+        self.files += 1
+        self.bytes += st.st_size
+
+    def _write_deflated(self, path: str | Path, arcname: str, data: bytes, crc: int, size: int):
+        # zipfile has no raw write: local header + precompressed data, then register the entry
+        # so close() puts it into the central directory (offsets past 4 GiB get zip64 there)
+        info = zipfile.ZipInfo.from_file(path, arcname)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.CRC, info.compress_size, info.file_size = crc, len(data), size
+        zf = self._archive
+        info.header_offset = zf.fp.tell()
+        zf.fp.write(info.FileHeader(zip64=False))
+        zf.fp.write(data)
+        zf.filelist.append(info)
+        zf.NameToInfo[info.filename] = info
+        zf.start_dir = zf.fp.tell()
+        self.files += 1
+        self.bytes += size
+
+    def close(self) -> Path:
+        # finish the writer, close the archive and move it into place
+        self._queue.put(None)
+        self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        try:
+            if self.error is not None:
+                raise self.error
+            self._archive.close()
+            if self._zstd is not None:
+                self._zstd.close()
+            self._raw.close()
+            os.replace(self.part, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        return self.path
+
+    def abort(self):
+        if self._thread is not None and self._thread.is_alive():
+            self.error = self.error or BuildStopped()
+            self._queue.put(None)
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        for closer in (self._archive, self._zstd, self._raw):
+            try:
+                if closer is not None:
+                    closer.close()
+            except Exception:
+                pass
+        _remove_quiet(str(self.part))
+
+# ---------- Watch mode ----------
+WATCH_DEBOUNCE_SECS = 2.0
+WATCH_POLL_SECS = 2.0
+
+# inotify(7) flags
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                | IN_DELETE_SELF | IN_MOVE_SELF)
+
+class SourceChange(NamedTuple):
+    source: Path
+    files: list[FoundFile]      # everything relevant in the source now
+    changed: list[FoundFile]    # added or modified (size/mtime)
+    deleted: list[str]          # source paths that are gone
+
+def _load_inotify():
+    # libc inotify via ctypes (Linux only, no extra package); None -> polling
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except Exception:
+        return None
+
+class SourceWatcher:
+    # knows the relevant files of every source (snapshot) and waits for changes: inotify marks
+    # sources dirty, without it every source is re-scanned each `poll` seconds. wait() returns once
+    # nothing happened for `debounce` seconds; only dirty sources are re-scanned and diffed
+    def __init__(self, sources, debounce: float = WATCH_DEBOUNCE_SECS, poll: float = WATCH_POLL_SECS,
+                 workers: int = DEFAULT_SCAN_WORKERS, should_stop=None, log_fn=None, use_inotify: bool = True):
+        self.sources = [Path(x) for x in sources]
+        self.debounce = debounce
+        self.poll = poll
+        self.workers = workers
+        self.should_stop = should_stop or (lambda: False)
+        self.log = log_fn or (lambda m: None)
+        self.snapshots: dict[Path, dict[str, FoundFile]] = {}
+        self._seen: dict[Path, dict] = {}
+        self._fd = None
+        self._libc = _load_inotify() if use_inotify else None
+        self._wds: dict[int, tuple[Path, str]] = {}
+        # archive sources: their parent folder is watched, events matched by file name
+        self._archive_wds: dict[int, dict[str, Path]] = {}
+
+    @property
+    def method(self) -> str:
+        return "inotify" if self._fd is not None else "polling"
+
+    def start(self):
+        scanned = scan_sources(self.sources, workers=self.workers)
+        self.snapshots = {src: {f.path: f for f in files} for src, files in zip(self.sources, scanned)}
+        self._seen = {src: self._fingerprint(files) for src, files in zip(self.sources, scanned)}
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                try:
+                    for src in self.sources:
+                        if is_archive_source(src):
+                            self._archive_wds.setdefault(self._add_watch(str(src.parent)), {})[src.name] = src
+                        else:
+                            self._watch_tree(src, str(src))
+                except OSError as e:
+                    self.log(f"⚠️ inotify nicht nutzbar ({e}) → Polling alle {self.poll:g}s")
+                    self.close()
+
+    def close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+        self._fd = None
+        self._wds = {}
+        self._archive_wds = {}
+
+    @staticmethod
+    def _fingerprint(files) -> dict:
+        return {f.path: (f.size, f.mtime) for f in files}
+
+    def _add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            # ENOSPC: fs.inotify.max_user_watches reached
+            import ctypes
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def _watch_tree(self, src: Path, top: str):
+        for dirpath, dirnames, _ in os.walk(top):
+            self._wds[self._add_watch(dirpath)] = (src, dirpath)
+
+    def _read_events(self, timeout: float) -> set[Path]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        dirty = set()
+        pos = 0
+        while pos + 16 <= len(buf):
+            wd, mask, _, length = struct.unpack_from("iIII", buf, pos)
+            name = buf[pos + 16:pos + 16 + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            pos += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                dirty.update(self.sources)
+                continue
+            archive = self._archive_wds.get(wd, {}).get(name)
+            if archive is not None:
+                dirty.add(archive)
+            watched = self._wds.get(wd)
+            if watched is None:
+                continue
+            src, dirpath = watched
+            if mask & IN_IGNORED:
+                self._wds.pop(wd, None)
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._watch_tree(src, os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+                dirty.add(src)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF) or os.path.splitext(name)[1].lower() in RELEVANT_EXTS:
+                dirty.add(src)
+        return dirty
+
+    def _poll_dirty(self) -> set[Path]:
+        # fallback: re-scan everything, compare with the previous poll
+        t0 = time.time()
+        while time.time() - t0 < self.poll:
+            if self.should_stop():
+                return set()
+            time.sleep(0.2)
+        dirty = set()
+        for src, files in zip(self.sources, scan_sources(self.sources, workers=self.workers)):
+            fp = self._fingerprint(files)
+            if fp != self._seen.get(src):
+                self._seen[src] = fp
+                dirty.add(src)
+        return dirty
+
+    def wait(self) -> list[SourceChange]:
+        # blocks until changes settled (or should_stop); [] when stopped
+        pending: set[Path] = set()
+        last = 0.0
+        while not self.should_stop():
+            dirty = self._read_events(0.5) if self._fd is not None else self._poll_dirty()
+            if dirty:
+                pending |= dirty
+                last = time.time()
+                continue
+            if pending and time.time() - last >= self.debounce:
+                changes = self.diff(pending)
+                if changes:
+                    return changes
+                pending = set()
+        return []
+
+    def diff(self, dirty) -> list[SourceChange]:
+        # re-scan the dirty sources, compare with the snapshot and advance it
+        dirty = [src for src in self.sources if src in dirty]
+        changes = []
+        for src, files in zip(dirty, scan_sources(dirty, workers=self.workers)):
+            old = self.snapshots.get(src, {})
+            now = {f.path: f for f in files}
+            changed = [f for f in files if f.path not in old or (old[f.path].size, old[f.path].mtime) != (f.size, f.mtime)]
+            deleted = [p for p in old if p not in now]
+            self.snapshots[src] = now
+            self._seen[src] = self._fingerprint(files)
+            if changed or deleted:
+                changes.append(SourceChange(src, files, changed, deleted))
+        return changes
+
+# ---------- Build engine (headless, no tkinter) ----------
+RESOURCE_COUNTERS = ("copied", "duplicates", "deduped", "bytes_saved", "unchanged", "updated", "removed", "errors",
+                     "bytes", "oversized", "corrupt", "renumbered")
+SHARD_MAP_SUFFIX = ".shards.json"
+
+# scan -> copy -> fxmanifest -> ensure, reports via on_event(kind, *args):
+#   "log" (msg) | "status" (msg) | "progress" (done, total)
+# on_event runs on the build thread; the GUI marshals it onto Tk itself.
+class PackBuilder:
+
+    def __init__(self, sources, dst_root, resource_name: str, mode: str = "merge",
+                 move: bool = False, on_event=None, scan_workers: int = DEFAULT_SCAN_WORKERS,
+                 copy_workers: int = DEFAULT_COPY_WORKERS, dedupe: bool = False,
+                 incremental: bool = True, state_hash: bool = False, transfer_mode: str = "auto",
+                 json_log: bool = False, compact_manifest: bool = False, manifest_globs: bool = True,
+                 shard_max_bytes: int = 0, shard_max_files: int = 0,
+                 analyze: bool = True, budget: dict | None = None, renumber: bool = False,
+                 dry_run: bool = False, profile=None, package: str | None = None, package_dir=None,
+                 scan_cache: ScanCache | None = None, io_limit: threading.Semaphore | None = None):
+        self.sources = [Path(s) for s in sources]
+        self.dst_root = Path(dst_root)
+        self.resource_name = resource_name
+        self.mode = mode
+        self.move = move
+        self.on_event = on_event
+        self.scan_workers = scan_workers
+        self.copy_workers = copy_workers
+        self.dedupe = dedupe
+        self.incremental = incremental
+        self.state_hash = state_hash
+        self.transfer_mode = transfer_mode
+        self.json_log = json_log
+        self.compact_manifest = compact_manifest
+        self.manifest_globs = manifest_globs
+        self.shard_max_bytes = shard_max_bytes
+        self.shard_max_files = shard_max_files
+        self.analyze = analyze
+        self.budget = {**DEFAULT_BUDGET, **(budget or {})}
+        self.renumber = renumber
+        self.dry_run = dry_run
+        # True -> builder.prof in the destination, or an explicit path
+        self.profile = profile
+        # "zip" / "tar.zst": <resource>.<fmt> in package_dir (default: next to the resource)
+        self.package = package
+        self.package_dir = package_dir
+        # batch builds: shared scan results and one I/O budget for all running jobs
+        self.scan_cache = scan_cache
+        self._io_slot = io_limit if io_limit is not None else nullcontext()
+        self.stop_flag = False
+        self._metrics = BuildMetrics()
+        self._state = None
+        self._transfers: TransferEngine | None = None
+        self._refs: dict[Path, dict[str, str]] = {}
+        self._ymt_base: dict[str, bytes] = {}     # base .ymt source path -> merged content
+        self._ymt_donors: dict[str, str] = {}     # .ymt of a renumbered source -> base .ymt name
+        self._ymt_writes: dict[str, bytes] = {}   # target rel -> merged content, written after the copies
+        self._shard_names: dict | None = None     # sharded: stream name -> claim, shared by all shards
+        self._same_device: dict[Path, bool] = {}
+
+    def stop(self):
+        self.stop_flag = True
+
+    def _emit(self, kind: str, *args):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(kind, *args)
+        except Exception:
+            pass
+
+    def log(self, msg: str):
+        self._emit("log", msg)
+
+    def status(self, msg: str):
+        self._emit("status", msg)
+
+    def progress(self, done: int, total: int, bytes_done: int = 0, bytes_total: int = 0, elapsed: float = 0.0):
+        self._emit("progress", done, total, bytes_done, bytes_total, elapsed)
+
+    def _check_stop(self):
+        if self.stop_flag:
+            raise BuildStopped()
+
+    def _should_stop(self) -> bool:
+        return self.stop_flag
+
+    def _skip_identical(self, summary: dict, blog: BuildLog, src_base: Path, f: FoundFile, target: Path, dst_root: Path):
+        rel = target.relative_to(dst_root).as_posix()
+        self._record_state(f, rel, deduped=True)
+        summary["deduped"] += 1
+        summary["bytes_saved"] += f.size
+        msg = f"[SKIP] {f.name}  (from: {src_base.name}) identisch mit {target.relative_to(dst_root)}"
+        self.log(msg)
+        blog.write(msg)
+        blog.record("file", action="SKIP", source=f.path, target=rel, bytes=f.size, duration=0.0, outcome="deduped")
+
+    def _transfer(self, job: CopyJob):
+        if self.stop_flag:
+            raise BuildStopped()
+        # --state-hash wants a digest -> user-space copy; renames need no hash (same bytes)
+        f = job.file
+        hasher = new_hasher() if self.state_hash else None
+        t0 = time.perf_counter()
+        refs = self._refs.get(job.source) if f.ext == ".meta" else None
+        if refs:
+            n = self._rewrite_data_file(f, job.target, refs)
+            if n is not None:
+                self._transfers._count("rewrite")
+                return n, None, "rewrite", time.perf_counter() - t0
+        n, method = self._transfers.transfer(f.path, job.target, f.size, self._same_device.get(job.source, False),
+                                             move=self.move, hasher=hasher)
+        secs = time.perf_counter() - t0
+        digest = hasher.hexdigest() if method == "copy" and hasher is not None and n == f.size else None
+        return n, digest, method, secs
+
+    def _transfer_archive(self, archive: str, jobs: list[CopyJob], results: queue.Queue):
+        # all planned members of one archive in a single pass: a zip in central-directory order,
+        # a tar as a stream (a .tar.gz is decompressed once); no temp extraction, one result per job
+        wanted = {split_member(job.file.path)[1]: job for job in jobs}
+        try:
+            if archive_kind(archive) == "zip":
+                with zipfile.ZipFile(archive) as zf:
+                    for info in sorted(zf.infolist(), key=lambda x: x.header_offset):
+                        job = wanted.pop(info.filename, None)
+                        if job is not None:
+                            with self._io_slot:
+                                self._extract_member(zf.open, info, job, results)
+            else:
+                with tarfile.open(archive, "r|*") as tf:
+                    for m in tf:
+                        job = wanted.pop(m.name, None)
+                        if job is not None:
+                            with self._io_slot:
+                                self._extract_member(tf.extractfile, m, job, results)
+            err = FileNotFoundError(errno.ENOENT, "nicht mehr im Archiv", archive)
+        except Exception as e:
+            err = e
+        for job in wanted.values():
+            results.put((job, None, err))
+
+    def _extract_member(self, opener, member, job: CopyJob, results: queue.Queue):
+        f = job.file
+        t0 = time.perf_counter()
+        try:
+            if self.stop_flag:
+                raise BuildStopped()
+            hasher = new_hasher() if self.state_hash else None
+            refs = self._refs.get(job.source) if f.ext == ".meta" else None
+            with opener(member) as fp:
+                if refs:
+                    data = fp.read()
+                    n = self._rewrite_data_file(f, job.target, refs, data)
+                    if n is not None:
+                        self._transfers._count("rewrite")
+                        results.put((job, (n, None, "rewrite", time.perf_counter() - t0), None))
+                        return
+                    fp = io.BytesIO(data)
+                n = copy_stream(fp, job.target, f.mtime, self._should_stop, hasher=hasher)
+            self._transfers._count("extract")
+            digest = hasher.hexdigest() if hasher is not None and n == f.size else None
+            results.put((job, (n, digest, "extract", time.perf_counter() - t0), None))
+        except BuildStopped as e:
+            results.put((job, None, e))
+            raise
+        except Exception as e:
+            results.put((job, None, e))
+
+    def _rewrite_data_file(self, f: FoundFile, target: str, refs: dict[str, str], data: bytes | None = None) -> int | None:
+        # text .meta of a renumbered source: write with updated drawable names (a .ymt is merged instead);
+        # None -> binary or nothing to replace, normal transfer
+        if data is None:
+            with open_source(f.path) as fp:
+                data = fp.read()
+        if b"\0" in data[:4096]:
+            return None
+        data, count = rewrite_references(data, refs)
+        if not count:
+            return None
+        write_bytes_atomic(target, data)
+        if self.move and split_member(f.path) is None:
+            os.remove(f.path)
+        return len(data)
+
+    def _plan_renumbering(self, jobs, prev_files: dict, index: dict, dst_root: Path, rs: dict,
+                          blog: BuildLog) -> dict[str, str]:
+        # indices from earlier runs stay fixed (state), everything already in stream/ is taken
+        fixed = {}
+        for src, f in jobs:
+            prev = prev_files.get(source_key(f.path))
+            if not prev or not prev.get("target", "").startswith("stream/"):
+                continue
+            orig = parse_ped_asset(f.name)
+            done = parse_ped_asset(prev["target"][len("stream/"):])
+            if orig and done and orig[0] == done[0]:
+                fixed[(src, orig[0], orig[1])] = done[1]
+
+        renames, self._refs, moved, mappings = plan_drawable_renumbering(jobs, index["stream"].values(), fixed)
+        # the game only loads drawables the collection's .ymt declares -> extend it or don't build
+        self._plan_ymt_merges(jobs, mappings, index, dst_root, blog)
+        rs["renumbered"] = len(moved)
+        for src, slot, old, new in moved:
+            msg = f"🔢 Neu nummeriert: {slot} {old:03d} → {new:03d} (from: {src.name})"
+            self.log(msg)
+            blog.write(msg)
+            blog.record("renumber", source=str(src), slot=slot, old=old, new=new)
+        return renames
+
+    def _plan_ymt_merges(self, jobs, mappings: dict, index: dict, dst_root: Path, blog: BuildLog):
+        # per collection (<ped>.ymt) with moved drawables: the base .ymt (already in data/ or the first
+        # source that keeps its numbers) gets the drawable data of every renumbered source, whose own
+        # .ymt is not shipped; ValueError if a .ymt is missing, binary (PSO) or would get holes
+        donors: dict[str, dict[Path, dict[int, dict[int, int]]]] = {}
+        for src, mapping in mappings.items():
+            peds = {key[0] for (key, idx), new in mapping.items() if new != idx}
+            for (key, idx), new in mapping.items():
+                if key[0] in peds:
+                    comp = PED_COMPONENT_SLOTS.index(key[1])
+                    donors.setdefault(key[0], {}).setdefault(src, {}).setdefault(comp, {})[idx] = new
+        if not donors:
+            return
+        ymts: dict[tuple[Path, str], FoundFile] = {}
+        for src, f in jobs:
+            if f.ext == ".ymt":
+                ymts.setdefault((src, f.name.lower()), f)
+
+        for ped, by_source in donors.items():
+            ymt_name = f"{ped}.ymt"
+            parts = []
+            for src, moves in by_source.items():
+                f = ymts.get((src, ymt_name))
+                if f is None:
+                    raise ValueError(f"Kleidung zusammenführen: {src.name} hat keine {ymt_name} – neue "
+                                     f"Drawable-Nummern können nicht eingetragen werden")
+                with open_source(f.path) as fp:
+                    parts.append((fp.read(), f"{f.name} (from: {src.name})", moves))
+                self._ymt_donors[f.path] = ymt_name
+            base = next((f for (src, name), f in ymts.items() if name == ymt_name and src not in by_source), None)
+            if base is not None:
+                with open_source(base.path) as fp:
+                    data = fp.read()
+                base_name = f"{base.name} (from: {base.path})"
+            elif ymt_name in index["data"]:
+                rel = f"data/{index['data'][ymt_name]}"
+                data = (dst_root / rel).read_bytes()
+                base_name = rel
+            else:
+                raise ValueError(f"Kleidung zusammenführen: keine {ymt_name} mit den vorhandenen Drawables – "
+                                 f"neue Nummern können nicht eingetragen werden")
+            merged = merge_ped_ymt(data, base_name, parts)
+            if base is not None:
+                self._ymt_base[base.path] = merged
+            else:
+                self._ymt_writes[rel] = merged
+            msg = f"🧩 {ymt_name}: Drawables von {', '.join(src.name for src in by_source)} werden eingetragen"
+            self.log(msg)
+            blog.write(msg)
+
+    def _detect_devices(self, sources, dst_root: Path):
+        try:
+            dst_dev = os.stat(dst_root / "stream").st_dev
+        except OSError:
+            dst_dev = None
+        for src in sources:
+            try:
+                self._same_device[src] = dst_dev is not None and os.stat(src).st_dev == dst_dev
+            except OSError:
+                self._same_device[src] = False
+
+    def _record_state(self, f: FoundFile, rel_target: str, digest: str | None = None, deduped: bool = False):
+        if self._state is None:
+            return
+        entry = {"size": f.size, "mtime": f.mtime, "target": rel_target}
+        if digest:
+            entry["hash"] = digest
+        if deduped:
+            entry["deduped"] = True
+        self._state["files"][source_key(f.path)] = entry
+
+    def _unchanged_in_state(self, f: FoundFile, prev: dict) -> bool:
+        if prev.get("size") != f.size:
+            return False
+        if prev.get("mtime") == f.mtime:
+            return True
+        # touched but maybe same bytes (needs a stored hash)
+        if self.state_hash and prev.get("hash") and member_random_access(f.path):
+            try:
+                if file_digest(f.path) == prev["hash"]:
+                    prev["mtime"] = f.mtime
+                    return True
+            except OSError:
+                pass
+        return False
+
+    def _new_summary(self, dst_root: Path) -> dict:
+        # stays "failed" unless finish() runs (fatal exceptions propagate)
+        return {
+            "result": "failed",
+            "exit_code": EXIT_FAILED,
+            "resource": self.resource_name,
+            "resources": [],
+            "destination": str(dst_root),
+            "mode": self.mode,
+            "move": self.move,
+            "sources": [str(s) for s in self.sources],
+            "total": 0,
+            **{k: 0 for k in RESOURCE_COUNTERS},
+            "mb_per_s": 0.0,
+            "files_per_s": 0.0,
+            "copy_seconds": 0.0,
+            "transfer_methods": {},
+            "seconds": 0.0,
+            "phases": {},
+            "slowest": [],
+            "packages": [],
+        }
+
+    def _finish(self, summary: dict, started: float, result: str, exit_code: int) -> dict:
+        summary["result"] = result
+        summary["exit_code"] = exit_code
+        summary["seconds"] = round(time.time() - started, 3)
+        if summary["copy_seconds"] > 0:
+            summary["mb_per_s"] = round(summary["bytes"] / summary["copy_seconds"] / (1024 * 1024), 2)
+            summary["files_per_s"] = round(summary["copied"] / summary["copy_seconds"], 1)
+        summary["copy_seconds"] = round(summary["copy_seconds"], 3)
+        summary["phases"] = {k: round(v, 3) for k, v in self._metrics.phases.items()}
+        summary["slowest"] = self._metrics.slowest_files()
+        return summary
+
+    def _profiled(self, run) -> dict:
+        # --profile: cProfile of the build thread (copy workers only show up as waiting time)
+        if not self.profile:
+            return run()
+        import cProfile
+        import pstats
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            summary = run()
+        finally:
+            prof.disable()
+        dst_root = self.dst_root.resolve()
+        if self.profile is True:
+            path = (dst_root if dst_root.is_dir() else Path.cwd()) / PROFILE_FILE
+        else:
+            path = Path(self.profile).expanduser().resolve()
+        try:
+            prof.dump_stats(str(path))
+        except OSError as e:
+            self.log(f"⚠️ Profil konnte nicht gespeichert werden: {e}")
+            return summary
+        summary["profile"] = str(path)
+        self.log(f"🔬 Profil gespeichert: {path} (python -m pstats {path.name})")
+        if not self.dry_run and dst_root.is_dir():
+            out = io.StringIO()
+            pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(20)
+            blog = BuildLog(dst_root)
+            blog.write(f"🔬 Profil ({path.name}), Top 20 kumulativ:")
+            for line in out.getvalue().strip("\n").splitlines():
+                blog.write(line)
+            blog.close()
+        return summary
+
+    def build(self, changes: list[SourceChange] | None = None) -> dict:
+        self._metrics = BuildMetrics()
+        try:
+            return self._profiled(lambda: self._build(changes))
+        finally:
+            close_archive_readers()
+
+    def resume(self) -> dict:
+        self._metrics = BuildMetrics()
+        try:
+            return self._profiled(self._resume)
+        finally:
+            close_archive_readers()
+
+    def _build(self, changes: list[SourceChange] | None = None) -> dict:
+        # changes (watch mode): only these files go through plan/copy/manifest, deleted ones are removed
+        dst_root = self.dst_root.resolve()
+        resource_name = self.resource_name
+        mode = self.mode
+
+        started = time.time()
+        summary = self._new_summary(dst_root)
+        if self.dry_run:
+            summary["plan"] = []
+
+        def finish(result: str, exit_code: int) -> dict:
+            return self._finish(summary, started, result, exit_code)
+
+        if mode not in ("merge", "replace"):
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        if not validate_resource_name(resource_name):
+            raise ValueError("Resource-Name ohne Leerzeichen angeben (z. B. my_pack).")
+        if self.package and self.package not in PACKAGE_FORMATS:
+            raise ValueError(f"Unbekanntes Paketformat: {self.package}")
+        if self.package == "tar.zst" and not ZSTD_AVAILABLE:
+            raise ValueError(".tar.zst braucht das Paket zstandard (pip install zstandard)")
+
+        try:
+            if changes is None:
+                # Collect jobs
+                self.status("Suche Dateien…")
+                sources, nested = dedupe_nested_sources(self.sources)
+                for p in nested:
+                    self.log(f"ℹ️ Übersprungen (liegt in anderer Source / doppelt): {p}")
+
+                sharded = bool(self.shard_max_bytes or self.shard_max_files)
+                if sharded or self.scan_cache is not None:
+                    # shards are planned on the sizes of everything; the batch cache hands out whole scans
+                    with self._metrics.phase("scan"):
+                        if self.scan_cache is not None:
+                            scanned = self.scan_cache.scan(sources, workers=self.scan_workers,
+                                                           should_stop=self._should_stop)
+                        else:
+                            scanned = scan_sources(sources, workers=self.scan_workers, should_stop=self._should_stop)
+                    self._check_stop()
+                    found = zip(sources, scanned)
+                else:
+                    # pipeline: the first sources are planned and copied while later ones are still scanned
+                    found = iter_scan_sources(sources, workers=self.scan_workers, should_stop=self._should_stop)
+
+                # up to the first source with files: nothing at all -> "empty", the output is not touched
+                groups = self._announce(found, summary)
+                head = []
+                with self._metrics.phase("scan"):
+                    for group in groups:
+                        head.append(group)
+                        if group[1]:
+                            break
+                self._check_stop()
+                groups = itertools.chain(head, groups)
+                if sharded or self.scan_cache is not None:
+                    groups = list(groups)
+            else:
+                sources = [c.source for c in changes]
+                groups = [(c.source, c.files) for c in changes]
+                for c in changes:
+                    self.log(f"👀 {c.source}: {len(c.changed)} neu/geändert, {len(c.deleted)} gelöscht")
+                summary["total"] = sum(len(c.changed) for c in changes)
+
+            if summary["total"] == 0 and not (changes and any(c.deleted for c in changes)):
+                self.log("ℹ️ Keine relevanten Dateien gefunden (.ydd/.ytd/.meta/.ymt/etc).")
+                return finish("empty", EXIT_EMPTY)
+
+            self._shard_names = None
+            if self.shard_max_bytes or self.shard_max_files:
+                with self._metrics.phase("shards"):
+                    targets = self._plan_shards(dst_root, sources, [files for _, files in groups])
+                    # one stream namespace over all shards: what the others ship (replace: the ones
+                    # not rebuilt now) + what earlier shards of this build planned
+                    rebuilt = {root for _, root, _ in targets} if self.mode == "replace" else set()
+                    self._shard_names = shard_stream_names(shard_dirs(dst_root), rebuilt)
+            else:
+                targets = [(resource_name, dst_root, groups)]
+
+            deleted_by_target = [None] * len(targets)
+            if changes is not None:
+                # shards were planned on the full file lists; keep only the resources that are affected
+                by_source = {c.source: c for c in changes}
+                narrowed = []
+                deleted_by_target = []
+                for name, root, groups in targets:
+                    changed = [(src, by_source[src].changed) for src, _ in groups]
+                    deleted = [p for src, _ in groups for p in by_source[src].deleted]
+                    if any(fs for _, fs in changed) or deleted:
+                        narrowed.append((name, root, changed))
+                        deleted_by_target.append(deleted)
+                targets = narrowed
+
+            for (name, root, groups), deleted in zip(targets, deleted_by_target):
+                summary["resources"].append(name)
+                if len(targets) > 1:
+                    self.log(f"🧩 Resource {name}: {sum(len(fs) for _, fs in groups)} Dateien")
+                # a lazy scan does not know its sources up front
+                self._build_resource(root, name, groups, summary, deleted=deleted,
+                                     sources=None if isinstance(groups, list) else sources)
+
+            if self.dry_run:
+                self.status("Plan fertig (Dry-Run) ✅")
+                return finish("planned", EXIT_OK)
+            self.status("Fertig ✅")
+            if summary["errors"]:
+                return finish("errors", EXIT_ERRORS)
+            return finish("ok", EXIT_OK)
+
+        except BuildStopped:
+            self.log("⛔ Abgebrochen.")
+            if not self.dry_run and find_journals(dst_root):
+                self.log("ℹ️ Weiter mit 'resume' (Journal im Ziel).")
+            return finish("aborted", EXIT_ABORTED)
+
+    def watch(self, debounce: float = WATCH_DEBOUNCE_SECS, poll: float = WATCH_POLL_SECS, on_summary=None,
+              use_inotify: bool = True) -> dict:
+        # a normal build, then merge updates with only the changed/deleted source files until stop();
+        # on_summary gets every build's summary, "resources" = the ones that need a restart
+        if self.move or self.dry_run:
+            raise ValueError("Watch-Modus geht nicht zusammen mit MOVE oder Dry-Run.")
+        sources, _ = dedupe_nested_sources(self.sources)
+        watcher = SourceWatcher(sources, debounce, poll, workers=self.scan_workers, should_stop=self._should_stop,
+                                log_fn=self.log, use_inotify=use_inotify)
+        # snapshot before the first build: whatever changes during it is picked up afterwards
+        watcher.start()
+        try:
+            summary = self.build()
+            if on_summary:
+                on_summary(summary)
+            if summary["result"] in ("aborted", "failed"):
+                return summary
+            self.mode = "merge"
+            self.log(f"👀 Watch aktiv ({watcher.method}, {debounce:g}s Ruhe vor dem Update) – STOP beendet")
+            while not self.stop_flag:
+                self.status("👀 Warte auf Änderungen…")
+                changes = watcher.wait()
+                if not changes:
+                    break
+                summary = self.build(changes)
+                if summary["resources"] and summary["result"] in ("ok", "errors"):
+                    self.log("🔁 Geändert → Server-Konsole: " + "; ".join(f"restart {n}" for n in summary["resources"]))
+                if on_summary:
+                    on_summary(summary)
+            self.status("Watch beendet")
+            return summary
+        finally:
+            watcher.close()
+
+    def _resume(self) -> dict:
+        # continue the interrupted build(s) journaled in dst_root (and its shards):
+        # same plan, finished targets are verified by size, the rest is transferred, then manifest + ensure
+        dst_root = self.dst_root.resolve()
+        started = time.time()
+        journals = find_journals(dst_root)
+        summary = self._new_summary(dst_root)
+        summary["resumed"] = True
+
+        def finish(result: str, exit_code: int) -> dict:
+            return self._finish(summary, started, result, exit_code)
+
+        if not journals:
+            self.log(f"ℹ️ Kein unterbrochener Build in {dst_root} ({JOURNAL_FILE} fehlt).")
+            return finish("empty", EXIT_EMPTY)
+
+        self._shard_names = None
+        if any(root != dst_root for root, _ in journals):
+            # shards planning their rest: names of the other shards and of every journaled transfer are taken
+            self._shard_names = shard_stream_names(
+                shard_dirs(dst_root), {root for root, j in journals if j["header"]["mode"] == "replace"})
+            for root, journal in journals:
+                out_root = Path(journal["header"]["out_root"])
+                for item in journal["items"]:
+                    folder, _, name = item[2].partition("/")
+                    if folder == "stream":
+                        self._shard_names.setdefault(name.lower(), (str(out_root / item[2]), None))
+
+        try:
+            for root, journal in journals:
+                header = journal["header"]
+                self.resource_name = header["resource"]
+                self.mode = header["mode"]
+                self.move = header["move"]
+                self.compact_manifest = header.get("compact_manifest", False)
+                self.manifest_globs = header.get("manifest_globs", True)
+                self.dedupe = header.get("dedupe", self.dedupe)
+                self.renumber = header.get("renumber", self.renumber)
+                self.sources = [Path(x) for x in header["sources"]]
+                summary.update(resource=header["resource"], mode=self.mode, move=self.move,
+                               sources=header["sources"])
+                summary["resources"].append(header["resource"])
+                self.log(f"⏯️ Setze {header['resource']} fort: {len(journal['done'])} von "
+                         f"{len(journal['items'])} Transfers waren fertig")
+                if journal["complete"]:
+                    summary["total"] += len(journal["items"])
+                    groups = []
+                else:
+                    # the sources are scanned again for what the plan did not reach yet
+                    groups = self._announce(iter_scan_sources(self.sources, workers=self.scan_workers,
+                                                              should_stop=self._should_stop), summary)
+                self._build_resource(root, header["resource"], groups, summary, resumed=journal,
+                                     sources=self.sources)
+
+            self.status("Fertig ✅")
+            if summary["errors"]:
+                return finish("errors", EXIT_ERRORS)
+            return finish("ok", EXIT_OK)
+
+        except BuildStopped:
+            self.log("⛔ Abgebrochen.")
+            return finish("aborted", EXIT_ABORTED)
+
+    def _announce(self, found, summary: dict):
+        for src, files in found:
+            self.log(f"🔎 {src} → {len(files)} relevante Dateien")
+            summary["total"] += len(files)
+            yield src, files
+
+    def _resume_plan(self, out_root: Path, journal: dict, rs: dict, blog: BuildLog):
+        # journaled items whose target has the planned size count as done; partial or missing
+        # targets are transferred again (overwritten; needs the source, a move may have taken it)
+        jobs = []
+        bases = {}
+        done_data = []
+        verified = 0
+        for i, item in enumerate(journal["items"]):
+            src_base, path, rel, size, _ = item
+            f = _journal_file(item)
+            target = out_root / rel
+            try:
+                size, mtime = source_stat(path)
+                current = f._replace(size=size, mtime=mtime)
+            except OSError:
+                current = None
+            unchanged = current is None or (current.size, current.mtime) == (f.size, f.mtime)
+            if unchanged and journal_target_done(journal, i, target, current is None):
+                verified += 1
+                self._record_state(f, rel)
+                if f.ext in DATA_EXTS:
+                    done_data.append(rel)
+                continue
+            if current is None:
+                rs["errors"] += 1
+                msg = f"❌ Quelle fehlt, Ziel unvollständig: {path} -> {rel}"
+                self.log(msg)
+                blog.write(msg)
+                continue
+            jobs.append(CopyJob(i, bases.setdefault(src_base, Path(src_base)), current, str(target), rel))
+
+        msg = f"⏯️ {verified} Ziele geprüft (Größe ok), {len(jobs)} werden noch übertragen"
+        self.log(msg)
+        blog.write(msg)
+        return jobs, journal["kept_data"] + done_data
+
+    def _build_resource(self, dst_root: Path, resource_name: str, groups, summary: dict, resumed: dict | None = None,
+                        deleted: list[str] | None = None, sources: list[Path] | None = None):
+        # one output resource: [stage] -> plan + copy pipeline -> fxmanifest -> ensure;
+        # groups: (source, files) pairs or a lazy scan (then with sources) -> planned and copied in chunks
+        # while later sources are still being scanned;
+        # resumed: the journal of an interrupted run replaces scan + plan;
+        # deleted (watch mode, merge): groups hold only changed files, these source paths are gone
+        mode = self.mode
+        move = self.move
+        if sources is None:
+            groups = list(groups)
+            sources = [src for src, _ in groups] or list(self.sources)
+        # an incomplete plan is scanned again: those files are counted by the scan
+        total = len(resumed["items"]) if resumed and resumed["complete"] else 0
+        rs = {k: 0 for k in RESOURCE_COUNTERS}
+        rs_result = "failed"
+        dry = self.dry_run
+        metrics = BuildMetrics()
+
+        lazy = not isinstance(groups, list)
+
+        def consume(groups):
+            # counts the files; with a lazy scan the time spent waiting for it counts as "scan"
+            nonlocal total
+            it = iter(groups)
+            while True:
+                t0 = time.perf_counter()
+                group = next(it, None)
+                if lazy:
+                    metrics.add("scan", time.perf_counter() - t0)
+                if group is None:
+                    return
+                total += len(group[1])
+                yield group
+
+        groups = consume(groups)
+        # dry run: nothing is written, not even the logs
+        blog = BuildLog(dst_root, json_lines=self.json_log, enabled=not dry)
+        file_log = blog.write
+
+        self._state = None
+        self._transfers = None
+        # replace builds into a sibling staging dir (out_root) and swaps stream/ + data/ in at the end,
+        # the live output stays untouched until then
+        staged = mode == "replace" and not dry
+        stage = None
+        swapped = False
+        out_root = dst_root
+        journal = None
+        packer = None
+        if resumed:
+            out_root = Path(resumed["header"]["out_root"])
+            stage = out_root if staged else None
+        try:
+            if resumed and not (out_root / "stream").is_dir():
+                raise RuntimeError(f"Build-Ordner fehlt, Fortsetzen nicht möglich: {out_root}")
+            if not dry:
+                safe_mkdir(dst_root)
+            if staged and not resumed:
+                cleanup_stale_stages(dst_root)
+                stage = dst_root.parent / f"{STAGE_PREFIX}{dst_root.name}-{os.getpid()}-{ts()}"
+                out_root = stage
+                self.log(f"🏗️ replace: baue in {stage.name}, altes stream/ und data/ bleibt bis zum Tausch online")
+            if not dry:
+                safe_mkdir(out_root / "stream")
+                safe_mkdir(out_root / "data")
+            if staged and move and not resumed:
+                (stage / STAGE_MOVE_MARKER).write_text("\n".join(str(x) for x in sources) + "\n", encoding="utf-8")
+
+            # replace starts from an empty state; merge reuses the previous one
+            if self.incremental:
+                self._state = load_build_state(dst_root) if mode == "merge" else {"version": STATE_VERSION, "files": {}}
+                self._state["resource"] = resource_name
+
+            blog.record("build_start", resource=resource_name, destination=str(dst_root), mode=mode, move=move,
+                        sources=[str(x) for x in sources])
+            file_log(f"=== Build start {datetime.now().isoformat(timespec='seconds')} ===")
+            file_log(f"Resource: {resource_name}")
+            file_log(f"Destination: {dst_root}")
+            file_log(f"Mode: {mode} | Move: {move}")
+            file_log("Sources:")
+            for s in sources:
+                file_log(f" - {s}")
+            file_log("")
+
+            data_removed = []
+            if deleted:
+                with metrics.phase("delete"):
+                    data_removed = self._remove_deleted(dst_root, deleted, rs, blog)
+
+            # a watch update only sees the changed files -> no budget report for the resource
+            budget_scan = ({"analyzed": [], "skipped": 0}
+                           if self.analyze and not resumed and deleted is None and not dry else None)
+            resumed_jobs = []
+            if resumed:
+                with metrics.phase("plan"):
+                    resumed_jobs, kept_data = self._resume_plan(out_root, resumed, rs, blog)
+                journal = BuildJournal(dst_root)
+                journal.reopen()
+                self._ymt_base, self._ymt_donors, self._ymt_writes = {}, {}, {}
+                plan = None
+                if not resumed["complete"]:
+                    # stopped while later sources were still being scanned/planned: the rest is planned into
+                    # the same output (on replace the stage) next to the journaled files -> still one swap
+                    msg = f"▶️ {resource_name}: Plan war unvollständig, restliche Dateien werden dazu geplant"
+                    self.log(msg)
+                    file_log(msg)
+                    all_jobs = None
+                    if self.renumber:
+                        groups = list(groups)
+                        all_jobs = [(src, f) for src, files in groups for f in files]
+                    with metrics.phase("plan"):
+                        plan = self._planner(out_root, index_output(out_root), rs, blog, all_jobs,
+                                             reserved=[job.rel for job in resumed_jobs])
+                    journaled_paths = {item[1] for item in resumed["items"]}
+                    groups = ((src, [f for f in files if f.path not in journaled_paths]) for src, files in groups)
+                # merged .ymt files: the journaled ones, a journaled base the new plan extends further
+                for rel, data in resumed["rewrites"].items():
+                    self._ymt_writes.setdefault(rel, data)
+                for item in resumed["items"]:
+                    if item[1] in self._ymt_base:
+                        self._ymt_writes[item[2]] = self._ymt_base[item[1]]
+                chunks = self._plan_chunks(plan, groups, rs, metrics, None, first_id=len(resumed["items"]))
+            else:
+                self.status("Plane Zielnamen…")
+                with metrics.phase("plan"):
+                    # an interrupted earlier run: its finished files are known, no prefixed copies of them
+                    if self._state is not None and mode == "merge":
+                        self._adopt_journal(dst_root)
+                    # every target name is decided in memory against one index of stream/ + data/
+                    index = {"stream": {}, "data": {}} if mode == "replace" else index_output(dst_root)
+                all_jobs = None
+                if self.renumber:
+                    # free drawable indices are decided over all files -> whole scan before the first copy
+                    groups = list(groups)
+                    all_jobs = [(src, f) for src, files in groups for f in files]
+                with metrics.phase("plan"):
+                    # renumbering (+ .ymt merges) is decided here, before anything is journaled or copied
+                    plan = self._planner(out_root, index, rs, blog, all_jobs)
+                kept_data = []
+                entries = [] if dry else None
+                chunks = self._plan_chunks(plan, groups, rs, metrics, budget_scan, entries)
+
+            def log_plan_counts():
+                if rs["unchanged"] or rs["updated"]:
+                    msg = f"⏩ Inkrementell: {rs['unchanged']} unverändert übersprungen, {rs['updated']} geändert"
+                    self.log(msg)
+                    file_log(msg)
+                if rs["deduped"]:
+                    msg = (f"♻️ Dedupe: {rs['deduped']} identische Dateien übersprungen, "
+                           f"{rs['bytes_saved'] / (1024 * 1024):.1f} MB gespart")
+                    self.log(msg)
+                    file_log(msg)
 
-    if unknown:
-        lines.append("-- Unclassified data files (loaded via files{}, may still need manual data_file mapping for some packs):")
-        for p in sorted(set(unknown)):
-            lines.append(f"--   {p}")
-        lines.append("")
+            if self.dry_run:
+                for _ in chunks:
+                    pass
+                log_plan_counts()
+                summary["plan"].append(self._plan_report(dst_root, resource_name, entries, rs))
+                rs_result = "planned"
+                return
 
-    lines.append(f"-- Add to server.cfg: ensure {resource_name}")
-    lines.append("-- === End auto-added block ===")
-    lines.append("")
-    return "\n".join(lines)
+            if not resumed:
+                journal = BuildJournal(dst_root)
+                journal.begin({
+                    "resource": resource_name,
+                    "destination": str(dst_root),
+                    "out_root": str(out_root),
+                    "mode": mode,
+                    "move": move,
+                    "compact_manifest": self.compact_manifest,
+                    "manifest_globs": self.manifest_globs,
+                    "dedupe": self.dedupe,
+                    "renumber": self.renumber,
+                    "sources": [str(x) for x in sources],
+                    "started": time.time(),
+                }, [])
+
+            # 1) plan + 2) apply as a pipeline: each plan chunk is journaled, then its transfers go to the
+            # worker pool (largest files first) while the next chunk is scanned/planned; at most
+            # COPY_WINDOW transfers are in flight
+            done = 0
+            transfers = 0
+            bytes_total = 0
+            copied_data = []
+            action = "MOVE" if move else "COPY"
+            self.status("Kopiere Dateien…")
+            self.progress(0, 0, 0, 0)
+
+            if self.package:
+                # packed while copying: every finished target goes straight into the archive
+                packer = PackageWriter(package_path(Path(self.package_dir) if self.package_dir else dst_root.parent,
+                                                    resource_name, self.package), self.package, resource_name)
+                packer.start()
+
+            copy_started = time.time()
+            self._transfers = TransferEngine(self.transfer_mode, self._should_stop)
+            self._detect_devices(sources, out_root)
+            if move and any(is_archive_source(src) for src in sources):
+                self.log("ℹ️ MOVE: Archive bleiben unverändert, ihr Inhalt wird kopiert")
+            results: queue.Queue = queue.Queue()
+
+            def run_file(job: CopyJob):
+                try:
+                    with self._io_slot:
+                        results.put((job, self._transfer(job), None))
+                except BaseException as e:
+                    results.put((job, None, e))
+
+            def submit(jobs: list[CopyJob]):
+                # archive members go through one task per archive (read once, front to back);
+                # archives first: they are the longest tasks, loose files fill the other workers
+                archives: dict[str, list[CopyJob]] = {}
+                loose = []
+                for job in sorted(jobs, key=lambda j: j.file.size, reverse=True):
+                    member = split_member(job.file.path)
+                    if member:
+                        archives.setdefault(member[0], []).append(job)
+                    else:
+                        loose.append(job)
+                for archive, members in archives.items():
+                    pool.submit(self._transfer_archive, archive, members, results)
+                for job in loose:
+                    pool.submit(run_file, job)
 
-def write_or_extend_fxmanifest(dst_root: Path, resource_name: str, data_rel_paths: list[str], log_fn):
-    fx = dst_root / "fxmanifest.lua"
+            # merged .ymt files: written after the copies, journaled with the chunk that plans them
+            rewrites = self._ymt_writes
+            journaled = dict(resumed["rewrites"]) if resumed else {}
 
-    detected = []
-    unknown = []
+            pool = ThreadPoolExecutor(max_workers=max(1, self.copy_workers))
+            try:
+                in_flight = 0
+                if resumed_jobs:
+                    # the unfinished transfers of the journal go first
+                    transfers += len(resumed_jobs)
+                    bytes_total += sum(job.file.size for job in resumed_jobs)
+                    in_flight += len(resumed_jobs)
+                    submit(resumed_jobs)
+                planning = True
+                while True:
+                    while planning and in_flight < COPY_WINDOW:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            planning = False
+                            if not (resumed and resumed["complete"]):
+                                journal.planned()
+                            break
+                        jobs, kept = chunk
+                        kept_data.extend(kept)
+                        for rel, data in rewrites.items():
+                            if journaled.get(rel) != data:
+                                journal.rewrite(rel, data)
+                                journaled[rel] = data
+                        if not jobs:
+                            if kept:
+                                journal.plan([], kept)
+                            continue
+                        journal.plan([[str(job.source), job.file.path, job.rel, job.file.size, job.file.mtime]
+                                      for job in jobs], kept)
+                        transfers += len(jobs)
+                        bytes_total += sum(job.file.size for job in jobs)
+                        in_flight += len(jobs)
+                        submit(jobs)
+                        self.progress(done, transfers, rs["bytes"], bytes_total, time.time() - copy_started)
+                    if not in_flight:
+                        break
+                    try:
+                        job, res, err = results.get(timeout=0.2)
+                    except queue.Empty:
+                        self._check_stop()
+                        continue
+                    in_flight -= 1
+                    if isinstance(err, BuildStopped):
+                        self._check_stop()
+                        continue
+                    f = job.file
+                    if err is None:
+                        n, digest, method, secs = res
+                        metrics.file(f.path, n, secs)
+                        rs["bytes"] += n
+                        rs["copied"] += 1
+                        journal.done(job.id)
+                        self._record_state(f, job.rel, digest)
+                        if f.ext in DATA_EXTS:
+                            copied_data.append((job.id, job.rel))
+                        if packer is not None and job.rel not in rewrites:
+                            packer.add(job.target, job.rel)
+                        msg = f"[{action}] {f.name}  (from: {job.source.name}) -> {job.rel}"
+                        blog.record("file", action=action, source=f.path, target=job.rel, bytes=n,
+                                    duration=round(secs, 6), outcome="ok", method=method)
+                    else:
+                        rs["errors"] += 1
+                        msg = f"❌ Fehler bei {f.path}: {err}"
+                        blog.record("file", action=action, source=f.path, target=job.rel, bytes=0,
+                                    duration=None, outcome="error", error=str(err))
+                    self.log(msg)
+                    file_log(msg)
+                    done += 1
+                    self.progress(done, transfers, rs["bytes"], bytes_total, time.time() - copy_started)
+                    self._check_stop()
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+                chunks.close()
+                summary["copy_seconds"] += time.time() - copy_started
+                metrics.add("copy", time.time() - copy_started)
+
+            log_plan_counts()
+            with metrics.phase("meta"):
+                self._write_rewrites(out_root, rewrites, rs, blog)
+            copy_secs = max(time.time() - copy_started, 1e-6)
+            mb_per_s = round(rs["bytes"] / copy_secs / (1024 * 1024), 2)
+            msg = (f"📦 {rs['copied']} Dateien, {rs['bytes'] / (1024 * 1024):.1f} MB in {copy_secs:.1f}s "
+                   f"({mb_per_s} MB/s, {self.copy_workers} Worker)")
+            self.log(msg)
+            file_log(msg)
+            if self._transfers.counts:
+                msg = "🔧 Transfer: " + ", ".join(f"{k}={v}" for k, v in sorted(self._transfers.counts.items()))
+                self.log(msg)
+                file_log(msg)
 
-    for rp in data_rel_paths:
-        ext = Path(rp).suffix.lower()
-        abs_path = (dst_root / rp.replace("/", os.sep))
-        if ext == ".meta" and abs_path.exists():
-            t = detect_data_file_type(abs_path)
-            if t:
-                detected.append((t, rp))
-            else:
-                unknown.append(rp)
-        else:
-            unknown.append(rp)
+            if budget_scan is not None:
+                with metrics.phase("analyze"):
+                    self._report_budget(dst_root, resource_name, budget_scan, rs, blog)
+
+            # plan order, not completion order -> same fxmanifest as a serial run
+            data_rel_paths = kept_data + [rel for _, rel in sorted(copied_data)]
+
+            if packer is not None:
+                # the queued stage paths must be packed before the swap renames them
+                with metrics.phase("package"):
+                    packer.drain()
+
+            if staged:
+                self.status("Tausche stream/ und data/…")
+                with metrics.phase("swap"):
+                    old = swap_in_stage(stage, dst_root)
+                swapped = True
+                msg = f"🔁 stream/ + data/ getauscht, {len(old)} alte Ordner werden im Hintergrund gelöscht"
+                self.log(msg)
+                file_log(msg)
+                remove_in_background(stage)
 
-    new_files = list(data_rel_paths)
+            # fxmanifest extend/create
+            self.status("Erweitere fxmanifest.lua…")
+            self.log("🧾 fxmanifest.lua wird erweitert/erstellt…")
+            # classification first (fills the .meta cache), so "manifest" is only the manifest work
+            with metrics.phase("meta"):
+                classify_data_files(dst_root, data_rel_paths)
+            with metrics.phase("manifest"):
+                if data_removed and not self.compact_manifest:
+                    # appending can't drop lines: the removed data files' own lines are taken out
+                    remove_fxmanifest_entries(dst_root, data_removed, self.log)
+                write_or_extend_fxmanifest(dst_root, resource_name, data_rel_paths, self.log,
+                                           compact=self.compact_manifest, use_globs=self.manifest_globs)
 
-    if fx.exists():
-        old_text = fx.read_text(encoding="utf-8", errors="ignore")
-        old_files, old_datafiles = parse_fxmanifest_existing(old_text)
+            # ensure helper files
+            try:
+                with metrics.phase("ensure"):
+                    write_ensure_files(dst_root, resource_name, self.log)
+                file_log("ensure files written.")
+            except Exception as e:
+                msg = f"⚠️ Ensure-Dateien konnten nicht erstellt werden: {e}"
+                self.log(msg)
+                file_log(msg)
 
-        truly_new_files = sorted(set(new_files) - set(old_files))
-        truly_new_datafiles = sorted(set(detected) - set(old_datafiles))
-        truly_new_unknown = sorted(set(unknown) - set(old_files))
+            if packer is not None:
+                self.status("Schreibe Paket…")
+                try:
+                    with metrics.phase("package"):
+                        packer.add_tree(dst_root)
+                        packer.add(dst_root / "fxmanifest.lua", "fxmanifest.lua")
+                        path = packer.close()
+                    summary["packages"].append(str(path))
+                    msg = f"🗜️ Paket: {path} ({packer.files} Dateien, {packer.bytes / (1024 * 1024):.1f} MB)"
+                except Exception as e:
+                    rs["errors"] += 1
+                    msg = f"❌ Paket konnte nicht geschrieben werden: {e}"
+                packer = None
+                self.log(msg)
+                file_log(msg)
 
-        if not truly_new_files and not truly_new_datafiles and not truly_new_unknown:
-            log_fn("ℹ️ fxmanifest.lua: nichts Neues hinzuzufügen (alles schon vorhanden).")
+            file_log("")
+            file_log(f"Summary: total={total}, duplicates={rs['duplicates']}, deduped={rs['deduped']}, "
+                     f"bytes_saved={rs['bytes_saved']}, renumbered={rs['renumbered']}, "
+                     f"oversized={rs['oversized']}, corrupt={rs['corrupt']}, removed={rs['removed']}, "
+                     f"errors={rs['errors']}")
+            copy_secs = metrics.phases.get("copy", 0.0)
+            if copy_secs > 0:
+                file_log(f"Throughput: {rs['copied'] / copy_secs:.1f} files/s, "
+                         f"{rs['bytes'] / copy_secs / (1024 * 1024):.2f} MB/s")
+            rs_result = "errors" if rs["errors"] else "ok"
+            journal.finish()
+
+        except BuildStopped:
+            file_log("ABORTED by user.")
+            rs_result = "aborted"
+            raise
+
+        finally:
+            for k in RESOURCE_COUNTERS:
+                summary[k] += rs[k]
+            if self._transfers is not None:
+                for k, v in self._transfers.counts.items():
+                    summary["transfer_methods"][k] = summary["transfer_methods"].get(k, 0) + v
+            # also after an abort: finished files are known to the next merge run
+            # a failed staged build keeps the old output -> keep its state too
+            if journal is not None:
+                journal.close()
+            if packer is not None:
+                packer.abort()
+            # interrupted after the journal was written -> the stage is kept for 'resume'
+            if staged and not swapped and stage is not None:
+                if journal is not None or move:
+                    msg = f"⚠️ Build nicht fertig – Zwischenstand bleibt in {stage} (weiter mit 'resume')"
+                    self.log(msg)
+                    file_log(msg)
+                else:
+                    remove_in_background(stage)
+            if self._state is not None and not dry and (swapped or not staged):
+                try:
+                    with metrics.phase("state"):
+                        save_build_state(dst_root, self._state)
+                except Exception as e:
+                    file_log(f"⚠️ {STATE_FILE} konnte nicht gespeichert werden: {e}")
+            # scan/shards ran once for all resources -> shown with each resource's own phases
+            phases = BuildMetrics()
+            phases.phases = {k: v for k, v in self._metrics.phases.items() if k in ("scan", "shards")}
+            phases.merge(metrics)
+            lines = phases.report_lines()
+            self.log(lines[0])
+            for line in lines:
+                file_log(line)
+            if rs_result in ("ok", "errors"):
+                file_log(f"=== Build done {datetime.now().isoformat(timespec='seconds')} ===")
+            self._metrics.merge(metrics)
+            blog.record("build_done", result=rs_result, resource=resource_name, destination=str(dst_root),
+                        total=total, **rs)
+            blog.close()
+
+    def _write_rewrites(self, out_root: Path, rewrites: dict[str, bytes], rs: dict, blog: BuildLog):
+        # base .ymt of renumbered collections, over the copied/unchanged file
+        for rel, data in rewrites.items():
+            path = out_root / rel
+            try:
+                if path.read_bytes() == data:
+                    continue
+            except OSError:
+                pass
+            try:
+                write_bytes_atomic(path, data)
+                msg = f"🧩 {rel}: um die neu nummerierten Drawables erweitert"
+            except OSError as e:
+                rs["errors"] += 1
+                msg = f"❌ {rel} konnte nicht geschrieben werden: {e}"
+            self.log(msg)
+            blog.write(msg)
+
+    def _remove_deleted(self, dst_root: Path, deleted: list[str], rs: dict, blog: BuildLog) -> list[str]:
+        # watch mode: targets of deleted source files go away (unless another source still maps
+        # to the same target, e.g. a deduped twin); -> the removed data/ files
+        if self._state is None:
+            msg = f"⚠️ {len(deleted)} gelöschte Quelldateien: ohne {STATE_FILE} unbekannt, welche Ziele dazugehören"
+            self.log(msg)
+            blog.write(msg)
+            return []
+        files = self._state["files"]
+        gone = [(path, files.pop(source_key(path), None)) for path in deleted]
+        still_used = {e.get("target") for e in files.values()}
+        data_removed = []
+        for path, entry in gone:
+            if entry is None or entry.get("deduped") or entry.get("target") in still_used:
+                continue
+            rel = entry["target"]
+            try:
+                os.unlink(dst_root / rel)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                rs["errors"] += 1
+                msg = f"❌ Fehler beim Löschen von {rel}: {e}"
+                self.log(msg)
+                blog.write(msg)
+                continue
+            rs["removed"] += 1
+            if rel.startswith("data/"):
+                data_removed.append(rel)
+            msg = f"[DEL] {rel}  (Quelle gelöscht: {path})"
+            self.log(msg)
+            blog.write(msg)
+            blog.record("file", action="DEL", source=path, target=rel, bytes=0, duration=0.0, outcome="removed")
+        return data_removed
+
+    def _adopt_journal(self, dst_root: Path):
+        # merge rerun after a crash: targets that run finished go into the state before planning
+        journal = load_journal(dst_root)
+        if not journal or Path(journal["header"]["out_root"]) != dst_root:
             return
+        adopted = 0
+        for i, item in enumerate(journal["items"]):
+            if journal_target_done(journal, i, dst_root / item[2], not source_exists(item[1])):
+                self._record_state(_journal_file(item), item[2])
+                adopted += 1
+        if adopted:
+            self.log(f"ℹ️ Unterbrochener Build gefunden: {adopted} fertige Dateien übernommen")
+
+    def _plan_chunks(self, plan, groups, rs: dict, metrics: BuildMetrics, budget_scan: dict | None,
+                     entries: list | None = None, first_id: int = 0):
+        # plan stage of the pipeline -> (copy jobs, unchanged data files) per source, folders in
+        # PLAN_CHUNK slices (an archive stays one chunk: one pass per archive); budget_scan collects
+        # the RSC7 headers of every file that ships, entries (dry run) every PlanEntry
+        next_id = first_id
+        for src, files in groups:
+            self._check_stop()
+            step = max(len(files), 1) if is_archive_source(src) else PLAN_CHUNK
+            for start in range(0, len(files), step):
+                part = [(src, f) for f in files[start:start + step]]
+                with metrics.phase("plan"):
+                    planned = plan(part)
+                if budget_scan is not None:
+                    # only what ends up in stream/ (no dedupe skips), under its target name
+                    shipped = [(src, e.file._replace(name=e.target.name)) for e in planned
+                               if e.action in ("copy", "update", "unchanged")]
+                    with metrics.phase("analyze"):
+                        budget_scan["analyzed"] += analyze_stream_files(shipped, self.scan_workers,
+                                                                        self._should_stop)
+                        budget_scan["skipped"] += sum(1 for _, f in shipped
+                                                      if f.ext in STREAM_EXTS and not member_random_access(f.path))
+                if entries is not None:
+                    entries.extend(planned)
+                    continue
+                jobs = []
+                kept = []
+                for e in planned:
+                    # targets are always <out_root>/stream|data/<name>
+                    rel = f"{e.target.parent.name}/{e.target.name}"
+                    if e.file.path in self._ymt_base and e.action in ("copy", "update", "unchanged"):
+                        self._ymt_writes[rel] = self._ymt_base[e.file.path]
+                    if e.action in ("copy", "update"):
+                        jobs.append(CopyJob(next_id, src, e.file, str(e.target), rel))
+                        next_id += 1
+                    elif e.action == "unchanged" and e.file.ext in DATA_EXTS:
+                        kept.append(rel)
+                yield jobs, kept
+        self._check_stop()
+
+    def _planner(self, dst_root: Path, index: dict, rs: dict, blog: BuildLog, all_jobs=None, reserved=()):
+        # -> plan(jobs) -> list[PlanEntry]; called chunk by chunk, the name state carries over, so names
+        # are assigned serially in job order -> same names as a serial run;
+        # Always FLATTEN into stream/ and data/ (so your output is always correct for FiveM)
+        # name_key -> (source path | existing target, size | None)
+        used_names = {"stream": {}, "data": {}}
+        folders = {"stream": dst_root / "stream", "data": dst_root / "data"}
+        deduper = ContentDeduper() if self.dedupe else None
+
+        # names tracked in the state stay reserved, new files never take them
+        prev_files = dict(self._state["files"]) if self._state is not None else {}
+        for entry in prev_files.values():
+            folder, _, name = entry.get("target", "").partition("/")
+            if folder in used_names:
+                used_names[folder].setdefault(name.lower(), (str(dst_root / folder / name), None))
+        # resume: targets of journaled transfers that are not written yet
+        for rel in reserved:
+            folder, _, name = rel.partition("/")
+            used_names[folder].setdefault(name.lower(), (str(dst_root / rel), None))
+
+        # consolidation: colliding drawables get free indices of their slot instead of a prefix
+        # (needs all_jobs: every file of the resource)
+        renames = {}
+        self._ymt_base = {}
+        self._ymt_donors = {}
+        self._ymt_writes = {}
+        if self.renumber:
+            renames = self._plan_renumbering(all_jobs, prev_files, index, dst_root, rs, blog)
+
+        # sharded: stream names claimed by the other shards (and registered for them)
+        shared = self._shard_names if self._shard_names is not None else {}
+
+        def plan(jobs) -> list[PlanEntry]:
+            entries = []
+            for src_base, f in jobs:
+                folder = "stream" if f.ext in STREAM_EXTS else "data"
+                used_set = used_names[folder]
+                existing = index[folder]
+                foreign = shared if folder == "stream" else {}
+
+                # .ymt of a renumbered source: its drawables go into the collection's base .ymt
+                if f.path in self._ymt_donors:
+                    target = folders[folder] / self._ymt_donors[f.path]
+                    self._record_state(f, f"{folder}/{target.name}", deduped=True)
+                    entries.append(PlanEntry(src_base, f, target, "merged", None))
+                    continue
+
+                # incremental: unchanged files are skipped, changed ones reuse their target name
+                prev = prev_files.get(source_key(f.path))
+                if prev:
+                    prev_folder, _, prev_name = prev.get("target", "").partition("/")
+                    if prev_name.lower() in index.get(prev_folder, {}):
+                        if self._unchanged_in_state(f, prev):
+                            rs["unchanged"] += 1
+                            self._state["files"][source_key(f.path)] = prev
+                            if not prev.get("deduped"):
+                                entries.append(PlanEntry(src_base, f, dst_root / prev["target"], "unchanged", None))
+                            continue
+                        if not prev.get("deduped"):
+                            rs["updated"] += 1
+                            entries.append(PlanEntry(src_base, f, dst_root / prev["target"], "update", None))
+                            continue
+
+                reason = "renumber" if f.path in renames else None
+                target = folders[folder] / renames.get(f.path, f.name)
+                name_key = target.name.lower()
+
+                # duplicate filename handling: identical content is skipped (dedupe),
+                # real conflicts get prefixed by source folder name
+                occupant = _name_occupant(used_set, existing, name_key, folders[folder])
+                if occupant and deduper and deduper.same(f.path, f.size, *occupant):
+                    self._skip_identical(rs, blog, src_base, f, target, dst_root)
+                    entries.append(PlanEntry(src_base, f, target, "dedupe", None))
+                    continue
+                if occupant or name_key in foreign:
+                    rs["duplicates"] += 1
+                    reason = "duplicate"
+                    prefix = source_label(src_base).replace(" ", "_")
+                    target = target.with_name(f"{prefix}_{target.name}")
+                    name_key = target.name.lower()
 
-        block = build_fxmanifest_block(resource_name, truly_new_files, truly_new_datafiles, truly_new_unknown)
-        fx.write_text(old_text.rstrip() + "\n" + block, encoding="utf-8")
-        log_fn("✅ fxmanifest.lua erweitert (append).")
-    else:
-        base = []
-        base.append("fx_version 'cerulean'")
-        base.append("game 'gta5'")
-        base.append("")
-        base.append(f"-- Auto-generated by {APP_TITLE} {APP_VERSION}")
-        base.append(f"-- Resource: {resource_name}")
-        base.append(f"-- Generated: {datetime.now().isoformat(timespec='seconds')}")
-        base.append("")
-        base_text = "\n".join(base)
+                    # still colliding? add timestamp (+ counter, decided in memory)
+                    occupant = _name_occupant(used_set, existing, name_key, folders[folder])
+                    if occupant and deduper and deduper.same(f.path, f.size, *occupant):
+                        self._skip_identical(rs, blog, src_base, f, target, dst_root)
+                        entries.append(PlanEntry(src_base, f, target, "dedupe", None))
+                        continue
+                    if occupant or name_key in foreign:
+                        rs["duplicates"] += 1
+                        reason = "duplicate_ts"
+                        taken = {**existing, **foreign} if foreign else existing
+                        target = target.with_name(_free_name(used_set, taken, target.stem, target.suffix))
+                        name_key = target.name.lower()
+
+                used_set[name_key] = (f.path, f.size)
+                if folder == "stream" and self._shard_names is not None:
+                    shared[name_key] = (f.path, f.size)
+                entries.append(PlanEntry(src_base, f, target, "copy", reason))
+            return entries
+
+        return plan
+
+    def _plan_report(self, dst_root: Path, resource_name: str, entries: list[PlanEntry], rs: dict) -> dict:
+        # dry run: the plan as data (JSON) + one log line per file that would be written
+        action = "move" if self.move else "copy"
+        items = []
+        for e in entries:
+            rel = e.target.relative_to(dst_root).as_posix()
+            item = {"source": e.file.path, "target": rel, "action": action if e.action == "copy" else e.action,
+                    "bytes": e.file.size}
+            if e.reason:
+                item["reason"] = e.reason
+            items.append(item)
+            if e.action in ("copy", "update"):
+                note = f"  ({e.reason})" if e.reason else ""
+                self.log(f"[PLAN {item['action'].upper()}] {e.file.name}  (from: {e.source.name}) -> {rel}{note}")
+
+        writes = [e for e in entries if e.action in ("copy", "update")]
+        totals = {
+            "files": len(writes),
+            "bytes": sum(e.file.size for e in writes),
+            "renames": sum(1 for e in writes if e.reason),
+            "dedupes": rs["deduped"],
+            "unchanged": rs["unchanged"],
+            "updates": rs["updated"],
+        }
+        self.log(f"📝 Plan {resource_name}: {totals['files']} Dateien ({totals['bytes'] / (1024 * 1024):.1f} MB), "
+                 f"{totals['renames']} umbenannt, {totals['dedupes']} identisch, {totals['unchanged']} unverändert")
+        return {"resource": resource_name, "destination": str(dst_root), "mode": self.mode,
+                "totals": totals, "entries": items}
+
+    def _report_budget(self, dst_root: Path, resource_name: str, budget_scan: dict, rs: dict, blog: BuildLog):
+        # the RSC7 headers were read per plan chunk (before a move takes the sources away),
+        # report goes next to builder.log
+        analyzed = budget_scan["analyzed"]
+        skipped = budget_scan["skipped"]
+        if skipped:
+            msg = f"ℹ️ {skipped} Stream-Dateien in .tar-Archiven nicht geprüft (kein Direktzugriff)"
+            self.log(msg)
+            blog.write(msg)
+        if not analyzed:
+            return
+        try:
+            report = write_budget_report(dst_root, resource_name, analyzed, self.budget)
+        except OSError as e:
+            self.log(f"⚠️ {BUDGET_REPORT} konnte nicht geschrieben werden: {e}")
+            return
+        rs["oversized"] = len(report["oversized"])
+        rs["corrupt"] = len(report["broken"])
+        for src, info in report["oversized"]:
+            msg = (f"⚠️ Zu groß: {info.name} (physisch {_mb(info.physical)}, virtuell {_mb(info.virtual)}, "
+                   f"from: {src.name})")
+            self.log(msg)
+            blog.write(msg)
+        for src, info in report["broken"]:
+            msg = f"❌ Defekt: {info.name} – {info.problem} (from: {src.name})"
+            self.log(msg)
+            blog.write(msg)
+        for src in report["sources_over"]:
+            msg = f"⚠️ Source über Budget ({self.budget['source_mb']:g} MB): {src.name}"
+            self.log(msg)
+            blog.write(msg)
+        msg = (f"📊 Streaming-Budget: {len(analyzed)} Dateien, physisch {_mb(report['physical'])}, "
+               f"virtuell {_mb(report['virtual'])}"
+               + (f" ⚠️ über {self.budget['resource_mb']:g} MB" if report["resource_over"] else "")
+               + f" → {BUDGET_REPORT}")
+        self.log(msg)
+        blog.write(msg)
+        blog.record("budget", resource=resource_name, files=len(analyzed), virtual=report["virtual"],
+                    physical=report["physical"], oversized=rs["oversized"], corrupt=rs["corrupt"],
+                    sources_over=[str(s) for s in report["sources_over"]], resource_over=report["resource_over"])
+
+    def _plan_shards(self, dst_root: Path, sources, scanned):
+        # whole sources are packed into <name>_1..N next to dst_root (first fit, in source
+        # order), so a pack's .meta and stream files always share a resource; merge keeps
+        # earlier assignments from the shard map
+        map_path = dst_root.parent / f".{dst_root.name}{SHARD_MAP_SUFFIX}"
+        prev = {}
+        if self.mode == "merge":
+            try:
+                prev = json.loads(map_path.read_text(encoding="utf-8")).get("sources", {})
+            except Exception:
+                prev = {}
+
+        max_bytes = self.shard_max_bytes or float("inf")
+        max_files = self.shard_max_files or float("inf")
+        load: dict[int, list] = {}
+        assignment = dict(prev)
+        current = {source_key(str(src)): (sum(f.size for f in files), len(files)) for src, files in zip(sources, scanned)}
+
+        for key, entry in prev.items():
+            b, n = current.get(key, (entry.get("bytes", 0), entry.get("files", 0)))
+            slot = load.setdefault(entry["shard"], [0, 0])
+            slot[0] += b
+            slot[1] += n
+            assignment[key] = {"shard": entry["shard"], "bytes": b, "files": n}
+
+        for src, files in zip(sources, scanned):
+            key = source_key(str(src))
+            if key in assignment:
+                continue
+            b, n = current[key]
+            shard = None
+            for idx in sorted(load):
+                if load[idx][0] + b <= max_bytes and load[idx][1] + n <= max_files:
+                    shard = idx
+                    break
+            if shard is None:
+                shard = max(load, default=0) + 1
+                load[shard] = [0, 0]
+                if b > max_bytes or n > max_files:
+                    self.log(f"⚠️ {src.name} allein größer als das Shard-Limit → eigene Resource")
+            load[shard][0] += b
+            load[shard][1] += n
+            assignment[key] = {"shard": shard, "bytes": b, "files": n}
 
-        block = build_fxmanifest_block(resource_name, new_files, detected, unknown)
-        fx.write_text(base_text + block, encoding="utf-8")
-        log_fn("✅ fxmanifest.lua erstellt (neu).")
+        try:
+            if not self.dry_run:
+                map_path.write_text(json.dumps({"resource": self.resource_name, "sources": assignment},
+                                               ensure_ascii=False, indent=1), encoding="utf-8")
+        except OSError as e:
+            self.log(f"⚠️ Shard-Zuordnung konnte nicht gespeichert werden: {e}")
+
+        by_shard: dict[int, list] = {}
+        for src, files in zip(sources, scanned):
+            by_shard.setdefault(assignment[source_key(str(src))]["shard"], []).append((src, files))
+
+        self.log(f"🧩 Sharding: {len(by_shard)} von {len(load)} Resources betroffen")
+        return [(f"{self.resource_name}_{idx}", dst_root.parent / f"{dst_root.name}_{idx}", groups)
+                for idx, groups in sorted(by_shard.items())]
+
+# ---------- Batch build (build file with several resources) ----------
+# {
+#   "jobs": 2, "io_limit": 4,
+#   "defaults": {"mode": "merge", "dedupe": true},
+#   "resources": [
+#     {"name": "clothes", "dst": "resources/[clothes]/clothes", "sources": ["packs/a", "packs/b.zip"]},
+#     {"name": "cars", "dst": "resources/[cars]/cars", "sources": ["cars/*"], "mode": "replace"}
+#   ]
+# }
+# relative paths are relative to the build file, a source ending in * means every subfolder / archive
+BATCH_DEFAULT_JOBS = 2
+BATCH_DEFAULT_IO_LIMIT = 8
+BATCH_OPTIONS = {
+    # build file key -> PackBuilder argument (same names as in the settings file)
+    "mode": "mode", "move": "move", "dedupe": "dedupe", "state": "incremental", "state_hash": "state_hash",
+    "transfer_mode": "transfer_mode", "json_log": "json_log", "compact_manifest": "compact_manifest",
+    "manifest_globs": "manifest_globs", "shard_max_mb": "shard_max_bytes", "shard_max_files": "shard_max_files",
+    "analyze": "analyze",
+    "budget": "budget", "renumber": "renumber", "package": "package", "package_dir": "package_dir",
+    "scan_workers": "scan_workers", "copy_workers": "copy_workers",
+}
+
+def _batch_sources(base: Path, raw: str) -> list[Path]:
+    p = base / Path(raw).expanduser()
+    if p.name == "*":
+        children = sorted((e.path for e in _scandir(p.parent) if e.is_dir() or is_archive_source(e.path)),
+                          key=lambda x: os.path.basename(x).lower())
+        if not children:
+            raise ValueError(f"Keine Unterordner in {p.parent}")
+        return [Path(c).resolve() for c in children]
+    if not (p.is_dir() or is_archive_source(p)):
+        raise ValueError(f"Source nicht gefunden (Ordner oder .zip/.tar.gz): {p}")
+    return [p.resolve()]
+
+def load_build_file(path) -> dict:
+    # -> {"jobs", "io_limit", "resources": [{"name", "dst", "sources", "options"}]}; ValueError on bad input
+    path = Path(path).expanduser().resolve()
+    try:
+        spec = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Build-Datei nicht lesbar: {path} ({e})")
+    if not isinstance(spec, dict) or not isinstance(spec.get("resources"), list) or not spec["resources"]:
+        raise ValueError("Build-Datei braucht eine Liste \"resources\"")
+
+    base = path.parent
+    defaults = spec.get("defaults", {})
+    resources = []
+    names = set()
+    dsts = set()
+    for i, entry in enumerate(spec["resources"], 1):
+        merged = {**defaults, **entry}
+        name = merged.pop("name", None)
+        dst = merged.pop("dst", None)
+        raw_sources = merged.pop("sources", None)
+        if not name or not validate_resource_name(name):
+            raise ValueError(f"Resource {i}: \"name\" fehlt oder enthält Leerzeichen")
+        if not dst or not raw_sources:
+            raise ValueError(f"Resource {name}: \"dst\" und \"sources\" angeben")
+        unknown = set(merged) - set(BATCH_OPTIONS)
+        if unknown:
+            raise ValueError(f"Resource {name}: unbekannte Option(en) {', '.join(sorted(unknown))}")
+        dst_root = (base / Path(dst).expanduser()).resolve()
+        # two jobs on one destination would overwrite each other's state / manifest
+        if name.lower() in names or source_key(str(dst_root)) in dsts:
+            raise ValueError(f"Resource {name}: Name oder Ziel doppelt in der Build-Datei")
+        names.add(name.lower())
+        dsts.add(source_key(str(dst_root)))
+
+        sources = [src for raw in ([raw_sources] if isinstance(raw_sources, str) else raw_sources)
+                   for src in _batch_sources(base, raw)]
+        options = {BATCH_OPTIONS[k]: v for k, v in merged.items()}
+        if "shard_max_bytes" in options:
+            options["shard_max_bytes"] = int(float(options["shard_max_bytes"]) * 1024 * 1024)
+        resources.append({"name": name, "dst": dst_root, "sources": sources, "options": options})
+
+    return {
+        "jobs": max(1, int(spec.get("jobs", BATCH_DEFAULT_JOBS))),
+        "io_limit": max(1, int(spec.get("io_limit", BATCH_DEFAULT_IO_LIMIT))),
+        "resources": resources,
+    }
+
+class BatchBuilder:
+    # runs the resources of a build file on a job pool; every job is a normal PackBuilder,
+    # they share one ScanCache and one I/O semaphore (caps the copy workers of all jobs together)
+    def __init__(self, spec: dict, on_event=None, jobs: int | None = None, io_limit: int | None = None):
+        self.spec = spec
+        self.on_event = on_event
+        self.jobs = jobs or spec["jobs"]
+        self.io_limit = io_limit or spec["io_limit"]
+        self.scan_cache = ScanCache()
+        self.stop_flag = False
+        self._lock = threading.Lock()
+        self._builders: list[PackBuilder] = []
 
-def settings_path():
-    return Path.home() / "fivem_pack_builder_settings.json"
+    def stop(self):
+        self.stop_flag = True
+        with self._lock:
+            for builder in self._builders:
+                builder.stop()
 
-def load_settings():
-    p = settings_path()
-    if p.exists():
+    def _job_events(self, name: str):
+        def on_event(kind: str, *args):
+            if self.on_event is None or kind == "progress":
+                return
+            try:
+                self.on_event(kind, f"[{name}] {args[0]}")
+            except Exception:
+                pass
+        return on_event
+
+    def _run_job(self, res: dict, io_slots: threading.Semaphore) -> dict:
+        if self.stop_flag:
+            return {"resource": res["name"], "result": "aborted", "exit_code": EXIT_ABORTED}
+        builder = PackBuilder(res["sources"], res["dst"], res["name"], on_event=self._job_events(res["name"]),
+                              scan_cache=self.scan_cache, io_limit=io_slots, **res["options"])
+        with self._lock:
+            self._builders.append(builder)
+        if self.stop_flag:
+            builder.stop()
         try:
-            return json.loads(p.read_text(encoding="utf-8", errors="ignore"))
-        except Exception:
-            return {}
-    return {}
+            summary = builder.build()
+        except BuildStopped:
+            summary = {"result": "aborted", "exit_code": EXIT_ABORTED}
+        except Exception as e:
+            summary = {"result": "failed", "exit_code": EXIT_FAILED, "error": str(e)}
+        return {"resource": res["name"], **summary}
+
+    def run(self) -> dict:
+        started = time.time()
+        io_slots = threading.BoundedSemaphore(self.io_limit)
+        resources = self.spec["resources"]
+        if self.on_event:
+            self.on_event("log", f"🗂️ Batch: {len(resources)} Resources, {self.jobs} parallel, I/O-Limit {self.io_limit}")
+        results = [None] * len(resources)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = {pool.submit(self._run_job, res, io_slots): i for i, res in enumerate(resources)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                results[i] = fut.result()
+                if self.on_event:
+                    self.on_event("log", f"🏁 {results[i]['resource']}: {results[i]['result']} "
+                                         f"({len([r for r in results if r])}/{len(resources)})")
+        # worst job decides: failed > aborted > empty > errors > ok
+        exit_code = max(r["exit_code"] for r in results)
+        result = {EXIT_OK: "ok", EXIT_ERRORS: "errors", EXIT_EMPTY: "empty",
+                  EXIT_ABORTED: "aborted", EXIT_FAILED: "failed"}[exit_code]
+        return {"result": result, "exit_code": exit_code, "seconds": round(time.time() - started, 3),
+                "resources": results}
+
+# ---------- Source previews (background decoding + thumbnail cache) ----------
+PREVIEW_NAMES = frozenset({
+    "preview.png", "preview.jpg", "preview.jpeg", "preview.webp",
+    "thumb.png", "thumb.jpg", "thumb.jpeg", "thumb.webp",
+    "thumbnail.png", "thumbnail.jpg", "thumbnail.jpeg", "thumbnail.webp",
+    "showcase.png", "showcase.jpg",
+})
+PREVIEW_MAX_W = 520
+PREVIEW_MAX_H = 1040
+PREVIEW_LRU_SIZE = 32
+
+def preview_cache_dir() -> Path:
+    return Path.home() / ".fivem_pack_builder_thumbs"
+
+def _scandir(path) -> list:
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []
+
+def _preview_candidates(folder: Path):
+    # image files of the folder, then of its direct subfolders (one scandir each)
+    subdirs = []
+    for e in _scandir(folder):
+        if e.is_dir():
+            subdirs.append(e.path)
+        elif os.path.splitext(e.name)[1].lower() in PREVIEW_EXTS:
+            yield e
+    for d in subdirs:
+        for e in _scandir(d):
+            if not e.is_dir() and os.path.splitext(e.name)[1].lower() in PREVIEW_EXTS:
+                yield e
+
+def find_preview(folder: Path) -> Path | None:
+    # a preferred name anywhere wins over the first image found
+    first = None
+    for e in _preview_candidates(folder):
+        if e.name.lower() in PREVIEW_NAMES:
+            return Path(e.path)
+        if first is None:
+            first = Path(e.path)
+    return first
+
+def _preview_cache_file(image: Path, st: os.stat_result) -> Path:
+    key = f"{image}|{st.st_mtime_ns}|{st.st_size}|{PREVIEW_MAX_W}x{PREVIEW_MAX_H}"
+    return preview_cache_dir() / (hashlib.sha1(key.encode("utf-8", "surrogatepass")).hexdigest() + ".png")
+
+def load_preview_thumb(image: Path, st: os.stat_result):
+    # PIL image scaled to the preview width; decoded once, then served from the disk cache
+    cached = _preview_cache_file(image, st)
+    try:
+        with Image.open(cached) as img:
+            img.load()
+            return img
+    except Exception:
+        pass
+
+    with Image.open(image) as img:
+        # JPEG: let the decoder skip straight to 1/2..1/8 scale instead of decoding 4K
+        img.draft("RGB", (PREVIEW_MAX_W, PREVIEW_MAX_H))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+        img.thumbnail((PREVIEW_MAX_W, PREVIEW_MAX_H))
+        img.load()
 
-def save_settings(data: dict):
-    p = settings_path()
     try:
-        p.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_suffix(f".{os.getpid()}.{threading.get_ident()}.part")
+        img.save(tmp, "PNG")
+        os.replace(tmp, cached)
     except Exception:
         pass
+    return img
+
+class PreviewLoader:
+    # one worker thread: the current selection first, then prefetches; stale selections are dropped
+    def __init__(self, on_result):
+        self.on_result = on_result
+        self._cond = threading.Condition()
+        self._wanted: Path | None = None
+        self._prefetch: list[Path] = []
+        self._lru = collections.OrderedDict()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="preview", daemon=True)
+        self._thread.start()
+
+    def request(self, folder: Path, prefetch: list[Path] = ()):
+        with self._cond:
+            self._wanted = folder
+            self._prefetch = [p for p in prefetch if p != folder]
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
 
-class BaseTk(tk.Tk):
-    pass
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and self._wanted is None and not self._prefetch:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                if self._wanted is not None:
+                    folder, show = self._wanted, True
+                    self._wanted = None
+                else:
+                    folder, show = self._prefetch.pop(0), False
+            try:
+                image, thumb = self._load(folder)
+                error = None
+            except Exception as e:
+                image = thumb = None
+                error = e
+            if show:
+                self.on_result(folder, image, thumb, error)
+
+    def _load(self, folder: Path):
+        image = find_preview(folder)
+        if image is None or not PIL_AVAILABLE:
+            return image, None
+        st = image.stat()
+        key = (str(image), st.st_mtime_ns, st.st_size)
+        with self._cond:
+            thumb = self._lru.get(key)
+            if thumb is not None:
+                self._lru.move_to_end(key)
+                return image, thumb
+        thumb = load_preview_thumb(image, st)
+        with self._cond:
+            self._lru[key] = thumb
+            while len(self._lru) > PREVIEW_LRU_SIZE:
+                self._lru.popitem(last=False)
+        return image, thumb
+
+# ---------- Source list stats (background per-pack scan) ----------
+class SourceStats(NamedTuple):
+    files: int
+    bytes: int
+    names: collections.Counter   # lowercased file name -> count inside this pack
+
+def source_stats(src: Path, workers: int = DEFAULT_SCAN_WORKERS) -> SourceStats:
+    files = collect_relevant_files(src, workers=workers)
+    return SourceStats(len(files), sum(f.size for f in files), collections.Counter(f.name.lower() for f in files))
+
+def count_name_duplicates(stats: SourceStats, name_counts: collections.Counter) -> int:
+    # files of this pack whose name also exists in another pack (or twice in this one) -> get a prefix
+    return sum(n for name, n in stats.names.items() if name_counts[name] > 1)
+
+class SourceStatsScanner:
+    # one pack at a time (each scan is parallel over its directories), results as they come in
+    def __init__(self, on_result, workers: int = DEFAULT_SCAN_WORKERS):
+        self.on_result = on_result
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._pending: collections.deque = collections.deque()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="source-stats", daemon=True)
+        self._thread.start()
+
+    def request(self, sources):
+        with self._cond:
+            self._pending.extend(sources)
+            self._cond.notify()
+
+    def forget(self, sources):
+        drop = set(sources)
+        with self._cond:
+            self._pending = collections.deque(p for p in self._pending if p not in drop)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._pending:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                src = self._pending.popleft()
+            try:
+                self.on_result(src, source_stats(src, self.workers), None)
+            except Exception as e:
+                self.on_result(src, None, e)
 
 class App:
     def __init__(self):
-        self.root = TkinterDnD.Tk() if DND_AVAILABLE else BaseTk()
+        load_gui_modules()
+        self.root = TkinterDnD.Tk() if DND_AVAILABLE else tk.Tk()
         self.root.title(f"{APP_TITLE} {APP_VERSION}")
         self.root.geometry("1040x720")
         self.root.minsize(1040, 720)
         self.root.configure(bg=BG0)
 
         self.sources: list[Path] = []
+        self._source_keys: set[str] = set()
+        self._source_stats: dict[Path, SourceStats] = {}
+        self._name_counts: collections.Counter = collections.Counter()
+        self._dups_refresh_pending = False
         self.stop_flag = False
         self.worker = None
+        self.builder: PackBuilder | None = None
+        self._resume = False
+        self._watch = False
 
         self.settings = load_settings()
         self._preview_photo = None
+        self._preview_loader = PreviewLoader(lambda *res: self._ui_call(lambda: self._show_preview(*res)))
+        self._stats_scanner = SourceStatsScanner(lambda *res: self._ui_call(lambda: self._on_source_stats(*res)))
         self._last_dst_root: Path | None = None
         self._last_selected_source: Path | None = None
+        self._ui_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._log_view_lines = 0
 
         self._build_style()
         self._build_ui()
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
 
     def _build_style(self):
         style = ttk.Style(self.root)
@@ -279,6 +4229,10 @@ class App:
 
         style.configure("Horizontal.TProgressbar", troughcolor=CARD, background=ACCENT)
 
+        style.configure("Treeview", background=CARD, fieldbackground=CARD, foreground=FG0, borderwidth=0)
+        style.configure("Treeview.Heading", background=BG1, foreground=FG1)
+        style.map("Treeview", background=[("selected", ACCENT)])
+
     def _build_ui(self):
         header = ttk.Frame(self.root, padding=14)
         header.pack(fill="x")
@@ -316,14 +4270,29 @@ class App:
             self.drop.drop_target_register(DND_FILES)
             self.drop.dnd_bind("<<Drop>>", self._on_drop)
 
-        self.src_list = tk.Listbox(src_card, height=12, width=52, bg=CARD, fg=FG0, bd=0,
-                                   highlightthickness=1, highlightbackground=BORDER, selectbackground=ACCENT)
-        self.src_list.pack(fill="x")
-        self.src_list.bind("<<ListboxSelect>>", self.on_source_select)
+        # Treeview only renders visible rows; files / size / duplicates are filled in by the stats scanner
+        list_frame = ttk.Frame(src_card)
+        list_frame.pack(fill="x")
+        self.src_list = ttk.Treeview(list_frame, columns=("files", "size", "dups"), height=12, selectmode="extended")
+        self.src_list.heading("#0", text="Pack", anchor="w")
+        self.src_list.heading("files", text="Dateien")
+        self.src_list.heading("size", text="Größe")
+        self.src_list.heading("dups", text="Doppelt")
+        self.src_list.column("#0", width=250, stretch=True)
+        self.src_list.column("files", width=60, anchor="e", stretch=False)
+        self.src_list.column("size", width=80, anchor="e", stretch=False)
+        self.src_list.column("dups", width=60, anchor="e", stretch=False)
+        src_scroll = ttk.Scrollbar(list_frame, orient="vertical", command=self.src_list.yview)
+        self.src_list.configure(yscrollcommand=src_scroll.set)
+        self.src_list.pack(side="left", fill="x", expand=True)
+        src_scroll.pack(side="left", fill="y")
+        self.src_list.bind("<<TreeviewSelect>>", self.on_source_select)
 
         btn_row = ttk.Frame(src_card)
         btn_row.pack(fill="x", pady=(10, 0))
         ttk.Button(btn_row, text="➕ Ordner hinzufügen", command=self.add_source).pack(side="left", expand=True, fill="x", padx=(0, 6))
+        ttk.Button(btn_row, text="📂 Alle Unterordner", command=self.add_subfolders).pack(side="left", expand=True, fill="x", padx=(6, 6))
+        ttk.Button(btn_row, text="📦 Archiv hinzufügen", command=self.add_archive).pack(side="left", expand=True, fill="x", padx=(6, 6))
         ttk.Button(btn_row, text="🗑 Entfernen", command=self.remove_selected).pack(side="left", expand=True, fill="x", padx=(6, 0))
 
         # DESTINATION
@@ -350,9 +4319,54 @@ class App:
             .pack(side="left", padx=(8, 0))
         ttk.Label(mode_row, text="merge = hinzufügen / replace = stream+data löschen", style="Sub.TLabel").pack(side="left", padx=(10, 0))
 
+        transfer_row = ttk.Frame(dst_card)
+        transfer_row.pack(fill="x", pady=(10, 0))
+        ttk.Label(transfer_row, text="Transfer:").pack(side="left")
+        self.transfer_var = tk.StringVar(value=self.settings.get("transfer_mode", "auto"))
+        ttk.Combobox(transfer_row, textvariable=self.transfer_var, values=list(TRANSFER_MODES), state="readonly", width=10)\
+            .pack(side="left", padx=(8, 0))
+        ttk.Label(transfer_row, text="auto = reflink/Kernel-Copy / hardlink = Links (gleiches Laufwerk)", style="Sub.TLabel").pack(side="left", padx=(10, 0))
+
+        package_row = ttk.Frame(dst_card)
+        package_row.pack(fill="x", pady=(10, 0))
+        ttk.Label(package_row, text="Paket:").pack(side="left")
+        self.package_var = tk.StringVar(value=self.settings.get("package") or "keins")
+        formats = ["keins", "zip"] + (["tar.zst"] if ZSTD_AVAILABLE else [])
+        ttk.Combobox(package_row, textvariable=self.package_var, values=formats, state="readonly", width=10)\
+            .pack(side="left", padx=(8, 0))
+        ttk.Label(package_row, text="<name>.zip neben der Resource, zum Verteilen an andere Server", style="Sub.TLabel").pack(side="left", padx=(10, 0))
+
         self.move_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(dst_card, text="MOVE statt COPY (Quellfiles werden verschoben)", variable=self.move_var).pack(anchor="w", pady=(10, 0))
 
+        self.dedupe_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dst_card, text="Identische Duplikate überspringen (Hash-Vergleich)", variable=self.dedupe_var).pack(anchor="w", pady=(4, 0))
+
+        self.compact_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dst_card, text="fxmanifest.lua kompaktieren (ein sortierter Block, Globs)", variable=self.compact_var).pack(anchor="w", pady=(4, 0))
+
+        self.renumber_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dst_card, text="Kleidung zusammenführen (doppelte Drawable-Nummern neu vergeben)", variable=self.renumber_var).pack(anchor="w", pady=(4, 0))
+
+        self.dry_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dst_card, text="Nur planen (Dry-Run: Namen/Duplikate im Log, nichts wird kopiert)", variable=self.dry_var).pack(anchor="w", pady=(4, 0))
+
+        self.analyze_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(dst_card, text=f"Streaming-Budget prüfen (RSC7-Header, {BUDGET_REPORT})", variable=self.analyze_var).pack(anchor="w", pady=(4, 0))
+
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dst_card, text="Watch: Sources beobachten, Änderungen automatisch nachziehen (bis STOP)", variable=self.watch_var).pack(anchor="w", pady=(4, 0))
+
+        shard_row = ttk.Frame(dst_card)
+        shard_row.pack(fill="x", pady=(10, 0))
+        ttk.Label(shard_row, text="Aufteilen ab:").pack(side="left")
+        self.shard_mb_var = tk.StringVar(value=str(self.settings.get("shard_max_mb", 0)))
+        ttk.Entry(shard_row, textvariable=self.shard_mb_var, width=7).pack(side="left", padx=(8, 0))
+        ttk.Label(shard_row, text="MB").pack(side="left", padx=(4, 0))
+        self.shard_files_var = tk.StringVar(value=str(self.settings.get("shard_max_files", 0)))
+        ttk.Entry(shard_row, textvariable=self.shard_files_var, width=7).pack(side="left", padx=(10, 0))
+        ttk.Label(shard_row, text="Dateien (0 = eine Resource)", style="Sub.TLabel").pack(side="left", padx=(4, 0))
+
         openiv_row = ttk.Frame(dst_card)
         openiv_row.pack(fill="x", pady=(10, 0))
         ttk.Label(openiv_row, text="OpenIV.exe:").pack(side="left")
@@ -434,37 +4448,101 @@ class App:
 
     # ---------- UI helpers ----------
     def _log_line(self, s: str):
+        self._log_lines([s])
+
+    def _log_lines(self, lines: list[str]):
+        # one insert per batch; the view is a ring buffer, builder.log has everything
+        if len(lines) > LOG_VIEW_MAX_LINES:
+            lines = lines[-LOG_VIEW_MAX_LINES:]
         self.log.configure(state="normal")
-        self.log.insert("end", s + "\n")
+        self.log.insert("end", "\n".join(lines) + "\n")
+        self._log_view_lines += len(lines)
+        overflow = self._log_view_lines - LOG_VIEW_MAX_LINES
+        if overflow > 0:
+            self.log.delete("1.0", f"{overflow + 1}.0")
+            self._log_view_lines -= overflow
         self.log.see("end")
         self.log.configure(state="disabled")
 
+    def _ui_call(self, fn):
+        # thread-safe: runs fn on the Tk thread with the next queue drain
+        self._ui_queue.put(("call", fn))
+
+    def _drain_ui_queue(self):
+        lines = []
+        status = None
+        progress = None
+        calls = []
+        try:
+            while True:
+                kind, payload = self._ui_queue.get_nowait()
+                if kind == "log":
+                    lines.append(payload)
+                elif kind == "status":
+                    status = payload
+                elif kind == "progress":
+                    progress = payload
+                elif kind == "call":
+                    calls.append(payload)
+        except queue.Empty:
+            pass
+
+        try:
+            if lines:
+                self._log_lines(lines)
+            if status is not None:
+                self._set_status(status)
+            if progress is not None:
+                self._set_progress(*progress)
+            for fn in calls:
+                fn()
+        finally:
+            self.root.after(UI_POLL_MS, self._drain_ui_queue)
+
     def _set_status(self, s: str):
         self.status_var.set(s)
 
-    def _set_progress(self, done: int, total: int):
+    def _set_progress(self, done: int, total: int, bytes_done: int = 0, bytes_total: int = 0, elapsed: float = 0.0):
         self.progress["maximum"] = max(total, 1)
         self.progress["value"] = done
-        self.count_var.set(f"{done} / {total}")
+        if bytes_total:
+            self.count_var.set(f"{done} / {total}  ·  {format_eta(bytes_done, bytes_total, elapsed)}")
+        else:
+            self.count_var.set(f"{done} / {total}")
 
     # ---------- Sources ----------
-    def _add_source_path(self, folder: str):
+    def _add_source_path(self, folder: str, verbose: bool = True) -> bool:
         p = Path(folder).expanduser()
         if not p.exists():
             self._log_line(f"⚠️ Nicht gefunden: {p}")
-            return
-        if p.is_file():
+            return False
+        # archives are sources themselves, any other file means its folder
+        if p.is_file() and not is_archive_source(p):
             p = p.parent
         p = p.resolve()
-        if p not in self.sources:
-            self.sources.append(p)
-            self.src_list.insert("end", str(p))
+        key = os.path.normcase(str(p))
+        if key in self._source_keys:
+            if verbose:
+                self._log_line(f"ℹ️ Schon drin: {p}")
+            return False
+        self._source_keys.add(key)
+        self.sources.append(p)
+        self.src_list.insert("", "end", iid=str(p), text=p.name, values=("…", "…", "…"))
+        self._stats_scanner.request([p])
+        if verbose:
             self._log_line(f"➕ Source: {p}")
-        else:
-            self._log_line(f"ℹ️ Schon drin: {p}")
+        return True
+
+    def _add_source_paths(self, paths, origin: str):
+        added = sum(self._add_source_path(raw, verbose=False) for raw in paths)
+        skipped = len(paths) - added
+        self._log_line(f"➕ {added} Sources aus {origin}" + (f" ({skipped} schon drin / nicht gefunden)" if skipped else ""))
 
     def _on_drop(self, event):
         paths = normalize_dnd_paths(event.data)
+        if len(paths) > 1:
+            self._add_source_paths(paths, "Drag&Drop")
+            return
         for raw in paths:
             self._add_source_path(raw)
         self._log_line(f"✅ Drag&Drop: {len(paths)} Einträge verarbeitet.")
@@ -474,15 +4552,72 @@ class App:
         if folder:
             self._add_source_path(folder)
 
+    def add_subfolders(self):
+        # every subfolder (and pack archive) of a parent folder is one source
+        parent = filedialog.askdirectory(title="Parent-Ordner auswählen (jeder Unterordner = ein Pack)")
+        if not parent:
+            return
+        children = sorted((e.path for e in _scandir(parent) if e.is_dir() or is_archive_source(e.path)),
+                          key=lambda x: os.path.basename(x).lower())
+        if not children:
+            self._log_line(f"⚠️ Keine Unterordner in {parent}")
+            return
+        self._add_source_paths(children, parent)
+
+    def add_archive(self):
+        files = filedialog.askopenfilenames(
+            title="Pack-Archive auswählen (.zip / .tar.gz)",
+            filetypes=[("Archive", "*.zip *.tar *.tar.gz *.tgz *.tar.bz2 *.tar.xz"), ("All", "*.*")]
+        )
+        for file in files:
+            self._add_source_path(file)
+
     def remove_selected(self):
-        sel = list(self.src_list.curselection())
+        sel = self.src_list.selection()
         if not sel:
             return
-        for idx in reversed(sel):
-            p = self.sources[idx]
-            del self.sources[idx]
-            self.src_list.delete(idx)
-            self._log_line(f"🗑 Entfernt: {p}")
+        removed = {Path(iid) for iid in sel}
+        self.src_list.delete(*sel)
+        self.sources = [p for p in self.sources if p not in removed]
+        self._stats_scanner.forget(removed)
+        for p in removed:
+            self._source_keys.discard(os.path.normcase(str(p)))
+            stats = self._source_stats.pop(p, None)
+            if stats:
+                self._name_counts.subtract(stats.names)
+        self._schedule_dups_refresh()
+        if len(removed) > 1:
+            self._log_line(f"🗑 Entfernt: {len(removed)} Sources")
+        else:
+            self._log_line(f"🗑 Entfernt: {next(iter(removed))}")
+
+    def _on_source_stats(self, src: Path, stats: SourceStats | None, error: Exception | None):
+        if os.path.normcase(str(src)) not in self._source_keys:
+            return
+        iid = str(src)
+        if stats is None:
+            self.src_list.item(iid, values=("?", "?", "?"))
+            self._log_line(f"⚠️ Scan fehlgeschlagen: {src} ({error})")
+            return
+        # removed during its scan and added again -> two results, the later one replaces the first
+        old = self._source_stats.get(src)
+        if old:
+            self._name_counts.subtract(old.names)
+        self._source_stats[src] = stats
+        self._name_counts.update(stats.names)
+        self.src_list.item(iid, values=(stats.files, _mb(stats.bytes), "…"))
+        self._schedule_dups_refresh()
+
+    def _schedule_dups_refresh(self):
+        # many packs finish per second on a bulk import -> one recount per UI tick, not per pack
+        if not self._dups_refresh_pending:
+            self._dups_refresh_pending = True
+            self.root.after(UI_POLL_MS, self._refresh_dups)
+
+    def _refresh_dups(self):
+        self._dups_refresh_pending = False
+        for src, stats in self._source_stats.items():
+            self.src_list.set(str(src), "dups", count_name_duplicates(stats, self._name_counts))
 
     def pick_destination(self):
         folder = filedialog.askdirectory(title="Ziel-Resource-Ordner auswählen (oder neu anlegen)")
@@ -516,58 +4651,38 @@ class App:
 
     # ---------- Preview ----------
     def on_source_select(self, event=None):
-        sel = self.src_list.curselection()
+        sel = self.src_list.selection()
         if not sel:
             return
-        src = Path(self.sources[sel[0]])
+        idx = self.src_list.index(sel[0])
+        src = Path(self.sources[idx])
         self._last_selected_source = src
-        self.show_preview_for_folder(src)
-
-    def show_preview_for_folder(self, folder: Path):
-        preferred = {
-            "preview.png", "preview.jpg", "preview.jpeg", "preview.webp",
-            "thumb.png", "thumb.jpg", "thumb.jpeg", "thumb.webp",
-            "thumbnail.png", "thumbnail.jpg", "thumbnail.jpeg", "thumbnail.webp",
-            "showcase.png", "showcase.jpg"
-        }
-        candidates = []
-        try:
-            for p in folder.iterdir():
-                if p.is_file() and p.suffix.lower() in PREVIEW_EXTS:
-                    candidates.append(p)
-            for d in folder.iterdir():
-                if d.is_dir():
-                    for p in d.iterdir():
-                        if p.is_file() and p.suffix.lower() in PREVIEW_EXTS:
-                            candidates.append(p)
-        except Exception:
-            candidates = []
+        self.show_preview_for_folder(src, [Path(self.sources[i]) for i in (idx + 1, idx - 1)
+                                           if 0 <= i < len(self.sources)])
 
-        if not candidates:
+    def show_preview_for_folder(self, folder: Path, prefetch: list[Path] = ()):
+        # discovery + decoding on the preview thread; neighbours are prefetched for arrow-key browsing
+        self.preview_lbl.configure(text=f"Preview: lädt … ({folder.name})")
+        self._preview_loader.request(folder, prefetch)
+
+    def _show_preview(self, folder: Path, best: Path | None, thumb, error: Exception | None):
+        if folder != self._last_selected_source:
+            return
+        if error is not None:
+            self.preview_img_label.configure(image="", text=f"Preview Fehler: {error}")
+            self._preview_photo = None
+            return
+        if best is None:
             self.preview_lbl.configure(text="Kein Preview-Bild gefunden (optional: preview.png/thumbnail.jpg ins Pack legen).")
             self.preview_img_label.configure(image="", text="")
             self._preview_photo = None
             return
 
-        best = None
-        for p in candidates:
-            if p.name.lower() in preferred:
-                best = p
-                break
-        if not best:
-            best = candidates[0]
-
         self.preview_lbl.configure(text=f"Preview: {best.name}")
 
         try:
-            if PIL_AVAILABLE:
-                img = Image.open(best)
-                max_w = 520
-                w, h = img.size
-                if w > max_w:
-                    new_h = int(h * (max_w / float(w)))
-                    img = img.resize((max_w, max(1, new_h)))
-                self._preview_photo = ImageTk.PhotoImage(img)
+            if thumb is not None:
+                self._preview_photo = ImageTk.PhotoImage(thumb)
                 self.preview_img_label.configure(image=self._preview_photo, text="")
             else:
                 if best.suffix.lower() != ".png":
@@ -614,43 +4729,6 @@ class App:
         except Exception as e:
             messagebox.showerror("OpenIV Fehler", str(e))
 
-    # ---------- Ensure files ----------
-    def _write_ensure_files(self, dst_root: Path, resource_name: str):
-        ensure_line = f"ensure {resource_name}"
-        (dst_root / "_ADD_TO_SERVER_CFG.txt").write_text(ensure_line + "\n", encoding="utf-8")
-        self._log_line("📝 Datei erstellt: _ADD_TO_SERVER_CFG.txt")
-
-        master_targets = [
-            dst_root.parent / "_ALL_ENSURES.txt",  # central
-            dst_root / "_ALL_ENSURES.txt"          # fallback
-        ]
-
-        for master_file in master_targets:
-            try:
-                existing = set()
-                if master_file.exists():
-                    txt = master_file.read_text(encoding="utf-8", errors="ignore")
-                    for line in txt.splitlines():
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            existing.add(line.lower())
-
-                if ensure_line.lower() not in existing:
-                    safe_mkdir(master_file.parent)
-                    new_file = not master_file.exists()
-                    with master_file.open("a", encoding="utf-8") as f:
-                        if new_file or master_file.stat().st_size == 0:
-                            f.write(f"# Generated by {APP_TITLE} ({CREATED_BY})\n")
-                        f.write(ensure_line + "\n")
-                    self._log_line(f"📚 Master updated: {master_file}")
-                else:
-                    self._log_line(f"ℹ️ Master enthält ensure schon: {master_file}")
-
-                if master_file == master_targets[0]:
-                    break
-            except Exception:
-                continue
-
     # ---------- Run ----------
     def validate(self):
         if not self.sources:
@@ -661,21 +4739,41 @@ class App:
             messagebox.showerror("Fehler", "Bitte Ziel-Ordner auswählen (Resource-Ordner).")
             return False
         name = self.name_var.get().strip()
-        if not name or " " in name:
+        if not validate_resource_name(name):
             messagebox.showerror("Fehler", "Bitte Resource-Name ohne Leerzeichen (z. B. my_pack).")
             return False
+        try:
+            if float(self.shard_mb_var.get() or 0) < 0 or int(self.shard_files_var.get() or 0) < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Fehler", "Aufteilen: bitte Zahlen ≥ 0 eintragen (0 = aus).")
+            return False
         return True
 
     def start(self):
         if not self.validate():
             return
-        if self.mode_var.get() == "replace":
+        self._resume = False
+        journals = [] if self.dry_var.get() else find_journals(Path(self.dst_var.get().strip()).expanduser().resolve())
+        if journals:
+            done = sum(len(j["done"]) for _, j in journals)
+            planned = sum(len(j["items"]) for _, j in journals)
+            self._resume = messagebox.askyesno(
+                "Unterbrochener Build",
+                f"Im Ziel liegt ein unterbrochener Build ({done} von {planned} Dateien sicher fertig).\n\n"
+                "Ja = dort fortsetzen\nNein = neu bauen (fertige Dateien werden übernommen)",
+            )
+        if self.mode_var.get() == "replace" and not self.dry_var.get() and not self._resume:
             if not messagebox.askyesno("Bestätigung", "Modus 'replace' löscht stream/ und data/ im Ziel. Fortfahren?"):
                 return
 
         self.settings["last_dst"] = self.dst_var.get().strip()
         self.settings["last_name"] = self.name_var.get().strip()
         self.settings["openiv_path"] = self.openiv_var.get().strip()
+        self.settings["transfer_mode"] = self.transfer_var.get()
+        self.settings["package"] = self.package_var.get() if self.package_var.get() in PACKAGE_FORMATS else None
+        self.settings["shard_max_mb"] = float(self.shard_mb_var.get() or 0)
+        self.settings["shard_max_files"] = int(self.shard_files_var.get() or 0)
         save_settings(self.settings)
 
         self.stop_flag = False
@@ -684,170 +4782,111 @@ class App:
         self._set_progress(0, 1)
         self._set_status("Starte…")
 
+        self.builder = PackBuilder(
+            self.sources,
+            self.dst_var.get().strip(),
+            self.name_var.get().strip(),
+            mode=self.mode_var.get(),
+            move=self.move_var.get(),
+            dedupe=self.dedupe_var.get(),
+            transfer_mode=self.transfer_var.get(),
+            json_log=bool(self.settings.get("json_log", False)),
+            compact_manifest=self.compact_var.get(),
+            manifest_globs=bool(self.settings.get("manifest_globs", True)),
+            shard_max_bytes=int(self.settings["shard_max_mb"] * 1024 * 1024),
+            shard_max_files=self.settings["shard_max_files"],
+            analyze=self.analyze_var.get(),
+            renumber=self.renumber_var.get(),
+            dry_run=self.dry_var.get(),
+            budget=self.settings.get("budget"),
+            profile=bool(self.settings.get("profile", False)),
+            package=self.settings["package"],
+            on_event=self._on_builder_event,
+            copy_workers=int(self.settings.get("copy_workers", DEFAULT_COPY_WORKERS)),
+        )
+        self._last_dst_root = self.builder.dst_root.resolve()
+        self._watch = self.watch_var.get() and not self._resume
+
         self.worker = threading.Thread(target=self._run, daemon=True)
         self.worker.start()
 
     def stop(self):
         self.stop_flag = True
-        self._log_line("⛔ Stop angefordert… beendet nach der aktuellen Datei.")
+        if self.builder:
+            self.builder.stop()
+        self._log_line("⛔ Stop angefordert… laufende Kopien werden abgebrochen.")
+
+    def _on_builder_event(self, kind: str, *args):
+        # called on the worker thread -> queued, coalesced by _drain_ui_queue
+        if kind == "progress":
+            self._ui_queue.put((kind, args))
+        elif kind in ("log", "status"):
+            self._ui_queue.put((kind, args[0]))
 
     def _run(self):
         try:
-            dst_root = Path(self.dst_var.get().strip()).resolve()
-            resource_name = self.name_var.get().strip()
-            mode = self.mode_var.get()
-            move = self.move_var.get()
-
-            safe_mkdir(dst_root)
-            self._last_dst_root = dst_root
-
-            dst_stream = dst_root / "stream"
-            dst_data = dst_root / "data"
-            log_path = dst_root / "builder.log"
-
-            duplicates = 0
-            errors = 0
+            if self._watch:
+                # dialog only for the first build, the updates are in the log
+                shown = []
 
-            def file_log(msg: str):
-                try:
-                    with log_path.open("a", encoding="utf-8") as fp:
-                        fp.write(msg + "\n")
-                except Exception:
-                    pass
+                def on_summary(summary):
+                    if not shown:
+                        shown.append(summary)
+                        self._show_summary(summary)
 
-            # Replace mode
-            if mode == "replace":
-                self.root.after(0, lambda: self._set_status("Bereinige Ziel (replace)…"))
-                self.root.after(0, lambda: self._log_line("🧹 Lösche stream/ und data/…"))
-                if dst_stream.exists():
-                    wipe_dir(dst_stream)
-                if dst_data.exists():
-                    wipe_dir(dst_data)
-
-            safe_mkdir(dst_stream)
-            safe_mkdir(dst_data)
-
-            # Collect jobs
-            jobs = []
-            for src in self.sources:
-                src = src.resolve()
-                files = collect_relevant_files(src)
-                self.root.after(0, lambda s=src, n=len(files): self._log_line(f"🔎 {s} → {n} relevante Dateien"))
-                for f in files:
-                    jobs.append((src, f))
-
-            total = len(jobs)
-            if total == 0:
-                self.root.after(0, lambda: messagebox.showinfo("Info", "Keine relevanten Dateien gefunden (.ydd/.ytd/.meta/.ymt/etc)."))
-                self.root.after(0, self._finish_buttons)
+                self.builder.watch(on_summary=on_summary)
+                self._ui_call(self._finish_buttons)
                 return
+            summary = self.builder.resume() if self._resume else self.builder.build()
+        except Exception as e:
+            self._ui_call(lambda e=e: messagebox.showerror("Fehler ❌", str(e)))
+            self._ui_call(self._finish_buttons)
+            return
 
-            file_log(f"=== Build start {datetime.now().isoformat(timespec='seconds')} ===")
-            file_log(f"Resource: {resource_name}")
-            file_log(f"Destination: {dst_root}")
-            file_log(f"Mode: {mode} | Move: {move}")
-            file_log("Sources:")
-            for s in self.sources:
-                file_log(f" - {s}")
-            file_log("")
-
-            # IMPORTANT CHANGE:
-            # Always FLATTEN into stream/ and data/ (so your output is always correct for FiveM)
-            data_rel_paths = []
-            used_names_stream = set()
-            used_names_data = set()
-
-            done = 0
-            self.root.after(0, lambda: self._set_status("Kopiere Dateien…"))
-            self.root.after(0, lambda: self._set_progress(0, total))
-
-            for src_base, f in jobs:
-                if self.stop_flag:
-                    file_log("ABORTED by user.")
-                    self.root.after(0, lambda: messagebox.showinfo("Abgebrochen", "Vorgang wurde abgebrochen.\nDetails stehen im Log."))
-                    self.root.after(0, self._finish_buttons)
-                    return
-
-                ext = f.suffix.lower()
-
-                # Flatten target path:
-                if ext in STREAM_EXTS:
-                    target = dst_stream / f.name
-                    name_key = f.name.lower()
-                    used_set = used_names_stream
-                else:
-                    target = dst_data / f.name
-                    name_key = f.name.lower()
-                    used_set = used_names_data
-
-                # duplicate filename handling: prefix by source folder name
-                if name_key in used_set or target.exists():
-                    duplicates += 1
-                    prefix = src_base.name.replace(" ", "_")
-                    target = target.with_name(f"{prefix}_{target.name}")
-                    name_key = target.name.lower()
-
-                # still colliding? add timestamp
-                if name_key in used_set or target.exists():
-                    duplicates += 1
-                    target = target.with_name(f"{target.stem}_{ts()}{target.suffix}")
-                    name_key = target.name.lower()
-
-                used_set.add(name_key)
-
-                try:
-                    action = "MOVE" if move else "COPY"
-                    msg = f"[{action}] {f.name}  (from: {src_base.name}) -> {target.relative_to(dst_root)}"
-                    self.root.after(0, lambda m=msg: self._log_line(m))
-                    file_log(msg)
-
-                    if move:
-                        shutil.move(str(f), str(target))
-                    else:
-                        shutil.copy2(str(f), str(target))
-
-                    if ext in DATA_EXTS:
-                        data_rel_paths.append(target.relative_to(dst_root).as_posix())
-
-                except Exception as e:
-                    errors += 1
-                    msg = f"❌ Fehler bei {f}: {e}"
-                    self.root.after(0, lambda m=msg: self._log_line(m))
-                    file_log(msg)
-
-                done += 1
-                self.root.after(0, lambda d=done: self._set_progress(d, total))
-
-            # fxmanifest extend/create
-            self.root.after(0, lambda: self._set_status("Erweitere fxmanifest.lua…"))
-            self.root.after(0, lambda: self._log_line("🧾 fxmanifest.lua wird erweitert/erstellt…"))
-            write_or_extend_fxmanifest(dst_root, resource_name, data_rel_paths, self._log_line)
-
-            # ensure helper files
-            try:
-                self._write_ensure_files(dst_root, resource_name)
-                file_log("ensure files written.")
-            except Exception as e:
-                msg = f"⚠️ Ensure-Dateien konnten nicht erstellt werden: {e}"
-                self.root.after(0, lambda m=msg: self._log_line(m))
-                file_log(msg)
-
-            file_log("")
-            file_log(f"Summary: total={total}, duplicates={duplicates}, errors={errors}")
-            file_log(f"=== Build done {datetime.now().isoformat(timespec='seconds')} ===")
-
-            self.root.after(0, lambda: self._set_status("Fertig ✅"))
-            self.root.after(0, lambda: messagebox.showinfo(
+        self._show_summary(summary)
+        self._ui_call(self._finish_buttons)
+
+    def _show_summary(self, summary: dict):
+        result = summary["result"]
+        if result == "empty":
+            self._ui_call(lambda: messagebox.showinfo("Info", "Keine relevanten Dateien gefunden (.ydd/.ytd/.meta/.ymt/etc)."))
+        elif result == "aborted":
+            self._ui_call(lambda: messagebox.showinfo("Abgebrochen", "Vorgang wurde abgebrochen.\nDetails stehen im Log."))
+        elif result == "planned":
+            lines = "\n".join(
+                f"{p['resource']}: {p['totals']['files']} Dateien ({p['totals']['bytes'] / (1024 * 1024):.1f} MB), "
+                f"{p['totals']['renames']} umbenannt, {p['totals']['unchanged']} unverändert"
+                for p in summary["plan"]
+            )
+            self._ui_call(lambda: messagebox.showinfo(
+                "Plan (Dry-Run) 📝", f"Es wurde nichts kopiert.\n\n{lines}\n\nDetails ([PLAN …]) stehen im Log."
+            ))
+        else:
+            ensures = "\n".join(f"ensure {name}" for name in summary["resources"])
+            duplicates = summary["duplicates"]
+            errors = summary["errors"]
+            renumbered = f"Drawables neu nummeriert: {summary['renumbered']}\n" if summary["renumbered"] else ""
+            budget = ""
+            if summary["oversized"] or summary["corrupt"]:
+                budget = f"Zu groß: {summary['oversized']} / Defekt: {summary['corrupt']} (siehe {BUDGET_REPORT})\n"
+            deduped = ""
+            if summary["deduped"]:
+                deduped = f"Identisch übersprungen: {summary['deduped']} ({summary['bytes_saved'] / (1024 * 1024):.1f} MB gespart)\n"
+            timing = (f"⏱️ {summary['seconds']:.1f}s gesamt: {format_phases(summary['phases'])}\n"
+                      f"{summary['files_per_s']} Dateien/s, {summary['mb_per_s']} MB/s\n")
+            if summary["slowest"]:
+                timing += "Langsamste: " + ", ".join(f"{Path(x['path']).name} ({x['seconds']:.2f}s)"
+                                                     for x in summary["slowest"][:3]) + "\n"
+            if summary.get("profile"):
+                timing += f"Profil: {summary['profile']}\n"
+            if summary["packages"]:
+                timing += "Paket: " + ", ".join(summary["packages"]) + "\n"
+            self._ui_call(lambda: messagebox.showinfo(
                 "Fertig ✅",
-                f"Alles erledigt!\n\nserver.cfg: ensure {resource_name}\n"
+                f"Alles erledigt!\n\nserver.cfg:\n{ensures}\n"
                 f"_ADD_TO_SERVER_CFG.txt + _ALL_ENSURES.txt erstellt.\n\n"
-                f"Duplikate: {duplicates}\nFehler: {errors}\n\nLog: builder.log"
+                f"Duplikate: {duplicates}\n{deduped}{renumbered}{budget}Fehler: {errors}\n\n{timing}\nLog: builder.log"
             ))
-            self.root.after(0, self._finish_buttons)
-
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Fehler ❌", str(e)))
-            self.root.after(0, self._finish_buttons)
 
     def _finish_buttons(self):
         self.start_btn.configure(state="normal")
@@ -856,5 +4895,226 @@ class App:
     def run(self):
         self.root.mainloop()
 
+# ---------- CLI ----------
+CLI_COMMANDS = {"build", "batch", "resume", "compact", "-h", "--help"}
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="FiveM_Pack_Builder_Leutnant.py",
+        description=f"{APP_TITLE} {APP_VERSION} – ohne Argumente startet die GUI.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("build", help="Resource headless bauen (ohne GUI)")
+    b.add_argument("--src", action="extend", nargs="+", required=True, metavar="DIR",
+                   help="Source-Ordner oder Archive .zip/.tar/.tar.gz (mehrfach oder mehrere Pfade)")
+    b.add_argument("--dst", required=True, help="Ziel-Resource-Ordner")
+    b.add_argument("--name", required=True, help="Resource-Name (ensure)")
+    b.add_argument("--mode", choices=["merge", "replace"], default="merge")
+    b.add_argument("--move", action="store_true", help="MOVE statt COPY")
+    b.add_argument("--transfer", choices=TRANSFER_MODES, default="auto",
+                   help="auto = rename/reflink/copy_file_range mit Fallback, hardlink = Hardlinks wenn möglich, "
+                        "copy = immer normale Kopie")
+    b.add_argument("--dedupe", action="store_true", help="byte-identische Duplikate überspringen statt umbenennen")
+    b.add_argument("--no-state", action="store_true",
+                   help=f"kein {STATE_FILE} (merge kopiert dann wieder alles)")
+    b.add_argument("--state-hash", action="store_true",
+                   help="Hash im State speichern (erkennt nur berührte, inhaltlich gleiche Dateien)")
+    b.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_WORKERS, metavar="N",
+                   help=f"Threads für die Dateisuche (Default {DEFAULT_SCAN_WORKERS})")
+    b.add_argument("--copy-workers", type=int, default=DEFAULT_COPY_WORKERS, metavar="N",
+                   help=f"parallele Kopier-Threads (Default {DEFAULT_COPY_WORKERS})")
+    b.add_argument("--compact-manifest", action="store_true",
+                   help="fxmanifest.lua neu und kompakt schreiben statt anhängen (eigene Abschnitte bleiben)")
+    b.add_argument("--no-globs", action="store_true",
+                   help="mit --compact-manifest: Dateien einzeln auflisten statt data/*.ext")
+    b.add_argument("--shard-max-mb", type=float, default=0, metavar="MB",
+                   help="auf mehrere Resources <name>_1..N aufteilen, max. MB pro Resource (0 = aus)")
+    b.add_argument("--shard-max-files", type=int, default=0, metavar="N",
+                   help="auf mehrere Resources <name>_1..N aufteilen, max. Dateien pro Resource (0 = aus)")
+    b.add_argument("--renumber", action="store_true",
+                   help="Kleidung zusammenführen: doppelte Drawable-Nummern (jbib_000_u …) auf freie Nummern "
+                        "des Slots verschieben, Texturen + .meta/.ymt-Verweise mitziehen")
+    b.add_argument("--no-analyze", action="store_true",
+                   help=f"RSC7-Header der Stream-Dateien nicht prüfen (kein {BUDGET_REPORT})")
+    b.add_argument("--budget-asset-mb", type=float, default=DEFAULT_BUDGET["asset_mb"], metavar="MB",
+                   help=f"Warnung ab dieser Größe pro Asset (Default {DEFAULT_BUDGET['asset_mb']:g})")
+    b.add_argument("--budget-source-mb", type=float, default=DEFAULT_BUDGET["source_mb"], metavar="MB",
+                   help=f"Warnung ab dieser Summe pro Source (Default {DEFAULT_BUDGET['source_mb']:g})")
+    b.add_argument("--budget-resource-mb", type=float, default=DEFAULT_BUDGET["resource_mb"], metavar="MB",
+                   help=f"Warnung ab dieser Summe pro Resource (Default {DEFAULT_BUDGET['resource_mb']:g})")
+    b.add_argument("--json-log", action="store_true",
+                   help=f"zusätzlich {BUILD_JSONL} (eine JSON-Zeile pro Datei: action, source, target, bytes, duration, outcome)")
+    b.add_argument("--dry-run", action="store_true",
+                   help="nur planen: Zielnamen, Umbenennungen, Duplikate und Bytes ausgeben, nichts schreiben")
+    b.add_argument("--plan-out", metavar="FILE",
+                   help="Plan als JSON in diese Datei schreiben (impliziert --dry-run)")
+    b.add_argument("--package", choices=PACKAGE_FORMATS,
+                   help="fertige Resource zusätzlich als <name>.zip / .tar.zst packen (während des Kopierens, "
+                        "RSC7 ungepackt gespeichert; tar.zst braucht pip install zstandard)")
+    b.add_argument("--package-dir", metavar="DIR", help="Ordner für das Paket (Default: neben der Resource)")
+    b.add_argument("--watch", action="store_true",
+                   help="nach dem Build die Sources beobachten und Änderungen nachziehen (merge, bis Ctrl+C); "
+                        "eine JSON-Zeile pro Update")
+    b.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECS, metavar="S",
+                   help=f"Watch: so lange Ruhe abwarten, bevor aktualisiert wird (Default {WATCH_DEBOUNCE_SECS:g})")
+    b.add_argument("--poll", type=float, default=WATCH_POLL_SECS, metavar="S",
+                   help=f"Watch ohne inotify: Scan-Intervall (Default {WATCH_POLL_SECS:g})")
+    b.add_argument("--no-inotify", action="store_true", help="Watch: immer Polling statt inotify")
+    b.add_argument("--profile", nargs="?", const=True, default=None, metavar="FILE",
+                   help=f"cProfile-Dump des Builds schreiben (Default {PROFILE_FILE} im Ziel, Top 20 in {BUILD_LOG})")
+    b.add_argument("-q", "--quiet", action="store_true", help="keine Log-Zeilen auf stderr")
+
+    bb = sub.add_parser("batch", help="mehrere Resources aus einer Build-Datei (JSON) bauen, parallel")
+    bb.add_argument("file", help="Build-Datei: {\"resources\": [{\"name\", \"dst\", \"sources\", ...Optionen}]}")
+    bb.add_argument("--jobs", type=int, metavar="N",
+                    help=f"Resources gleichzeitig (Default: \"jobs\" aus der Datei, sonst {BATCH_DEFAULT_JOBS})")
+    bb.add_argument("--io-limit", type=int, metavar="N",
+                    help=f"max. gleichzeitige Datei-Transfers über alle Jobs (Default: \"io_limit\", sonst {BATCH_DEFAULT_IO_LIMIT})")
+    bb.add_argument("-q", "--quiet", action="store_true", help="keine Log-Zeilen auf stderr")
+
+    r = sub.add_parser("resume", help="abgebrochenen Build fortsetzen (Journal im Ziel)")
+    r.add_argument("--dst", required=True, help="Ziel-Resource-Ordner des abgebrochenen Builds")
+    r.add_argument("--transfer", choices=TRANSFER_MODES, default="auto")
+    r.add_argument("--copy-workers", type=int, default=DEFAULT_COPY_WORKERS, metavar="N")
+    r.add_argument("--json-log", action="store_true")
+    r.add_argument("--profile", nargs="?", const=True, default=None, metavar="FILE")
+    r.add_argument("-q", "--quiet", action="store_true", help="keine Log-Zeilen auf stderr")
+
+    c = sub.add_parser("compact", help="fxmanifest.lua einer bestehenden Resource kompaktieren")
+    c.add_argument("--dst", required=True, help="Resource-Ordner")
+    c.add_argument("--name", help="Resource-Name (Default: Ordnername)")
+    c.add_argument("--no-globs", action="store_true", help="Dateien einzeln auflisten statt data/*.ext")
+    return parser
+
+def _cli_event_printer(quiet: bool):
+    def on_event(kind: str, *args):
+        if kind == "log" and not quiet:
+            print(args[0], file=sys.stderr, flush=True)
+    return on_event
+
+def cli_build(args) -> int:
+    if not validate_resource_name(args.name):
+        print("Resource-Name ohne Leerzeichen angeben (z. B. my_pack).", file=sys.stderr)
+        return EXIT_USAGE
+
+    sources = []
+    for raw in args.src:
+        p = Path(raw).expanduser()
+        if not (p.is_dir() or is_archive_source(p)):
+            print(f"Source nicht gefunden (Ordner oder .zip/.tar.gz): {p}", file=sys.stderr)
+            return EXIT_USAGE
+        sources.append(p.resolve())
+
+    builder = PackBuilder(sources, args.dst, args.name, mode=args.mode, move=args.move,
+                          on_event=_cli_event_printer(args.quiet), scan_workers=args.scan_workers,
+                          copy_workers=args.copy_workers, dedupe=args.dedupe,
+                          incremental=not args.no_state, state_hash=args.state_hash,
+                          transfer_mode=args.transfer, json_log=args.json_log,
+                          compact_manifest=args.compact_manifest, manifest_globs=not args.no_globs,
+                          shard_max_bytes=int(args.shard_max_mb * 1024 * 1024),
+                          shard_max_files=args.shard_max_files,
+                          analyze=not args.no_analyze, renumber=args.renumber,
+                          budget={"asset_mb": args.budget_asset_mb, "source_mb": args.budget_source_mb,
+                                  "resource_mb": args.budget_resource_mb},
+                          dry_run=args.dry_run or bool(args.plan_out), profile=args.profile,
+                          package=args.package, package_dir=args.package_dir)
+
+    if args.watch and (args.move or builder.dry_run):
+        print("--watch geht nicht zusammen mit --move / --dry-run.", file=sys.stderr)
+        return EXIT_USAGE
+
+    # first Ctrl+C stops gracefully after the current file
+    previous = signal.signal(signal.SIGINT, lambda *_: builder.stop())
+    try:
+        if args.watch:
+            # one JSON line per build/update; Ctrl+C ends the watch
+            summary = builder.watch(args.debounce, args.poll, use_inotify=not args.no_inotify,
+                                    on_summary=lambda x: print(json.dumps(x, ensure_ascii=False), flush=True))
+            return summary["exit_code"]
+        summary = builder.build()
+    except Exception as e:
+        summary = {"result": "failed", "exit_code": EXIT_FAILED, "error": str(e)}
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+    if args.plan_out and "plan" in summary:
+        try:
+            Path(args.plan_out).write_text(json.dumps(summary.pop("plan"), ensure_ascii=False, indent=1),
+                                           encoding="utf-8")
+            summary["plan_file"] = str(Path(args.plan_out).resolve())
+        except OSError as e:
+            print(f"Plan konnte nicht gespeichert werden: {e}", file=sys.stderr)
+            summary["exit_code"] = EXIT_FAILED
+
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+    return summary["exit_code"]
+
+def cli_batch(args) -> int:
+    try:
+        spec = load_build_file(args.file)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_USAGE
+
+    batch = BatchBuilder(spec, on_event=_cli_event_printer(args.quiet), jobs=args.jobs, io_limit=args.io_limit)
+    previous = signal.signal(signal.SIGINT, lambda *_: batch.stop())
+    try:
+        summary = batch.run()
+    except Exception as e:
+        summary = {"result": "failed", "exit_code": EXIT_FAILED, "error": str(e)}
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+    return summary["exit_code"]
+
+def cli_resume(args) -> int:
+    builder = PackBuilder([], args.dst, "resume", on_event=_cli_event_printer(args.quiet),
+                          copy_workers=args.copy_workers, transfer_mode=args.transfer, json_log=args.json_log,
+                          profile=args.profile)
+
+    previous = signal.signal(signal.SIGINT, lambda *_: builder.stop())
+    try:
+        summary = builder.resume()
+    except Exception as e:
+        summary = {"result": "failed", "exit_code": EXIT_FAILED, "error": str(e)}
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+    return summary["exit_code"]
+
+def cli_compact(args) -> int:
+    dst_root = Path(args.dst).expanduser().resolve()
+    if not (dst_root / "fxmanifest.lua").is_file():
+        print(f"Keine fxmanifest.lua in {dst_root}", file=sys.stderr)
+        return EXIT_USAGE
+    name = args.name or dst_root.name
+    try:
+        compact_fxmanifest(dst_root, name, [], lambda m: print(m, file=sys.stderr), use_globs=not args.no_globs)
+    except Exception as e:
+        print(json.dumps({"result": "failed", "exit_code": EXIT_FAILED, "error": str(e)}, ensure_ascii=False))
+        return EXIT_FAILED
+    print(json.dumps({"result": "ok", "exit_code": EXIT_OK, "manifest": str(dst_root / "fxmanifest.lua")}, ensure_ascii=False))
+    return EXIT_OK
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in CLI_COMMANDS:
+        App().run()
+        return EXIT_OK
+
+    args = build_arg_parser().parse_args(argv)
+    if args.command == "build":
+        return cli_build(args)
+    if args.command == "batch":
+        return cli_batch(args)
+    if args.command == "resume":
+        return cli_resume(args)
+    if args.command == "compact":
+        return cli_compact(args)
+    return EXIT_USAGE
+
 if __name__ == "__main__":
-    App().run()
+    sys.exit(main())